@@ -1,12 +1,21 @@
 const path = require('path');
+const os = require('os');
 
 const tesseractConfig = {
   pythonPath: process.env.PYTHON_PATH || 'python3',
   scriptPath: process.env.TESSERACT_OCR_SCRIPT_PATH || path.join(__dirname, '../python/tesseract_ocr.py'),
   confidenceThreshold: parseFloat(process.env.OCR_CONFIDENCE_THRESHOLD) || 0.7,
   timeout: parseInt(process.env.OCR_TIMEOUT) || 30000,
+  deadlineMargin: parseInt(process.env.OCR_DEADLINE_MARGIN) || 2000, // Python aims to answer this long before the timeout kills it
   maxConcurrent: parseInt(process.env.MAX_CONCURRENT_OCR) || 3,
   queueTimeout: parseInt(process.env.OCR_QUEUE_TIMEOUT) || 60000,
+  persistentWorker: process.env.OCR_PERSISTENT_WORKER !== 'false', // Keep warm `--serve` workers instead of one process per receipt
+  autoLanguage: process.env.OCR_AUTO_LANGUAGE === 'true', // Recognize with the detected script's languages only (`--auto-lang`)
+  maxRssMb: parseInt(process.env.OCR_MAX_RSS_MB) || null, // Peak memory per receipt job (`--max-rss-mb`); unset means no cap
+  // Queue metrics of a `tesseract_ocr.py --watch` upload watcher, reported by the queue status endpoint
+  watcherMetricsPath: process.env.OCR_WATCH_METRICS ||
+    path.join(process.env.OCR_CACHE_DIR || path.join(os.tmpdir(), 'tesseract_ocr_cache'), 'watcher_metrics.json'),
+  watcherMetricsMaxAge: parseInt(process.env.OCR_WATCH_METRICS_MAX_AGE) || 10000, // Older metrics mean the watcher is not running
   
   settings: {
     languages: ['eng'], // Tesseract language codes (eng, fra, deu, etc.)
@@ -14,7 +14,8 @@ exports.processReceipt = async (req, res) => {
 
     const imagePath = req.file.path;
     const options = {
-      languages: req.body.languages ? req.body.languages.split(',') : ['en']
+      languages: req.body.languages ? req.body.languages.split(',') : ['en'],
+      company: req.user && req.user.companyId ? String(req.user.companyId) : undefined
     };
 
     console.log(`Processing receipt: ${imagePath}`);
@@ -19,13 +19,16 @@ const storage = multer.diskStorage({
   }
 });
 
+// E-receipts are read as text by the OCR service, so they are accepted alongside the configured types
+const E_RECEIPT_TYPES = ['message/rfc822', 'text/html', 'text/plain'];
+
 // File filter
 const fileFilter = (req, file, cb) => {
-  const allowedTypes = process.env.ALLOWED_FILE_TYPES.split(',');
+  const allowedTypes = process.env.ALLOWED_FILE_TYPES.split(',').concat(E_RECEIPT_TYPES);
   if (allowedTypes.includes(file.mimetype)) {
     cb(null, true);
   } else {
-    cb(new Error('Invalid file type. Only JPEG, PNG, and PDF files are allowed.'), false);
+    cb(new Error('Invalid file type. Only JPEG, PNG, PDF, and e-receipt (EML, HTML, TXT) files are allowed.'), false);
   }
 };
 
@@ -88,7 +88,9 @@ const expenseSchema = new mongoose.Schema({
       suggestedCategory: String,
       items: [{
         name: String,
-        price: Number
+        price: Number,
+        quantity: Number,
+        unitPrice: Number
       }],
       additionalData: {
         subtotal: Number,
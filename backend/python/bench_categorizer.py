@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Expense Categorizer Benchmark
+Measures categorizations per second for dictionaries of 10, 1k and 100k merchant aliases
+"""
+
+import os
+import json
+import time
+import random
+import string
+import argparse
+import tempfile
+from typing import List, Tuple
+
+from expense_categorizer import ExpenseCategorizer
+
+CATEGORIES = ['meals', 'transportation', 'office_supplies', 'travel', 'software', 'lodging', 'training', 'telecom']
+
+def random_alias(rng: random.Random) -> str:
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(rng.randint(1, 3))]
+    return ' '.join(words)
+
+def build_dictionary(size: int, rng: random.Random) -> Tuple[str, List[str]]:
+    """Write a dictionary file with ``size`` aliases spread over the categories"""
+    aliases = [random_alias(rng) for _ in range(size)]
+    categories = {name: [] for name in CATEGORIES}
+    for index, alias in enumerate(aliases):
+        categories[CATEGORIES[index % len(CATEGORIES)]].append(alias)
+
+    fd, path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'categories': [{'name': name, 'keywords': words} for name, words in categories.items()]}, f)
+    return path, aliases
+
+def build_queries(aliases: List[str], count: int, rng: random.Random) -> List[Tuple[str, List[str]]]:
+    """Half the merchants contain a known alias, the rest are random text"""
+    queries = []
+    for index in range(count):
+        if index % 2 == 0:
+            merchant = f'{random_alias(rng)} {rng.choice(aliases)} inc'
+        else:
+            merchant = random_alias(rng)
+        queries.append((merchant, [random_alias(rng) for _ in range(rng.randint(0, 5))]))
+    return queries
+
+def linear_scan(keywords: List[Tuple[str, str]], merchant: str) -> str:
+    """The previous approach: substring checks against every keyword in turn"""
+    merchant_lower = merchant.lower()
+    for keyword, category in keywords:
+        if keyword in merchant_lower:
+            return category
+    return 'general'
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark expense categorization')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000], help='Dictionary sizes to test')
+    parser.add_argument('--queries', type=int, default=5000, help='Categorizations per size')
+    parser.add_argument('--linear-queries', type=int, default=200, help='Queries for the linear-scan comparison')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = []
+
+    for size in args.sizes:
+        path, aliases = build_dictionary(size, rng)
+        try:
+            start = time.perf_counter()
+            categorizer = ExpenseCategorizer([path], check_interval=3600)
+            build_seconds = time.perf_counter() - start
+
+            queries = build_queries(aliases, args.queries, rng)
+            start = time.perf_counter()
+            for merchant, items in queries:
+                categorizer.categorize(merchant, items)
+            automaton_rate = len(queries) / (time.perf_counter() - start)
+
+            keywords = [(alias, CATEGORIES[index % len(CATEGORIES)]) for index, alias in enumerate(aliases)]
+            linear_queries = queries[:args.linear_queries]
+            start = time.perf_counter()
+            for merchant, _ in linear_queries:
+                linear_scan(keywords, merchant)
+            linear_rate = len(linear_queries) / (time.perf_counter() - start)
+        finally:
+            os.remove(path)
+
+        report.append({
+            'dictionary_size': size,
+            'automaton_nodes': len(categorizer.automaton.goto),
+            'build_seconds': round(build_seconds, 4),
+            'categorizations_per_second': round(automaton_rate, 1),
+            'linear_scan_per_second': round(linear_rate, 1)
+        })
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
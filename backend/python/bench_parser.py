@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Receipt Parser Micro-benchmark
+Measures parse_receipt_data throughput on synthetic or stored OCR text (no Tesseract involved)
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from typing import List
+
+from receipt_parser import parse_receipt_data
+
+MERCHANTS = ['ACME COFFEE SHOP', 'Grand Hotel Downtown', 'City Taxi Co', 'Office Depot #1123', 'Pizza Palace']
+ITEMS = ['Latte', 'Muffin', 'Room night', 'Printer paper', 'Parking', 'Sandwich', 'Taxi fare', 'Pens x12']
+PAYMENTS = ['VISA', 'Mastercard', 'CASH', 'Card ending in 4242', 'Debit']
+
+def synthetic_receipt(rng: random.Random) -> str:
+    """Build a plausible OCR'd receipt text"""
+    lines = [rng.choice(MERCHANTS), f'{rng.randint(1, 999)} Main St', f'Tel: (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}']
+    lines.append(f'Date: {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/20{rng.randint(18, 25)}')
+    lines.append(f'Receipt #{rng.randint(10000, 99999)}')
+    subtotal = 0.0
+    for _ in range(rng.randint(2, 25)):
+        price = round(rng.uniform(0.5, 80), 2)
+        subtotal += price
+        lines.append(f'{rng.choice(ITEMS)}  {price:.2f}')
+    tax = round(subtotal * 0.08, 2)
+    lines += [f'Subtotal {subtotal:.2f}', f'Tax {tax:.2f}', f'TOTAL ${subtotal + tax:.2f}', rng.choice(PAYMENTS), 'Thank you!']
+    return '\n'.join(lines)
+
+def load_texts(path: str) -> List[str]:
+    """Read extracted_text fields from a JSON-lines file of stored OCR results"""
+    texts = []
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            text = record.get('extracted_text') or record.get('ocr_data', {}).get('extracted_text')
+            if text:
+                texts.append(text)
+    return texts
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark receipt text parsing')
+    parser.add_argument('--texts', help='JSON-lines file with stored extracted_text records (default: synthetic corpus)')
+    parser.add_argument('--count', type=int, default=2000, help='Synthetic receipts to generate')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed passes over the corpus')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.texts:
+        texts = load_texts(args.texts)
+    else:
+        rng = random.Random(args.seed)
+        texts = [synthetic_receipt(rng) for _ in range(args.count)]
+
+    if not texts:
+        print('No receipt texts to parse', file=sys.stderr)
+        sys.exit(1)
+
+    # Warm-up pass
+    for text in texts:
+        parse_receipt_data(text)
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for text in texts:
+            parse_receipt_data(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(json.dumps({
+        'receipts': len(texts),
+        'best_pass_seconds': round(best, 4),
+        'receipts_per_second': round(len(texts) / best, 1),
+        'microseconds_per_receipt': round(best / len(texts) * 1e6, 1)
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tiled OCR Benchmark
+Compares single-pass and tiled recognition of long synthetic receipts for accuracy and wall-clock time
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import difflib
+from typing import Dict, List, Any
+
+import tesseract_ocr
+from tesseract_ocr import TesseractOCRProcessor
+from ocr_benchmark import receipt_lines, render_receipt, percentile
+
+def text_accuracy(expected: str, actual: str) -> float:
+    """Similarity of two texts (0-1), ignoring whitespace layout"""
+    return difflib.SequenceMatcher(None, ' '.join(expected.split()), ' '.join(actual.split()), autojunk=False).ratio()
+
+def long_receipts(out_dir: str, count: int, items: int, seed: int) -> List[Dict[str, Any]]:
+    """Render ``count`` supermarket-length receipts with ``items`` lines each"""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    receipts = []
+    for index in range(count):
+        lines = receipt_lines(rng, 'eng', items)
+        path = os.path.join(out_dir, f'long_{index:03d}.png')
+        render_receipt(lines, rng.choice([20, 28]), 0, rng.choice([0, 8]), rng).save(path)
+        receipts.append({'path': path, 'text': '\n'.join(lines)})
+    return receipts
+
+def run_mode(processor: TesseractOCRProcessor, receipts: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    seconds = []
+    accuracy = []
+    tiles = []
+    for _ in range(repeat):
+        for receipt in receipts:
+            start = time.perf_counter()
+            result = processor.extract_text(receipt['path'])
+            seconds.append(time.perf_counter() - start)
+            text = result.get('extracted_text', '') if result.get('success') else ''
+            accuracy.append(text_accuracy(receipt['text'], text))
+            tiles.append(result.get('psm_schedule', {}).get('tiles', 1) if result.get('success') else 0)
+    return {
+        'mean_ms': round(1000 * sum(seconds) / len(seconds), 1),
+        'p50_ms': round(1000 * percentile(seconds, 0.5), 1),
+        'p95_ms': round(1000 * percentile(seconds, 0.95), 1),
+        'mean_accuracy': round(sum(accuracy) / len(accuracy), 4),
+        'min_accuracy': round(min(accuracy), 4),
+        'mean_tiles': round(sum(tiles) / len(tiles), 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tiled OCR of long receipts against single-pass OCR')
+    parser.add_argument('--out', default='bench_long', help='Directory for the rendered receipts')
+    parser.add_argument('--count', type=int, default=5, help='Receipts to render')
+    parser.add_argument('--items', type=int, default=120, help='Item lines per receipt')
+    parser.add_argument('--repeat', type=int, default=1, help='Timed passes over the receipts')
+    parser.add_argument('--tiles', type=int, nargs='+', default=[os.cpu_count() or 1],
+                        help='Strip worker counts to compare (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    if not tesseract_ocr.get_capabilities()['ocr_available']:
+        print('Tesseract unavailable: nothing to benchmark', file=sys.stderr)
+        sys.exit(1)
+
+    receipts = long_receipts(args.out, args.count, args.items, args.seed)
+    # Exhaustive configs, so both modes do the same work per pixel
+    options = {'early_exit_confidence': None}
+    report = {
+        'receipts': len(receipts),
+        'items_per_receipt': args.items,
+        'cpus': os.cpu_count(),
+        'single_pass': run_mode(TesseractOCRProcessor(**options), receipts, args.repeat),
+        'tiled': {}
+    }
+    for workers in args.tiles:
+        processor = TesseractOCRProcessor(tiling=True, tile_workers=workers, **options)
+        report['tiled'][str(workers)] = run_mode(processor, receipts, args.repeat)
+        report['tiled'][str(workers)]['speedup'] = round(
+            report['single_pass']['mean_ms'] / max(report['tiled'][str(workers)]['mean_ms'], 1e-3), 2)
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Expense Categorizer for Expense Management System
+Matches merchant names and item text against category dictionaries with an Aho-Corasick automaton
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+DEFAULT_CATEGORY = 'general'
+DEFAULT_DICTIONARY_DIR = os.environ.get('OCR_CATEGORY_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'categories')
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between dictionary file mtime checks
+# Bump whenever matching changes; dictionary edits alone need --reparse --force-reparse
+CATEGORIZER_VERSION = '2'
+
+NO_MATCH = sys.maxsize
+COMPANY_ID_PATTERN = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton mapping keywords to the best (lowest) category priority
+
+    Each node stores the best priority of any keyword ending there, including keywords
+    reachable through its failure links, so a scan only has to track a running minimum.
+    Keyword nodes also record the keyword's length and whether it needs word
+    boundaries (it starts and ends with a letter or digit), and link to the next
+    keyword node down their failure chain, so matches that must be whole words can be
+    checked one by one.
+    """
+
+    def __init__(self, keywords: Dict[str, int]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.best: List[int] = [NO_MATCH]
+        self.priority: List[int] = [NO_MATCH]
+        self.length: List[int] = [0]
+        self.whole_word: List[bool] = [False]
+        self.output: List[int] = [0]
+
+        for keyword, priority in keywords.items():
+            node = 0
+            for char in keyword:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(NO_MATCH)
+                    self.priority.append(NO_MATCH)
+                    self.length.append(0)
+                    self.whole_word.append(False)
+                    self.output.append(0)
+                node = next_node
+            self.priority[node] = min(self.priority[node], priority)
+            self.best[node] = self.priority[node]
+            self.length[node] = len(keyword)
+            self.whole_word[node] = keyword[0].isalnum() and keyword[-1].isalnum()
+
+        # Breadth-first pass to fill failure links and fold suffix outputs into each node
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self.goto[node].items():
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.best[child] = min(self.best[child], self.best[self.fail[child]])
+                suffix = self.fail[child]
+                self.output[child] = suffix if self.length[suffix] else self.output[suffix]
+                queue.append(child)
+
+    def scan(self, text: str, split: int) -> Tuple[int, int]:
+        """Best priorities of matches before ``split`` and of whole-word matches after it, in one pass
+
+        Matches ending before ``split`` count wherever they occur; past it, a keyword
+        that needs word boundaries only counts when no letter or digit adjoins it.
+        """
+        goto = self.goto
+        fail = self.fail
+        best = self.best
+        priority = self.priority
+        length = self.length
+        whole_word = self.whole_word
+        output = self.output
+        end = len(text)
+        node = 0
+        best_before = NO_MATCH
+        best_after = NO_MATCH
+
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if index < split:
+                if best[node] < best_before:
+                    best_before = best[node]
+            elif best[node] < best_after:
+                bounded_end = index + 1 == end or not text[index + 1].isalnum()
+                match = node if length[node] else output[node]
+                while match:
+                    if priority[match] < best_after and (not whole_word[match] or (
+                            bounded_end and not text[index - length[match]].isalnum())):
+                        best_after = priority[match]
+                    match = output[match]
+
+        return best_before, best_after
+
+def load_dictionary(path: str) -> List[Tuple[str, List[str]]]:
+    """Read an ordered ``{"categories": [{"name", "keywords"}]}`` dictionary file"""
+    with open(path) as f:
+        data = json.load(f)
+    return [
+        (entry['name'], [keyword.lower() for keyword in entry.get('keywords', []) if keyword])
+        for entry in data.get('categories', [])
+    ]
+
+class ExpenseCategorizer:
+    """Categorizer built from one or more dictionary files, rebuilt when any of them changes
+
+    Files are listed in priority order: a category (and its keywords) from an earlier
+    file wins over later ones, and within a file earlier categories win. Merchant-name
+    matches take precedence over item matches. Keywords match anywhere in the merchant
+    name ("Burgerville"), but only as whole words in item text, where short
+    keywords such as 'car' or 'pen' otherwise hit "Carrots" or "Open box". One
+    automaton scans both in a single pass.
+    """
+
+    def __init__(self, paths: List[str], check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.paths = paths
+        self.check_interval = check_interval
+        self.categories: List[str] = []
+        self.automaton: Optional[KeywordAutomaton] = None
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _file_signature(self) -> Tuple:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def reload(self):
+        """Rebuild the automaton from the dictionary files"""
+        signature = self._file_signature()
+        categories: List[str] = []
+        keywords: Dict[str, int] = {}
+
+        for path in self.paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                entries = load_dictionary(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load category dictionary {path}: {e}", file=sys.stderr)
+                continue
+            for name, category_keywords in entries:
+                if name not in categories:
+                    categories.append(name)
+                priority = categories.index(name)
+                for keyword in category_keywords:
+                    if keyword not in keywords or priority < keywords[keyword]:
+                        keywords[keyword] = priority
+
+        automaton = KeywordAutomaton(keywords)
+        with self._lock:
+            self.categories = categories
+            self.automaton = automaton
+            self._signature = signature
+            self._last_check = time.monotonic()
+
+    def maybe_reload(self):
+        """Reload if a dictionary file changed, checking at most every ``check_interval`` seconds"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        if self._file_signature() != self._signature:
+            self.reload()
+
+    def categorize(self, merchant_name: str, items: List[Any]) -> str:
+        """Categorize expense based on merchant name and items"""
+        self.maybe_reload()
+        with self._lock:
+            automaton = self.automaton
+            categories = self.categories
+
+        merchant_lower = (merchant_name or '').lower()
+        item_texts = [item.get('description', '') if isinstance(item, dict) else str(item) for item in items or []]
+        # A newline never occurs in keywords, so no match can straddle merchant and items;
+        # runs of whitespace are collapsed so multi-word keywords still match
+        text = merchant_lower + '\n' + ' '.join(' '.join(item_texts).lower().split())
+
+        merchant_best, items_best = automaton.scan(text, len(merchant_lower))
+        best = merchant_best if merchant_best != NO_MATCH else items_best
+        return categories[best] if best != NO_MATCH else DEFAULT_CATEGORY
+
+_categorizers: Dict[Optional[str], ExpenseCategorizer] = {}
+_categorizers_lock = threading.Lock()
+
+def get_categorizer(company: Optional[str] = None, dictionary_dir: str = None) -> ExpenseCategorizer:
+    """Shared categorizer for a company: ``<dir>/<company>.json`` ahead of ``<dir>/default.json``"""
+    dictionary_dir = dictionary_dir or DEFAULT_DICTIONARY_DIR
+    if company and not COMPANY_ID_PATTERN.match(str(company)):
+        company = None
+    key = (company, dictionary_dir)
+
+    with _categorizers_lock:
+        categorizer = _categorizers.get(key)
+        if categorizer is None:
+            paths = [os.path.join(dictionary_dir, 'default.json')]
+            if company:
+                paths.insert(0, os.path.join(dictionary_dir, f'{company}.json'))
+            categorizer = ExpenseCategorizer(paths)
+            _categorizers[key] = categorizer
+    return categorizer
+
+def categorize_expense(merchant_name: str, items: List[Any], company: Optional[str] = None) -> str:
+    """Categorize expense based on merchant name and items"""
+    return get_categorizer(company).categorize(merchant_name, items)
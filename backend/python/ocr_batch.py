@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Batch OCR for Expense Management System
+Fans receipt OCR out over a process pool and streams one JSON line per receipt
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set
+
+import tesseract_ocr
+from ocr_cache import ResultCache
+from ereceipt import EXTENSION_FORMATS
+from receipt_index import ReceiptIndex, DEFAULT_MAX_DISTANCE
+
+SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp', '.pdf'} | set(EXTENSION_FORMATS)
+
+# Per-process state set up by _init_worker
+_worker_processor = None
+_worker_cache = None
+_worker_diagnostics = {}
+_worker_index = None
+
+def iter_inputs(inputs: Iterable[str], manifest: Optional[str] = None) -> Iterator[str]:
+    """Expand directories, glob patterns and an optional manifest into receipt paths"""
+    seen = set()
+
+    def emit(path):
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            return path
+        return None
+
+    for spec in inputs:
+        if os.path.isdir(spec):
+            candidates = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(spec)
+                for name in names
+            )
+        elif glob.has_magic(spec):
+            candidates = sorted(glob.glob(spec, recursive=True))
+        else:
+            candidates = [spec]
+
+        for candidate in candidates:
+            if os.path.splitext(candidate)[1].lower() in SUPPORTED_EXTENSIONS:
+                path = emit(candidate)
+                if path:
+                    yield path
+
+    if manifest:
+        # One path per line, relative paths resolved against the manifest's directory
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                path = emit(os.path.join(base_dir, line))
+                if path:
+                    yield path
+
+def succeeded(record: Dict[str, Any]) -> bool:
+    """Whether a batch record holds a real result; mock fallbacks carry a "note" and count as failures"""
+    return bool(record.get("success")) and "note" not in record
+
+def load_completed(output_path: str) -> Set[str]:
+    """Paths already processed successfully according to an existing output file, for resuming a batch
+
+    Failed records do not count, so a resumed batch retries them and appends a new
+    record; the last record of a path is the current one.
+    """
+    completed = set()
+    if not output_path or not os.path.exists(output_path):
+        return completed
+
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Truncated last line from an interrupted run
+            if record.get('path') and succeeded(record):
+                completed.add(record['path'])
+    return completed
+
+def _init_worker(languages: List[str], processor_options: Dict[str, Any], cache_dir: Optional[str],
+                 cache_max_mb: Optional[float], use_cache: bool, trace_file: Optional[str] = None,
+                 profile_dir: Optional[str] = None, index_path: Optional[str] = None,
+                 index_max_distance: Optional[int] = None):
+    """Create one processor per pool process; receipts run in parallel, so configs run serially by default"""
+    global _worker_processor, _worker_cache, _worker_diagnostics, _worker_index
+    options = dict(processor_options)
+    options["ocr_workers"] = options.get("ocr_workers") or 1
+    _worker_processor = tesseract_ocr.TesseractOCRProcessor(languages=languages, **options)
+    _worker_cache = None
+    _worker_diagnostics = {"trace_file": trace_file, "profile_dir": profile_dir}
+    _worker_index = None
+    if index_path:
+        try:
+            _worker_index = ReceiptIndex(index_path, max_distance=index_max_distance or DEFAULT_MAX_DISTANCE)
+        except OSError as e:
+            print(f"Duplicate receipt index unavailable in batch worker: {e}", file=sys.stderr)
+    if use_cache:
+        try:
+            _worker_cache = ResultCache(cache_dir=cache_dir, max_mb=cache_max_mb)
+        except OSError as e:
+            print(f"OCR cache unavailable in batch worker: {e}", file=sys.stderr)
+
+def _process_one(path: str) -> Dict[str, Any]:
+    try:
+        result = tesseract_ocr.run_receipt_job(_worker_processor, path, cache=_worker_cache, index=_worker_index,
+                                               **_worker_diagnostics)
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        result = {"success": False, "error": str(e)}
+    return {"path": path, **result}
+
+def _worker_died(path: str) -> Dict[str, Any]:
+    return {"path": path, "success": False,
+            "error": "Batch worker process died (e.g. killed for memory) while this receipt was in flight"}
+
+def run_batch(paths: Iterable[str], output_path: Optional[str] = None, jobs: Optional[int] = None,
+              languages: List[str] = None, processor_options: Optional[Dict[str, Any]] = None,
+              cache_dir: Optional[str] = None,
+              cache_max_mb: Optional[float] = None, use_cache: bool = True,
+              trace_file: Optional[str] = None, profile_dir: Optional[str] = None,
+              index_path: Optional[str] = None, index_max_distance: Optional[int] = None) -> Dict[str, Any]:
+    """Process receipts on a process pool, appending one compact JSON line per receipt as it finishes
+
+    With an ``output_path``, receipts already processed successfully in that file are
+    skipped so an interrupted batch can be resumed; failed ones are retried. Without one,
+    results stream to stdout.
+    Workers share ``trace_file`` (appends are locked) and dump profiles into ``profile_dir``.
+    When a worker dies, every receipt in flight gets a failed record and the pool is
+    restarted for the rest of the batch.
+    With an ``index_path``, near-duplicates of indexed receipts are answered from that index.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    completed = load_completed(output_path)
+    summary = {"processed": 0, "failed": 0, "skipped": 0}
+    peak_rss_mb = 0.0
+    start = time.time()
+
+    if output_path:
+        needs_newline = os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        if needs_newline:
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        out = open(output_path, 'a')
+        if needs_newline:
+            out.write('\n')
+    else:
+        out = sys.stdout
+
+    def write(record: Dict[str, Any]):
+        nonlocal peak_rss_mb
+        out.write(json.dumps(record, separators=(',', ':')) + '\n')
+        out.flush()
+        peak_rss_mb = max(peak_rss_mb, record.get("memory", {}).get("peak_rss_mb") or 0.0)
+        if succeeded(record):
+            summary["processed"] += 1
+        else:
+            summary["failed"] += 1
+
+    def start_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(languages or ['eng'], processor_options or {}, cache_dir, cache_max_mb, use_cache,
+                      trace_file, profile_dir, index_path, index_max_distance)
+        )
+
+    executor = None
+    try:
+        executor = start_pool()
+        running: Dict[Any, str] = {}
+        path_iter = iter(paths)
+        exhausted = False
+
+        while True:
+            broken = False
+            # Keep a bounded number of receipts in flight so huge archives are not queued up front
+            while not broken and not exhausted and len(running) < jobs * 2:
+                path = next(path_iter, None)
+                if path is None:
+                    exhausted = True
+                elif path in completed:
+                    summary["skipped"] += 1
+                else:
+                    try:
+                        running[executor.submit(_process_one, path)] = path
+                    except BrokenProcessPool:
+                        broken = True
+                        write(_worker_died(path))
+
+            if not running and not broken:
+                break
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = running.pop(future)
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        record = _worker_died(path)
+                    write(record)
+
+            if broken:
+                # A worker died (e.g. killed for memory, or a crash in a native OCR library) and took the pool with it
+                print("Batch worker died, restarting the pool", file=sys.stderr)
+                for path in running.values():
+                    write(_worker_died(path))
+                running.clear()
+                executor.shutdown(wait=False)
+                executor = start_pool()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.time() - start
+    done_count = summary["processed"] + summary["failed"]
+    summary.update({
+        "elapsed_seconds": round(elapsed, 3),
+        "receipts_per_second": round(done_count / elapsed, 3) if elapsed > 0 else 0.0,
+        "max_job_peak_rss_mb": peak_rss_mb,
+        "jobs": jobs
+    })
+    return summary
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+OCR Benchmark Suite for Expense Management System
+Renders a reproducible synthetic receipt corpus and times each pipeline stage against saved baselines
+
+Usage:
+    python ocr_benchmark.py generate --out bench_corpus --count 40
+    python ocr_benchmark.py run --corpus bench_corpus --save-baseline baseline.json
+    python ocr_benchmark.py run --corpus bench_corpus --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import tesseract_ocr
+from tesseract_ocr import TesseractOCRProcessor, OCR_CONFIGS, categorize_expense
+from ocr_memory import peak_rss_mb
+
+CORPUS_MANIFEST = 'manifest.json'
+DEFAULT_REGRESSION_THRESHOLD = 0.2  # 20% slower than baseline
+
+# Receipt vocabulary per language; the default PIL font covers these Latin-1 characters
+LANGUAGE_TEMPLATES = {
+    'eng': {
+        'merchants': ['ACME COFFEE SHOP', 'Grand Hotel Downtown', 'City Taxi Co', 'Office Depot', 'Pizza Palace'],
+        'items': ['Latte', 'Muffin', 'Room night', 'Printer paper', 'Parking', 'Sandwich', 'Taxi fare'],
+        'subtotal': 'Subtotal', 'tax': 'Tax', 'total': 'TOTAL', 'thanks': 'Thank you!'
+    },
+    'fra': {
+        'merchants': ['Café de la Gare', 'Hôtel du Marché', 'Boulangerie Dupré', 'Taxi Parisien'],
+        'items': ['Café crème', 'Croissant', 'Nuitée', 'Déjeuner', 'Péage'],
+        'subtotal': 'Sous-total', 'tax': 'TVA', 'total': 'TOTAL', 'thanks': 'Merci de votre visite'
+    },
+    'deu': {
+        'merchants': ['Bäckerei Müller', 'Gasthof zur Brücke', 'Bürobedarf Schäfer', 'Taxi Köln'],
+        'items': ['Brötchen', 'Kaffee', 'Übernachtung', 'Frühstück', 'Parkgebühr'],
+        'subtotal': 'Zwischensumme', 'tax': 'MwSt', 'total': 'SUMME', 'thanks': 'Vielen Dank'
+    }
+}
+
+def receipt_lines(rng: random.Random, language: str, item_count: int) -> List[str]:
+    """Text content of one synthetic receipt"""
+    template = LANGUAGE_TEMPLATES[language]
+    lines = [
+        rng.choice(template['merchants']),
+        f'{rng.randint(1, 999)} Main St',
+        f'Tel: (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+        f'{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/20{rng.randint(18, 25)}',
+        f'Receipt #{rng.randint(10000, 99999)}',
+        ''
+    ]
+    subtotal = 0.0
+    for _ in range(item_count):
+        price = round(rng.uniform(0.5, 80), 2)
+        subtotal += price
+        lines.append(f'{rng.choice(template["items"]):<20} {price:>8.2f}')
+    tax = round(subtotal * 0.08, 2)
+    lines += [
+        '',
+        f'{template["subtotal"]:<20} {subtotal:>8.2f}',
+        f'{template["tax"]:<20} {tax:>8.2f}',
+        f'{template["total"]:<20} {subtotal + tax:>8.2f}',
+        'VISA',
+        template['thanks']
+    ]
+    return lines
+
+def render_receipt(lines: List[str], font_size: int, rotation: float, noise: float, rng: random.Random):
+    """Draw receipt lines on paper, optionally on a darker background, rotated and noisy"""
+    from PIL import Image, ImageDraw, ImageFont
+    import numpy as np
+
+    font = ImageFont.load_default(size=font_size)
+    line_height = int(font_size * 1.4)
+    width = int(font_size * 18)
+    height = line_height * (len(lines) + 2)
+
+    paper = Image.new('L', (width, height), 248)
+    draw = ImageDraw.Draw(paper)
+    for index, line in enumerate(lines):
+        draw.text((font_size, line_height * (index + 1)), line, fill=15, font=font)
+
+    if rotation:
+        # Photographed receipts: rotate and put the paper on a table-coloured background
+        paper = paper.rotate(rotation, expand=True, fillcolor=0, resample=Image.BICUBIC)
+        mask = paper.point(lambda value: 255 if value > 0 else 0)
+        background = Image.new('L', (int(paper.width * 1.3), int(paper.height * 1.2)), 70)
+        background.paste(paper, ((background.width - paper.width) // 2, (background.height - paper.height) // 2), mask)
+        paper = background
+
+    if noise:
+        pixels = np.asarray(paper, dtype=np.float32)
+        noisy = pixels + np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, noise, pixels.shape)
+        paper = Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8))
+
+    return paper
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_text_pdf(path: str, pages: List[List[str]]):
+    """Minimal PDF with a Helvetica text layer (Latin-1), one list of lines per page"""
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Pages object, filled in once the page ids are known
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'
+    ]
+    kids = []
+    for lines in pages:
+        stream = 'BT /F1 11 Tf 14 TL 40 800 Td ' + ' '.join(f'({_pdf_escape(line)}) Tj T*' for line in lines) + ' ET'
+        page_id = len(objects) + 1
+        kids.append(f'{page_id} 0 R')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 420 842] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>')
+        objects.append(f'<< /Length {len(stream.encode("latin-1"))} >>\nstream\n{stream}\nendstream')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(pages)} >>'
+
+    body = b'%PDF-1.4\n'
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f'{number} 0 obj\n{obj}\nendobj\n'.encode('latin-1')
+    xref = len(body)
+    body += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    body += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('latin-1')
+    body += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+
+    with open(path, 'wb') as f:
+        f.write(body)
+
+def generate_corpus(out_dir: str, count: int = 40, seed: int = 1234) -> List[Dict[str, Any]]:
+    """Render ``count`` receipts into ``out_dir`` and write a manifest with their parameters and text"""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    entries = []
+
+    for index in range(count):
+        language = rng.choice(list(LANGUAGE_TEMPLATES))
+        kind = rng.choice(['image', 'image', 'image', 'pdf_scan', 'pdf_text'])
+        page_count = rng.choice([1, 1, 2, 3]) if kind != 'image' else 1
+        font_size = rng.choice([14, 20, 28, 40])
+        rotation = rng.choice([0, 0, 3, -6, 12]) if kind == 'image' else 0
+        noise = rng.choice([0, 0, 8, 20])
+        pages = [receipt_lines(rng, language, rng.randint(3, 30)) for _ in range(page_count)]
+
+        name = f'receipt_{index:04d}'
+        if kind == 'image':
+            file_name = f'{name}.png'
+            render_receipt(pages[0], font_size, rotation, noise, rng).save(os.path.join(out_dir, file_name))
+        elif kind == 'pdf_scan':
+            file_name = f'{name}.pdf'
+            images = [render_receipt(lines, font_size, 0, noise, rng).convert('RGB') for lines in pages]
+            images[0].save(os.path.join(out_dir, file_name), save_all=True, append_images=images[1:], resolution=150)
+        else:
+            file_name = f'{name}.pdf'
+            write_text_pdf(os.path.join(out_dir, file_name), pages)
+
+        entries.append({
+            'file': file_name,
+            'kind': kind,
+            'language': language,
+            'pages': page_count,
+            'font_size': font_size,
+            'rotation': rotation,
+            'noise': noise,
+            'text': '\n\n'.join('\n'.join(lines) for lines in pages)
+        })
+
+    with open(os.path.join(out_dir, CORPUS_MANIFEST), 'w') as f:
+        json.dump({'seed': seed, 'count': count, 'receipts': entries}, f, indent=2)
+    return entries
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Linearly interpolated percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def _timed(timings: Dict[str, List[float]], stage: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+def benchmark_receipt(processor: TesseractOCRProcessor, path: str, entry: Dict[str, Any],
+                      timings: Dict[str, List[float]], run_ocr: bool) -> None:
+    """Time every stage for one receipt, appending durations to ``timings``"""
+    text = entry['text']
+
+    if entry['kind'] == 'image':
+        # Preprocessing only needs OpenCV, so it is timed even without Tesseract
+        image = _timed(timings, 'preprocess_image', processor.preprocess_image, path)
+        if run_ocr:
+            if not isinstance(image, tesseract_ocr.Image.Image):
+                image = tesseract_ocr.Image.fromarray(image)
+            best = None
+            for index, config in enumerate(OCR_CONFIGS):
+                result = _timed(timings, f'psm_pass_{index}', processor._run_ocr_config, image, config)
+                if result and result['confidence'] > (best['confidence'] if best else 0) and len(result['text']) > 10:
+                    best = result
+            if best:
+                text = best['text']
+    elif run_ocr:
+        result = _timed(timings, f'extract_{entry["kind"]}', processor.extract_text, path)
+        if result.get('success'):
+            text = result['extracted_text']
+
+    parsed = _timed(timings, 'parse_receipt_data', processor.parse_receipt_data, text)
+    _timed(timings, 'categorize_expense', categorize_expense, parsed['merchant_name'], parsed['items'])
+
+def run_benchmark(corpus_dir: str, repeat: int = 1, run_ocr: Optional[bool] = None,
+                  languages: List[str] = None) -> Dict[str, Any]:
+    """Benchmark every receipt in a generated corpus and summarize per-stage latency"""
+    with open(os.path.join(corpus_dir, CORPUS_MANIFEST)) as f:
+        manifest = json.load(f)
+
+    processor = TesseractOCRProcessor(languages=languages or ['eng'])
+    if run_ocr is None:
+        run_ocr = tesseract_ocr.get_capabilities()['ocr_available']
+    if not run_ocr:
+        print('Tesseract unavailable: skipping OCR passes and parsing ground-truth text', file=sys.stderr)
+
+    timings: Dict[str, List[float]] = {}
+    receipt_seconds = []
+    for _ in range(repeat):
+        for entry in manifest['receipts']:
+            start = time.perf_counter()
+            benchmark_receipt(processor, os.path.join(corpus_dir, entry['file']), entry, timings, run_ocr)
+            receipt_seconds.append(time.perf_counter() - start)
+
+    total = sum(receipt_seconds)
+    peak = peak_rss_mb()
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'corpus': {'dir': os.path.abspath(corpus_dir), 'seed': manifest['seed'], 'receipts': len(manifest['receipts'])},
+        'ocr': run_ocr,
+        'repeat': repeat,
+        'throughput_receipts_per_second': round(len(receipt_seconds) / total, 3) if total else 0.0,
+        'receipt_latency': _summarize(receipt_seconds),
+        'stages': {stage: _summarize(values) for stage, values in sorted(timings.items())},
+        'peak_rss_mb': round(peak, 1) if peak is not None else None
+    }
+
+def _summarize(values: List[float]) -> Dict[str, Any]:
+    return {
+        'count': len(values),
+        'mean_ms': round(1000 * sum(values) / len(values), 3) if values else 0.0,
+        'p50_ms': round(1000 * percentile(values, 0.5), 3),
+        'p95_ms': round(1000 * percentile(values, 0.95), 3),
+        'max_ms': round(1000 * max(values), 3) if values else 0.0
+    }
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any],
+                        threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> List[str]:
+    """Describe every stage whose p50/p95 or overall throughput regressed by more than ``threshold``"""
+    regressions = []
+    for stage, summary in report['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if previous[metric] > 0 and summary[metric] > previous[metric] * (1 + threshold):
+                regressions.append(f'{stage} {metric}: {previous[metric]:.3f} -> {summary[metric]:.3f}')
+
+    previous_throughput = baseline.get('throughput_receipts_per_second', 0)
+    if previous_throughput and report['throughput_receipts_per_second'] < previous_throughput / (1 + threshold):
+        regressions.append(f'throughput: {previous_throughput:.3f} -> {report["throughput_receipts_per_second"]:.3f} receipts/s')
+
+    previous_rss = baseline.get('peak_rss_mb')
+    if previous_rss and report['peak_rss_mb'] and report['peak_rss_mb'] > previous_rss * (1 + threshold):
+        regressions.append(f'peak_rss_mb: {previous_rss} -> {report["peak_rss_mb"]}')
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR pipeline benchmark suite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help='Render a synthetic receipt corpus')
+    generate.add_argument('--out', default='bench_corpus', help='Output directory')
+    generate.add_argument('--count', type=int, default=40, help='Number of receipts')
+    generate.add_argument('--seed', type=int, default=1234, help='Random seed (same seed, same corpus)')
+
+    run = subparsers.add_parser('run', help='Benchmark a corpus')
+    run.add_argument('--corpus', default='bench_corpus', help='Corpus directory created by "generate"')
+    run.add_argument('--repeat', type=int, default=1, help='Passes over the corpus')
+    run.add_argument('--languages', nargs='+', default=['eng'])
+    run.add_argument('--no-ocr', action='store_true', help='Only time stages that do not need Tesseract')
+    run.add_argument('--save-baseline', help='Write the report to this file')
+    run.add_argument('--baseline', help='Compare against a saved baseline and exit 1 on regressions')
+    run.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                     help='Allowed slowdown before a stage is flagged (0.2 = 20%%)')
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        entries = generate_corpus(args.out, args.count, args.seed)
+        print(f'Generated {len(entries)} receipts in {args.out}', file=sys.stderr)
+        return
+
+    report = run_benchmark(args.corpus, repeat=args.repeat, run_ocr=False if args.no_ocr else None,
+                           languages=args.languages)
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        if regressions:
+            print('Performance regressions against baseline:', file=sys.stderr)
+            for regression in regressions:
+                print(f'  {regression}', file=sys.stderr)
+            sys.exit(1)
+        print('No regressions against baseline', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
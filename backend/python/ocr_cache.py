@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+OCR Result Cache for Expense Management System
+Content-addressed on-disk cache of receipt OCR results with LRU eviction
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import socket
+import threading
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+# File locking is only available on POSIX; elsewhere the cache still works but
+# eviction and counters are best-effort when several processes share it
+try:
+    import fcntl
+    LOCKING_AVAILABLE = True
+except ImportError:
+    fcntl = None
+    LOCKING_AVAILABLE = False
+
+DEFAULT_CACHE_DIR = os.environ.get('OCR_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'tesseract_ocr_cache')
+DEFAULT_CACHE_MAX_MB = int(os.environ.get('OCR_CACHE_MAX_MB') or 256)
+CLAIM_MAX_AGE = 120.0  # Seconds after which a claim is treated as abandoned, e.g. by a killed process
+CLAIM_POLL_INTERVAL = 0.05  # Seconds between checks while waiting for another process's result
+FLUSH_EVERY = 20  # Counter updates kept in memory before merging into a counter file
+FLUSH_INTERVAL = 30.0  # Seconds after which pending counter updates are merged regardless
+
+class FileLock:
+    """Exclusive advisory lock on a file, shared between processes"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = open(self.path, 'a+')
+        if LOCKING_AVAILABLE:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if LOCKING_AVAILABLE:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+        self.handle.close()
+        self.handle = None
+
+def atomic_write_json(path: Path, data: Any):
+    """Write JSON to a temp file in the same directory and rename it into place"""
+    fd, temp_path = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def merge_counts(target: Dict[str, Any], increments: Dict[str, Any]):
+    """Add nested integer counters from ``increments`` into ``target``"""
+    for key, value in increments.items():
+        if isinstance(value, dict):
+            merge_counts(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+class CounterFile:
+    """Nested integer counters shared by processes through one JSON file
+
+    Increments are kept in memory and merged into the file under a lock every
+    FLUSH_EVERY updates or FLUSH_INTERVAL seconds (and at exit); each merge also
+    picks up the counts other processes wrote in the meantime. The counters live
+    under ``section`` of the file's top-level object, or are that object itself.
+    """
+
+    def __init__(self, path: Path, section: Optional[str] = None, name: str = 'counters'):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self.section = section
+        self.name = name
+        self.counts: Dict[str, Any] = self.read()
+        self.pending: Dict[str, Any] = {}
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def read(self) -> Dict[str, Any]:
+        """Counters as last written to the file, without this process's pending updates"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get(self.section, {}) if self.section is not None else data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Current value of one top-level counter or counter group, pending updates included"""
+        with self._lock:
+            value = self.counts.get(key)
+            pending = self.pending.get(key)
+            if value is None and pending is None:
+                return default
+            if isinstance(value, dict) or isinstance(pending, dict):
+                merged: Dict[str, Any] = {}
+                merge_counts(merged, value or {})
+                merge_counts(merged, pending or {})
+                return merged
+            return (value or 0) + (pending or 0)
+
+    def add(self, increments: Dict[str, Any]):
+        """Count ``increments``, merging them into the file once enough have accumulated"""
+        with self._lock:
+            merge_counts(self.pending, increments)
+            self._pending_count += 1
+            due = self._pending_count >= FLUSH_EVERY or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Merge pending updates into the file and pick up other processes' counts"""
+        with self._lock:
+            pending = self.pending
+            if not pending:
+                return
+            self.pending = {}
+            self._pending_count = 0
+            self._last_flush = time.monotonic()
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with FileLock(self.lock_path):
+                counts = self.read()
+                merge_counts(counts, pending)
+                atomic_write_json(self.path, {self.section: counts} if self.section is not None else counts)
+        except OSError as e:
+            print(f"Could not update {self.name}: {e}", file=sys.stderr)
+            counts = self.counts
+            merge_counts(counts, pending)
+
+        with self._lock:
+            self.counts = counts
+
+def hash_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_bytes(data: bytes) -> str:
+    """SHA-256 of an in-memory file, equal to ``hash_file`` of the same bytes on disk"""
+    return hashlib.sha256(data).hexdigest()
+
+class ResultCache:
+    """Size-bounded on-disk cache of OCR results
+
+    Entries are stored as ``<dir>/<key[:2]>/<key>.json``. Reads bump the entry's
+    mtime, and writes evict the least recently used entries once the cache grows
+    past ``max_bytes``. Each process keeps a running total of the cache size from
+    its last scan plus its own writes, and only scans the directory when that
+    total crosses the limit; writes by other processes are picked up at that
+    scan, so a shared cache can briefly overshoot. Writes are atomic renames,
+    eviction runs under a lock file and the hit/miss counters are batched through
+    a ``CounterFile``, so several OCR processes can share one directory.
+    A process computing a missing entry ``claim``s its key (``<key>.claim``) so
+    that others missing it at the same time ``wait`` instead of repeating the work.
+    """
+
+    def __init__(self, cache_dir: str = None, max_mb: float = None):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = int((max_mb if max_mb is not None else DEFAULT_CACHE_MAX_MB) * 1024 * 1024)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.cache_dir / '.lock'
+        self.stats_path = self.cache_dir / 'stats.json'
+        self.counters = CounterFile(self.stats_path, name='OCR cache stats')
+        self._size: Optional[int] = None  # Bytes in the cache as of the last scan plus this process's writes
+
+    def make_key(self, file_hash: str, languages: List[str], version: str) -> str:
+        """Combine the content hash with everything else that changes the result"""
+        material = json.dumps({
+            'file': file_hash,
+            'languages': list(languages),
+            'version': version
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.json'
+
+    def _claim_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.claim'
+
+    def claim(self, key: str) -> bool:
+        """Announce that this process is computing ``key``; False when a live claim by another exists
+
+        Other processes that miss the same key can then ``wait`` for the result
+        instead of running OCR on the same file a second time.
+        """
+        path = self._claim_path(key)
+        path.parent.mkdir(exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._claim_alive(path):
+                    return False
+                try:
+                    os.remove(path)  # Abandoned; take it over
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'host': socket.gethostname(), 'pid': os.getpid()}, f)
+            return True
+        return False
+
+    def release(self, key: str):
+        try:
+            os.remove(self._claim_path(key))
+        except OSError:
+            pass
+
+    def _claim_alive(self, path: Path) -> bool:
+        """Whether a claim file belongs to a process that may still deliver its result"""
+        try:
+            if time.time() - path.stat().st_mtime > CLAIM_MAX_AGE:
+                return False
+            with open(path) as f:
+                owner = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            return True  # Being written right now
+        if owner.get('host') == socket.gethostname():
+            try:
+                os.kill(int(owner['pid']), 0)
+            except ProcessLookupError:
+                return False
+            except (OSError, KeyError, ValueError):
+                pass
+        return True
+
+    def wait(self, key: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait up to ``timeout`` seconds while another process holds a claim on ``key``, then ``get`` it"""
+        path = self._claim_path(key)
+        give_up = time.monotonic() + timeout if timeout is not None else None
+        while self._claim_alive(path):
+            if give_up is not None and time.monotonic() >= give_up:
+                return None
+            time.sleep(CLAIM_POLL_INTERVAL)
+        return self.get(key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for ``key`` or None, updating the hit/miss counters"""
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.counters.add({'misses': 1})
+            return None
+
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass  # Evicted by another process in the meantime
+
+        self.counters.add({'hits': 1})
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result and evict old entries if the cache is over its size limit"""
+        path = self._entry_path(key)
+        path.parent.mkdir(exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        atomic_write_json(path, result)
+        self.counters.add({'writes': 1})
+
+        if self._size is not None:
+            try:
+                self._size += path.stat().st_size - replaced
+            except OSError:
+                pass  # Evicted by another process in the meantime
+        if self._size is None or self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits in ``max_bytes``; rescans the cache size"""
+        with FileLock(self.lock_path):
+            entries = []
+            total = 0
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith('.json') or entry.name.startswith('.tmp-'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+            if total <= self.max_bytes:
+                self._size = total
+                return 0
+
+            # Evict down to 90%, so the running total takes several writes to cross the limit again
+            target = self.max_bytes * 0.9
+            removed = 0
+            for mtime, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+
+            self._size = total
+            self.counters.add({'evictions': removed})
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/write/eviction counters plus current size"""
+        self.counters.flush()
+        stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        stats.update(self.counters.read())
+
+        entries = 0
+        size = 0
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.json') and not entry.name.startswith('.tmp-'):
+                        entries += 1
+                        size += entry.stat().st_size
+
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes,
+            'cache_dir': str(self.cache_dir)
+        })
+        return stats
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+OCR Engines for Expense Management System
+Pluggable Tesseract backends: an in-process API pool when tesserocr is installed, pytesseract otherwise
+"""
+
+import os
+import sys
+import shlex
+import atexit
+import threading
+import importlib.util
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+TESSEROCR_AVAILABLE = _module_available('tesserocr')
+PYTESSERACT_AVAILABLE = _module_available('pytesseract')
+
+DEFAULT_ENGINE = os.environ.get('OCR_ENGINE') or 'auto'
+
+# Column order of Tesseract's TSV renderer, which is also the image_to_data dict layout
+TSV_COLUMNS = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+               'left', 'top', 'width', 'height', 'conf', 'text']
+
+def parse_config(config: str) -> Tuple[Optional[int], Optional[int], Dict[str, str]]:
+    """Split a Tesseract command-line config into (psm, oem, variables), as pytesseract would pass it"""
+    psm = oem = None
+    variables = {}
+    args = shlex.split(config or '')
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        value = args[index + 1] if index + 1 < len(args) else None
+        if arg == '--psm' and value is not None:
+            psm = int(value)
+            index += 1
+        elif arg == '--oem' and value is not None:
+            oem = int(value)
+            index += 1
+        elif arg == '-c' and value is not None and '=' in value:
+            name, _, setting = value.partition('=')
+            variables[name] = setting
+            index += 1
+        index += 1
+    return psm, oem, variables
+
+def parse_tsv(tsv: str) -> Dict[str, List]:
+    """Convert Tesseract TSV output into the dict that pytesseract.image_to_data returns"""
+    data: Dict[str, List] = {column: [] for column in TSV_COLUMNS}
+    for line in tsv.splitlines():
+        fields = line.split('\t')
+        if len(fields) < len(TSV_COLUMNS) - 1 or fields[0] == 'level':
+            continue
+        if len(fields) < len(TSV_COLUMNS):
+            fields.append('')
+        for column, value in zip(TSV_COLUMNS[:10], fields[:10]):
+            data[column].append(int(value))
+        data['conf'].append(float(fields[10]))
+        data['text'].append(fields[11])
+    return data
+
+class PytesseractEngine:
+    """Runs the tesseract binary once per call through pytesseract"""
+
+    name = 'pytesseract'
+
+    def image_to_data(self, image, lang: str, config: str, timeout: Optional[float] = None) -> Dict[str, List]:
+        """Word-level OCR data; ``timeout`` (seconds) kills the tesseract process and raises RuntimeError"""
+        import pytesseract
+        return pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT, config=config,
+                                         timeout=timeout or 0)
+
+    def detect_script(self, image) -> Optional[Tuple[str, float]]:
+        """(script name, confidence) from Tesseract's orientation and script detection"""
+        import pytesseract
+        osd = pytesseract.image_to_osd(image, config='--psm 0', output_type=pytesseract.Output.DICT)
+        return osd['script'], float(osd['script_conf'])
+
+    def close(self):
+        pass
+
+class _APIHandle:
+    """An initialized PyTessBaseAPI plus the variables changed on it since initialization"""
+
+    def __init__(self, api):
+        self.api = api
+        self.defaults: Dict[str, str] = {}
+
+    def configure(self, psm: Optional[int], variables: Dict[str, str]):
+        # Restore variables a previous config changed, so configs do not leak into each other
+        for name in list(self.defaults):
+            if name not in variables:
+                self.api.SetVariable(name, self.defaults.pop(name))
+        for name, value in variables.items():
+            if name not in self.defaults:
+                self.defaults[name] = self.api.GetVariableAsString(name) or ''
+            if not self.api.SetVariable(name, value):
+                raise ValueError(f"Unknown Tesseract variable: {name}")
+        self.api.SetPageSegMode(psm if psm is not None else 3)
+
+class TesserocrEngine:
+    """Keeps initialized Tesseract API handles in process and feeds them image buffers
+
+    Handles are pooled per language set (and OCR engine mode), so each model is
+    loaded once per concurrently running pass instead of once per call. A handle
+    is checked out for the duration of one recognition, so threads never share one.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, tessdata_dir: Optional[str] = None):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.tessdata_dir = tessdata_dir or os.environ.get('TESSDATA_PREFIX')
+        self._idle: Dict[Tuple[str, Optional[int]], List[_APIHandle]] = {}
+        self._handles: List[_APIHandle] = []
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _create(self, lang: str, oem: Optional[int]) -> _APIHandle:
+        kwargs = {"lang": lang}
+        if self.tessdata_dir:
+            kwargs["path"] = self.tessdata_dir
+        if oem is not None:
+            kwargs["oem"] = self._tesserocr.OEM(oem)
+        handle = _APIHandle(self._tesserocr.PyTessBaseAPI(**kwargs))
+        with self._lock:
+            self._handles.append(handle)
+        return handle
+
+    @contextmanager
+    def _checkout(self, lang: str, oem: Optional[int]):
+        key = (lang, oem)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            handle = idle.pop() if idle else None
+        if handle is None:
+            handle = self._create(lang, oem)
+        try:
+            yield handle
+        finally:
+            handle.api.Clear()
+            with self._lock:
+                self._idle.setdefault(key, []).append(handle)
+
+    def _set_image(self, api, image):
+        """Hand raw pixels to Tesseract, avoiding the encode/decode round trip of SetImage"""
+        if hasattr(image, 'ndim'):
+            import numpy as np
+            if image.ndim == 2 and image.dtype == np.uint8:
+                height, width = image.shape
+                api.SetImageBytes(np.ascontiguousarray(image).tobytes(), width, height, 1, width)
+                return
+            from PIL import Image
+            image = Image.fromarray(image)
+
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB' if image.mode in ('RGBA', 'P', 'CMYK') else 'L')
+        bytes_per_pixel = 1 if image.mode == 'L' else 3
+        width, height = image.size
+        api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+
+    def image_to_data(self, image, lang: str, config: str, timeout: Optional[float] = None) -> Dict[str, List]:
+        """Word-level OCR data; ``timeout`` (seconds) cancels recognition and raises RuntimeError"""
+        psm, oem, variables = parse_config(config)
+        with self._checkout(lang, oem) as handle:
+            handle.configure(psm, variables)
+            self._set_image(handle.api, image)
+            if not handle.api.Recognize(max(1, int(timeout * 1000)) if timeout else 0):
+                raise RuntimeError("Tesseract recognition failed or timed out")
+            return parse_tsv(handle.api.GetTSVText(0) or '')
+
+    def detect_script(self, image) -> Optional[Tuple[str, float]]:
+        """(script name, confidence) from Tesseract's orientation and script detection"""
+        with self._checkout('osd', None) as handle:
+            handle.configure(0, {})  # PSM 0: orientation and script detection only
+            self._set_image(handle.api, image)
+            osd = handle.api.DetectOrientationScript()
+        if not osd:
+            return None
+        return osd['script_name'], float(osd['script_conf'])
+
+    def close(self):
+        """Release every Tesseract handle"""
+        with self._lock:
+            handles, self._handles = self._handles, []
+            self._idle = {}
+        for handle in handles:
+            try:
+                handle.api.End()
+            except Exception:
+                pass
+
+def available_engines() -> List[str]:
+    engines = []
+    if TESSEROCR_AVAILABLE:
+        engines.append('tesserocr')
+    if PYTESSERACT_AVAILABLE:
+        engines.append('pytesseract')
+    return engines
+
+_engines: Dict[str, Any] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(name: str = None):
+    """Shared engine instance: 'tesserocr', 'pytesseract' or 'auto' (in-process when available)
+
+    Returns None when no backend is installed. A tesserocr backend that cannot be
+    initialized falls back to pytesseract.
+    """
+    name = name or DEFAULT_ENGINE
+    if name == 'auto':
+        candidates = available_engines()
+    else:
+        candidates = [name] + [engine for engine in available_engines() if engine != name]
+
+    with _engines_lock:
+        for candidate in candidates:
+            if candidate in _engines:
+                return _engines[candidate]
+            try:
+                if candidate == 'tesserocr' and TESSEROCR_AVAILABLE:
+                    engine = TesserocrEngine()
+                elif candidate == 'pytesseract' and PYTESSERACT_AVAILABLE:
+                    engine = PytesseractEngine()
+                else:
+                    if candidate == name:
+                        print(f"OCR engine {candidate} not available, falling back", file=sys.stderr)
+                    continue
+            except Exception as e:
+                print(f"OCR engine {candidate} failed to initialize: {e}", file=sys.stderr)
+                continue
+            _engines[candidate] = engine
+            return engine
+    return None
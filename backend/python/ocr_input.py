@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Receipt Input for Expense Management System
+In-memory receipt files read from stdin or a shared-memory segment, typed by their magic bytes
+"""
+
+import io
+import re
+import sys
+from typing import Optional
+
+# Leading bytes of each supported file format; WebP is checked separately
+MAGIC_NUMBERS = [
+    (b'%PDF-', 'pdf'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'BM', 'bmp')
+]
+PDF_HEADER_SEARCH = 1024  # PDF readers accept junk before the header within this many bytes
+TEXT_SNIFF_BYTES = 4096  # Bytes of a text file inspected to tell HTML, email and plain text apart
+HTML_PATTERN = re.compile(rb'^\s*(<!--.*?-->\s*)*<(!doctype\s+html|html|head|body|table|div|meta)\b',
+                          re.IGNORECASE | re.DOTALL)
+# An email starts with header lines such as 'From: ...' or 'Received: ...'
+EMAIL_PATTERN = re.compile(rb'^(?:[!-9;-~]+:[^\r\n]*\r?\n(?:[ \t][^\r\n]*\r?\n)*)+\r?\n')
+EMAIL_HEADERS = re.compile(rb'^(from|received|return-path|mime-version|message-id|date|subject|delivered-to):',
+                           re.IGNORECASE | re.MULTILINE)
+
+def detect_format(data: bytes) -> Optional[str]:
+    """'pdf', 'jpeg', 'png', 'tiff', 'bmp' or 'webp' from the first bytes of a file, or None
+
+    Text files are e-receipts: 'html', 'eml' (an email) or 'text'.
+    """
+    head = bytes(data[:16])
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for magic, kind in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    if b'%PDF-' in bytes(data[:PDF_HEADER_SEARCH]):
+        return 'pdf'
+    return _text_format(bytes(data[:TEXT_SNIFF_BYTES]))
+
+def _text_format(head: bytes) -> Optional[str]:
+    head = head.lstrip(b'\xef\xbb\xbf')
+    if not head.strip() or b'\x00' in head:
+        return None
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the sniff window is still text
+        if e.start < len(head) - 3:
+            return None
+    if HTML_PATTERN.match(head):
+        return 'html'
+    if EMAIL_PATTERN.match(head) and EMAIL_HEADERS.search(head):
+        return 'eml'
+    return 'text'
+
+class ReceiptBytes:
+    """A receipt file held in memory instead of on disk
+
+    Accepted wherever the pipeline takes a receipt path. ``name`` stands in for
+    the path in logs, trace files and the duplicate index.
+    """
+
+    def __init__(self, data: bytes, name: str = 'stdin'):
+        self.data = data
+        self.name = name
+        self.format = detect_format(data)
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.format == 'pdf'
+
+    def stream(self) -> io.BytesIO:
+        """A file object over the bytes, for libraries that only read files"""
+        return io.BytesIO(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __str__(self) -> str:
+        return self.name
+
+def read_stdin(name: str = 'stdin') -> ReceiptBytes:
+    """The receipt file piped to this process"""
+    return ReceiptBytes(sys.stdin.buffer.read(), name)
+
+def read_shared_memory(segment: str, size: Optional[int] = None, name: Optional[str] = None) -> ReceiptBytes:
+    """Copy a receipt out of a named shared-memory segment written by another process
+
+    The segment belongs to its creator: it is closed here but never unlinked.
+    ``size`` is the length of the receipt file; segments are rounded up to whole
+    pages, so without it the zero padding is read as well. Image decoders ignore
+    trailing bytes and the padding is stripped from PDFs.
+    """
+    from multiprocessing import shared_memory
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=segment, track=False)
+    else:
+        # Attaching registers the segment with the resource tracker, which would
+        # unlink it when this process exits
+        shm = shared_memory.SharedMemory(name=segment)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    try:
+        end = shm.size if size is None else min(int(size), shm.size)
+        data = bytes(shm.buf[:end])
+    finally:
+        shm.close()
+
+    if size is None and detect_format(data) == 'pdf':
+        data = data.rstrip(b'\x00')
+    return ReceiptBytes(data, name or f'shm:{segment}')
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+OCR Language Selection for Expense Management System
+Narrows the Tesseract language set per receipt from script detection and per-company language statistics
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ocr_cache import CounterFile, DEFAULT_CACHE_DIR
+
+DEFAULT_LANGUAGE_STATS_PATH = os.environ.get('OCR_LANGUAGE_STATS') or os.path.join(DEFAULT_CACHE_DIR, 'language_stats.json')
+MIN_SCRIPT_CONFIDENCE = 1.5  # Tesseract OSD script confidence below which the full language list is used
+MIN_COMPANY_RECEIPTS = 5  # Receipts seen for a company before its statistics replace script detection
+MIN_COMPANY_SHARE = 0.9  # Share of a company's receipts one language needs to be used on its own
+MIN_RECOGNITION_CONFIDENCE = 0.6  # Mean word confidence (0-1) below which a narrowed pass is redone with every language
+DETECTION_MAX_SIDE = 1600  # Script detection runs on a copy downscaled to at most this many pixels
+
+# Writing system of each Tesseract language; languages not listed are never dropped
+LANGUAGE_SCRIPTS = {
+    'eng': 'Latin', 'fra': 'Latin', 'deu': 'Latin', 'spa': 'Latin', 'ita': 'Latin', 'por': 'Latin',
+    'nld': 'Latin', 'swe': 'Latin', 'dan': 'Latin', 'nor': 'Latin', 'fin': 'Latin', 'pol': 'Latin',
+    'ces': 'Latin', 'tur': 'Latin', 'ron': 'Latin', 'hun': 'Latin', 'vie': 'Latin', 'ind': 'Latin',
+    'rus': 'Cyrillic', 'ukr': 'Cyrillic', 'bul': 'Cyrillic', 'srp': 'Cyrillic',
+    'ell': 'Greek', 'ara': 'Arabic', 'fas': 'Arabic', 'heb': 'Hebrew',
+    'chi_sim': 'Han', 'chi_tra': 'Han', 'jpn': 'Japanese', 'kor': 'Hangul',
+    'hin': 'Devanagari', 'tha': 'Thai'
+}
+
+# Frequent receipt words that identify a language among others of the same script
+LANGUAGE_MARKERS = {
+    'eng': {'the', 'and', 'thank', 'you', 'tax', 'change', 'subtotal', 'receipt', 'amount', 'cash'},
+    'fra': {'merci', 'tva', 'le', 'la', 'les', 'et', 'sous-total', 'reçu', 'montant', 'espèces', 'ticket'},
+    'deu': {'summe', 'mwst', 'danke', 'und', 'der', 'die', 'das', 'zwischensumme', 'bar', 'betrag', 'quittung'},
+    'spa': {'gracias', 'iva', 'el', 'los', 'y', 'importe', 'efectivo', 'recibo', 'cambio'},
+    'ita': {'grazie', 'iva', 'il', 'di', 'totale', 'importo', 'contanti', 'scontrino', 'resto'},
+    'por': {'obrigado', 'iva', 'o', 'os', 'e', 'valor', 'dinheiro', 'recibo', 'troco'},
+    'nld': {'totaal', 'btw', 'bedankt', 'het', 'en', 'bedrag', 'contant', 'kassabon', 'wisselgeld'}
+}
+
+WORD_PATTERN = re.compile(r'[^\W\d_][^\W\d_\-]*(?:-[^\W\d_]+)?')
+
+def languages_for_script(languages: List[str], script: str) -> List[str]:
+    """The requested languages written in ``script``, plus any whose script is unknown"""
+    return [language for language in languages if LANGUAGE_SCRIPTS.get(language, script) == script]
+
+def identify_language(text: str, languages: List[str]) -> Optional[str]:
+    """Language among ``languages`` whose marker words occur most in ``text``; None when undecided"""
+    if len(languages) == 1:
+        return languages[0]
+    words = WORD_PATTERN.findall(text.lower())
+    scores = {
+        language: sum(1 for word in words if word in LANGUAGE_MARKERS[language])
+        for language in languages if language in LANGUAGE_MARKERS
+    }
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    if not ranked or ranked[0][1] == 0 or (len(ranked) > 1 and ranked[0][1] == ranked[1][1]):
+        return None
+    return ranked[0][0]
+
+class LanguageStats:
+    """Per-company counts of identified receipt languages, shared by processes through a JSON file
+
+    Counts are kept in memory and merged into the file under a lock every few
+    receipts (and at exit), like the PSM scheduler statistics.
+    """
+
+    def __init__(self, stats_path: str = None):
+        self.stats_path = Path(stats_path or DEFAULT_LANGUAGE_STATS_PATH)
+        self.counters = CounterFile(self.stats_path, section='companies', name='language statistics')
+
+    def dominant_language(self, company: Optional[str], languages: List[str]) -> Optional[str]:
+        """The language that almost all of a company's receipts were in, if it is one of ``languages``"""
+        counts: Dict[str, int] = self.counters.get(company or '', {})
+        total = sum(counts.values())
+        if total < MIN_COMPANY_RECEIPTS:
+            return None
+        language = max(counts, key=counts.get)
+        if counts[language] / float(total) < MIN_COMPANY_SHARE or language not in languages:
+            return None
+        return language
+
+    def record(self, company: Optional[str], language: str):
+        self.counters.add({company or '': {language: 1}})
+
+    def flush(self):
+        """Merge pending counts into the stats file and pick up other processes' counts"""
+        self.counters.flush()
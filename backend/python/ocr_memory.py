@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+OCR Memory Budgets for Expense Management System
+Peak-RSS measurement per job and the memory cap that sizes, bands and serializes image work to fit
+"""
+
+import sys
+import threading
+from typing import Dict, List, Any, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1024 * 1024
+# Fraction of the headroom a stage may plan to use; the rest absorbs estimation error and the interpreter's own growth
+MEMORY_SAFETY = 0.8
+# Rough peak bytes per pixel of each stage, measured on multi-megapixel scans
+PREPROCESS_BYTES_PER_PIXEL = 3.0  # Grayscale decode, banded denoise output and region crop or rotation
+OCR_PASS_BYTES_PER_PIXEL = 6.0  # One Tesseract pass: pixel copy handed over plus its internal grey and binary images
+# Never decode a receipt at less than this scale to fit a budget; past it text becomes unreadable
+MEMORY_MIN_SCALE = 0.25
+DRAFT_REDUCTIONS = (2, 4, 8)  # Scale denominators libjpeg can decode at directly (cv2.IMREAD_REDUCED_*)
+BAND_ROWS = 512  # Rows denoised and thresholded at a time in memory-bounded preprocessing
+BAND_OVERLAP = 16  # Rows of context on each side of a band; covers the 21 px NLM search window plus its 7 px template
+
+def _proc_status_kb(field: str) -> Optional[int]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size of this process in MB, or None where it cannot be read"""
+    kb = _proc_status_kb('VmRSS')
+    return kb / 1024.0 if kb is not None else None
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size in MB since start-up or the last ``reset_peak_rss``"""
+    kb = _proc_status_kb('VmHWM')
+    if kb is not None:
+        return kb / 1024.0
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / MB if sys.platform == 'darwin' else peak / 1024.0
+
+def reset_peak_rss() -> bool:
+    """Restart peak-RSS tracking from the current RSS (Linux), so a long-lived worker can report each job
+
+    Returns False where the kernel does not support it; the peak then covers the
+    whole process lifetime.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def draft_reduction(scale: float) -> int:
+    """Smallest libjpeg scale denominator that gets down to ``scale``, never past MEMORY_MIN_SCALE; 1 for full size"""
+    if scale >= 1.0:
+        return 1
+    allowed = [reduction for reduction in DRAFT_REDUCTIONS if 1.0 / reduction >= MEMORY_MIN_SCALE]
+    for reduction in allowed:
+        if 1.0 / reduction <= scale:
+            return reduction
+    return allowed[-1]
+
+class MemoryBudget:
+    """Peak-RSS cap for one receipt, plus the record of what was changed to stay under it
+
+    Steps that change the result (decoding at reduced scale, rasterizing PDFs at a
+    lower DPI) are listed in ``degraded``; steps that only trade speed for memory
+    (serial OCR passes and pages) in ``adapted``. A budget without a cap never
+    changes anything, so code paths can take one unconditionally; its
+    ``report`` still carries the job's peak RSS.
+    """
+
+    def __init__(self, max_rss_mb: Optional[float] = None):
+        self.max_rss_mb = max_rss_mb
+        self.degraded: List[Dict[str, Any]] = []
+        self.adapted: List[Dict[str, Any]] = []
+        self.peak_scope = "process"
+        self._lock = threading.Lock()
+
+    def start(self) -> 'MemoryBudget':
+        """Begin a job: measure its peak from here on where the kernel allows it"""
+        if reset_peak_rss():
+            self.peak_scope = "job"
+        return self
+
+    @property
+    def active(self) -> bool:
+        return self.max_rss_mb is not None
+
+    def available(self) -> float:
+        """Bytes a stage may plan to allocate, infinite without a cap"""
+        if self.max_rss_mb is None:
+            return float('inf')
+        current = rss_mb()
+        if current is None:
+            current = 0.0
+        return max(0.0, (self.max_rss_mb - current) * MB * MEMORY_SAFETY)
+
+    def fits(self, nbytes: float) -> bool:
+        return nbytes <= self.available()
+
+    def scale_for(self, pixels: float, bytes_per_pixel: float) -> float:
+        """Side scale (at most 1) at which an image of ``pixels`` fits the headroom"""
+        needed = pixels * bytes_per_pixel
+        if needed <= 0 or self.fits(needed):
+            return 1.0
+        return (self.available() / needed) ** 0.5
+
+    def concurrency(self, workers: int, nbytes_each: float) -> int:
+        """How many of ``workers`` tasks of ``nbytes_each`` can run at once, at least one"""
+        if workers <= 1 or self.max_rss_mb is None:
+            return workers
+        return max(1, min(workers, int(self.available() // max(1.0, nbytes_each))))
+
+    def _record(self, entries: List[Dict[str, Any]], step: str, details: Dict[str, Any]):
+        # Repeated steps (e.g. one per PDF page) are merged
+        with self._lock:
+            for entry in entries:
+                if entry["step"] == step:
+                    entry["count"] = entry.get("count", 1) + 1
+                    return
+            entries.append(dict(details, step=step))
+
+    def degrade(self, step: str, **details):
+        """Record a step that changes the OCR result"""
+        self._record(self.degraded, step, details)
+
+    def adapt(self, step: str, **details):
+        """Record a step that only costs time"""
+        self._record(self.adapted, step, details)
+
+    def report(self) -> Dict[str, Any]:
+        """The ``memory`` entry of a result: peak RSS and, under a cap, the steps taken"""
+        peak = peak_rss_mb()
+        report = {"peak_rss_mb": round(peak, 1) if peak is not None else None, "peak_scope": self.peak_scope}
+        if self.max_rss_mb is not None:
+            report["max_rss_mb"] = self.max_rss_mb
+            report["within_budget"] = peak is None or peak <= self.max_rss_mb
+            if self.degraded:
+                report["degraded"] = self.degraded
+            if self.adapted:
+                report["adapted"] = self.adapted
+        return report
+
+NO_MEMORY_BUDGET = MemoryBudget()
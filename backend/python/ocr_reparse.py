@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Receipt Re-parsing for Expense Management System
+Re-runs field extraction and categorization on stored OCR results in bulk, without Tesseract
+"""
+
+import os
+import sys
+import json
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+from receipt_parser import parse_receipt_data, PARSER_VERSION
+from expense_categorizer import categorize_expense, CATEGORIZER_VERSION
+
+# Stamped on every result as "parser_version"; records already at this version are not re-parsed
+PARSE_VERSION = f"{PARSER_VERSION}.{CATEGORIZER_VERSION}"
+REPARSE_CHUNKSIZE = 500  # Records per task sent to a worker; large chunks keep pickling overhead low
+
+def _ocr_fields(record: Dict[str, Any]) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+    """Extracted text and word boxes of a stored result, flat or nested under "ocr_data" """
+    ocr_data = record.get("ocr_data") if isinstance(record.get("ocr_data"), dict) else record
+    return ocr_data.get("extracted_text"), ocr_data.get("text_blocks")
+
+def reparse_record(record: Dict[str, Any], company: Optional[str] = None, force: bool = False) -> Optional[Dict[str, Any]]:
+    """Record with fresh parsed_data and suggested_category, or None when it is current or has no text"""
+    if not force and record.get("parser_version") == PARSE_VERSION:
+        return None
+    text, text_blocks = _ocr_fields(record)
+    if not isinstance(text, str):
+        return None
+
+    parsed_data = parse_receipt_data(text, text_blocks)
+    updated = dict(record)
+    updated["parsed_data"] = parsed_data
+    updated["suggested_category"] = categorize_expense(
+        parsed_data.get("merchant_name", ""),
+        parsed_data.get("items", []),
+        company=record.get("company") or company
+    )
+    updated["parser_version"] = PARSE_VERSION
+    return updated
+
+# Per-process options set up by _init_worker
+_worker_company = None
+_worker_force = False
+
+def _init_worker(company: Optional[str], force: bool):
+    global _worker_company, _worker_force
+    _worker_company = company
+    _worker_force = force
+
+def _reparse_line(line: str) -> Tuple[str, str]:
+    """(status, output line) for one JSON line; lines that are not re-parsed pass through unchanged"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return "invalid", line
+    if not isinstance(record, dict):
+        return "invalid", line
+    try:
+        updated = reparse_record(record, _worker_company, _worker_force)
+    except Exception as e:
+        print(f"Re-parse failed for {record.get('path') or record.get('id')}: {e}", file=sys.stderr)
+        return "failed", line
+    if updated is None:
+        return ("skipped" if record.get("parser_version") == PARSE_VERSION else "invalid"), line
+    return "reparsed", json.dumps(updated, separators=(',', ':'))
+
+def iter_record_lines(inputs: Iterable[str]) -> Iterator[str]:
+    """Non-empty lines of JSON-lines files; '-' (or no inputs) reads stdin"""
+    for spec in (list(inputs) or ['-']):
+        stream = sys.stdin if spec == '-' else open(spec)
+        try:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+def run_reparse(inputs: Iterable[str], output_path: Optional[str] = None, jobs: Optional[int] = None,
+                company: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    """Re-parse stored OCR results from JSON-lines inputs on a process pool
+
+    Output keeps input order: re-parsed records are rewritten, current ones
+    (same ``parser_version``) and records without text pass through unchanged,
+    so the output can replace the archive. ``company`` is the category
+    dictionary for records that do not name one; ``force`` ignores versions.
+    """
+    inputs = list(inputs)
+    if output_path and any(spec != '-' and os.path.abspath(spec) == os.path.abspath(output_path) for spec in inputs):
+        raise ValueError("Re-parse output must not overwrite an input file")
+    jobs = jobs or os.cpu_count() or 1
+    summary = {"reparsed": 0, "skipped": 0, "invalid": 0, "failed": 0}
+    start = time.time()
+    out = open(output_path, 'w') if output_path else sys.stdout
+
+    pool = None
+    try:
+        lines = iter_record_lines(inputs)
+        if jobs == 1:
+            _init_worker(company, force)
+            results = map(_reparse_line, lines)
+        else:
+            # Workers get raw lines and return serialized ones, so the parent only does I/O
+            pool = Pool(processes=jobs, initializer=_init_worker, initargs=(company, force))
+            results = pool.imap(_reparse_line, lines, chunksize=REPARSE_CHUNKSIZE)
+        for status, line in results:
+            summary[status] += 1
+            out.write(line + '\n')
+        if pool is not None:
+            pool.close()
+            pool.join()
+            pool = None
+    finally:
+        if pool is not None:
+            # Only after an error: stop the workers without draining their queue
+            pool.terminate()
+        if out is not sys.stdout:
+            out.close()
+        else:
+            out.flush()
+
+    elapsed = time.time() - start
+    total = sum(summary.values())
+    summary.update({
+        "parser_version": PARSE_VERSION,
+        "elapsed_seconds": round(elapsed, 3),
+        "records_per_second": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        "jobs": jobs
+    })
+    return summary
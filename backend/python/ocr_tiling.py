@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+OCR Tiling for Expense Management System
+Splits long receipts into overlapping strips at whitespace gaps and stitches the per-strip OCR data back together
+"""
+
+from typing import Dict, List, Optional
+
+from ocr_engine import TSV_COLUMNS
+
+TILE_MIN_ASPECT = 3.0  # Height / width from which a receipt counts as long
+TILE_MIN_HEIGHT = 800  # Rows per strip at least; about 20 lines at the normalized text height
+TILE_OVERLAP = 120  # Rows each strip extends past its cut; several text lines at the normalized height
+TILE_INK_FRACTION = 0.01  # Extra dark pixels per row, as a fraction of the width, still counted as the gap
+TILE_SMOOTH_ROWS = 9  # Rows averaged in the ink profile
+
+def tile_count(width: int, height: int, workers: int) -> int:
+    """Number of strips to cut a receipt into; 1 means recognize it whole"""
+    if width <= 0 or height / float(width) < TILE_MIN_ASPECT:
+        return 1
+    return max(1, min(workers, height // TILE_MIN_HEIGHT))
+
+def plan_tiles(binary, count: int, overlap: int = TILE_OVERLAP) -> List[Dict[str, int]]:
+    """Cut a thresholded image (dark text on white) into ``count`` horizontal strips
+
+    Each cut is moved to the middle of the widest whitespace gap (the emptiest rows
+    of the ink profile) near its evenly spaced position, so text lines are not split. A strip spans ``top``..``bottom``
+    including ``overlap`` rows past each cut and owns the rows ``own_top``..``own_bottom``
+    between its cuts; stitching keeps a word only in the strip that owns its centre.
+    """
+    import numpy as np
+    height, width = binary.shape[:2]
+    if count < 2:
+        return [{"top": 0, "bottom": height, "own_top": 0, "own_bottom": height}]
+
+    # Ink per row, smoothed so that speckle left by thresholding does not hide the gaps between lines
+    ink = np.count_nonzero(binary < 128, axis=1).astype(np.float32)
+    ink = np.convolve(ink, np.ones(TILE_SMOOTH_ROWS, dtype=np.float32) / TILE_SMOOTH_ROWS, mode='same')
+    tolerance = max(1.0, width * TILE_INK_FRACTION)
+
+    step = height / float(count)
+    window = int(step / 4)
+    cuts = [0]
+    for index in range(1, count):
+        target = int(index * step)
+        low, high = max(cuts[-1] + 1, target - window), min(height - 1, target + window)
+        # Rows as empty as the emptiest one near the target, as runs; cut in the middle of the widest
+        quiet = (ink[low:high] <= ink[low:high].min() + tolerance).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], quiet, [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        widest = int(np.argmax(ends - starts))
+        cuts.append(low + int(starts[widest] + ends[widest]) // 2)
+    cuts.append(height)
+
+    return [
+        {
+            "top": max(0, own_top - overlap),
+            "bottom": min(height, own_bottom + overlap),
+            "own_top": own_top,
+            "own_bottom": own_bottom
+        }
+        for own_top, own_bottom in zip(cuts, cuts[1:])
+    ]
+
+def stitch_tile_data(tiles: List[Dict[str, int]], tile_data: List[Optional[Dict[str, List]]]) -> Dict[str, List]:
+    """Merge per-strip image_to_data dicts into one dict in page coordinates
+
+    Words are shifted by their strip's offset and kept only when their vertical
+    centre lies in the rows that strip owns, which drops the copies read twice in
+    the overlaps. Block numbers are renumbered so blocks from different strips
+    never merge into one paragraph.
+    """
+    stitched: Dict[str, List] = {column: [] for column in TSV_COLUMNS}
+    blocks: Dict[tuple, int] = {}
+
+    for tile_index, (tile, data) in enumerate(zip(tiles, tile_data)):
+        if not data:
+            continue
+        for i, word in enumerate(data['text']):
+            if not word or not str(word).strip():
+                continue
+            top = int(data['top'][i]) + tile["top"]
+            centre = top + int(data['height'][i]) / 2.0
+            if not tile["own_top"] <= centre < tile["own_bottom"]:
+                continue
+            block = blocks.setdefault((tile_index, data['page_num'][i], data['block_num'][i]), len(blocks) + 1)
+            for column in TSV_COLUMNS:
+                stitched[column].append(data[column][i])
+            stitched['page_num'][-1] = 1
+            stitched['block_num'][-1] = block
+            stitched['top'][-1] = top
+
+    return stitched
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+OCR Pipeline Tracing for Expense Management System
+Per-stage timing spans, a JSON-lines trace log and optional cProfile dumps per job
+"""
+
+import os
+import json
+import time
+import cProfile
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from ocr_cache import FileLock
+
+class Trace:
+    """Collects timing spans for one OCR job
+
+    Spans may be recorded from worker threads; ``list.append`` keeps that safe.
+    """
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block; the yielded dict can be filled with attributes such as confidence"""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.perf_counter() - start, start=start, **attrs)
+
+    def record(self, name: str, duration: float, start: Optional[float] = None, **attrs):
+        span = {
+            "name": name,
+            "start_ms": round(1000 * ((start if start is not None else time.perf_counter() - duration) - self._origin), 3),
+            "duration_ms": round(1000 * duration, 3)
+        }
+        span.update(attrs)
+        self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.spans, key=lambda span: span["start_ms"])
+        return {
+            "total_ms": round(1000 * (time.perf_counter() - self._origin), 3),
+            "spans": ordered
+        }
+
+class NullTrace(Trace):
+    """Trace that records nothing, used when the caller does not want spans"""
+
+    def record(self, name: str, duration: float, start: Optional[float] = None, **attrs):
+        pass
+
+NULL_TRACE = NullTrace()
+
+def stage_totals(trace: Dict[str, Any]) -> Dict[str, float]:
+    """Sum span durations by name, e.g. all ``psm`` passes of one job"""
+    totals: Dict[str, float] = {}
+    for span in trace.get("spans", []):
+        totals[span["name"]] = round(totals.get(span["name"], 0.0) + span["duration_ms"], 3)
+    return totals
+
+def append_trace(trace_file: str, image_path: str, result: Dict[str, Any]):
+    """Append one summary line per job to a JSON-lines trace file shared by all workers"""
+    trace = result.get("trace", {})
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "path": image_path,
+        "success": bool(result.get("success")) and "note" not in result,
+        "cache_hit": bool(result.get("cache", {}).get("hit")),
+        "total_ms": trace.get("total_ms"),
+        "peak_rss_mb": result.get("memory", {}).get("peak_rss_mb"),
+        "stages": stage_totals(trace),
+        "psm": [
+            {key: span.get(key) for key in ("config", "confidence", "duration_ms")}
+            for span in trace.get("spans", []) if span["name"] == "psm"
+        ]
+    }
+    path = Path(trace_file)
+    with FileLock(path.with_name(path.name + '.lock')):
+        with open(path, 'a') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+def summarize_trace_file(trace_file: str) -> Dict[str, Any]:
+    """Aggregate counters and per-stage latency over every job in a trace file"""
+    jobs = successes = cache_hits = 0
+    totals: List[float] = []
+    peaks: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    psm_configs: Dict[str, Dict[str, float]] = {}
+
+    with open(trace_file) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            jobs += 1
+            successes += record.get("success", False)
+            cache_hits += record.get("cache_hit", False)
+            if record.get("total_ms") is not None:
+                totals.append(record["total_ms"])
+            if record.get("peak_rss_mb") is not None:
+                peaks.append(record["peak_rss_mb"])
+            for name, duration in record.get("stages", {}).items():
+                stages.setdefault(name, []).append(duration)
+            for attempt in record.get("psm", []):
+                stats = psm_configs.setdefault(attempt.get("config") or "", {"runs": 0, "total_ms": 0.0})
+                stats["runs"] += 1
+                stats["total_ms"] += attempt.get("duration_ms") or 0.0
+
+    def describe(values: List[float]) -> Dict[str, float]:
+        ordered = sorted(values)
+        return {
+            "count": len(ordered),
+            "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+            "p50_ms": ordered[len(ordered) // 2] if ordered else 0.0,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        }
+
+    return {
+        "jobs": jobs,
+        "successes": successes,
+        "cache_hits": cache_hits,
+        "job_latency": describe(totals),
+        "peak_rss_mb": {
+            "max": max(peaks) if peaks else None,
+            "p50": sorted(peaks)[len(peaks) // 2] if peaks else None
+        },
+        "stages": {name: describe(values) for name, values in sorted(stages.items())},
+        "psm_configs": {
+            config: {"runs": stats["runs"], "mean_ms": round(stats["total_ms"] / stats["runs"], 3)}
+            for config, stats in psm_configs.items() if stats["runs"]
+        }
+    }
+
+def run_profiled(profile_dir: str, image_path: str, func, *args, **kwargs):
+    """Run ``func`` under cProfile and dump the stats to ``<profile_dir>/<name>-<time>.pstats``"""
+    os.makedirs(profile_dir, exist_ok=True)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        name = os.path.splitext(os.path.basename(image_path))[0] or 'job'
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        profiler.dump_stats(os.path.join(profile_dir, f'{name}-{stamp}-{os.getpid()}.pstats'))
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Upload Watcher for Expense Management System
+Recognizes receipts as soon as they land in the upload directory so the request path finds their results in the OCR cache
+"""
+
+import os
+import sys
+import time
+import heapq
+import signal
+import itertools
+import traceback
+import importlib.util
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from ocr_cache import atomic_write_json, DEFAULT_CACHE_DIR
+from ocr_batch import SUPPORTED_EXTENSIONS, _init_worker, _process_one
+
+INOTIFY_AVAILABLE = importlib.util.find_spec('inotify_simple') is not None
+
+DEFAULT_WATCH_METRICS_PATH = os.environ.get('OCR_WATCH_METRICS') or os.path.join(DEFAULT_CACHE_DIR, 'watcher_metrics.json')
+DEFAULT_MAX_QUEUE = 100  # Receipts waiting for a worker; past it the lowest-priority one is shed
+POLL_INTERVAL = 1.0  # Seconds between directory scans when inotify is unavailable
+SETTLE_SECONDS = 1.0  # A scanned file unchanged for this long counts as completely written
+TICK_SECONDS = 0.1  # Longest the loop waits for file events before refilling free workers
+METRICS_INTERVAL = 1.0  # Seconds between metrics file updates
+LATENCY_WINDOW = 200  # Recent uploads the latency percentiles are computed over
+
+# Queue priorities, lowest first: new uploads before back-fill of files that were already there
+UPLOAD = 0
+BACKFILL = 1
+
+def list_receipts(directory: str) -> List[Tuple[str, float]]:
+    """(path, mtime) of the receipt files directly in ``directory``"""
+    receipts = []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError as e:
+        print(f"Could not scan {directory}: {e}", file=sys.stderr)
+        return receipts
+    for entry in entries:
+        if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTENSIONS:
+            continue
+        try:
+            if entry.is_file():
+                receipts.append((entry.path, entry.stat().st_mtime))
+        except OSError:
+            continue  # Removed while scanning
+    return receipts
+
+class PollingDetector:
+    """Reports new receipt files by rescanning the directory
+
+    A file is reported once its size and mtime have stayed the same for
+    SETTLE_SECONDS, so uploads still being written are not picked up half done.
+    """
+
+    mode = 'poll'
+
+    def __init__(self, directory: str, interval: float = POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.reported: Set[str] = {path for path, _ in list_receipts(directory)}
+        self.candidates: Dict[str, Tuple[int, float, float]] = {}
+        self.next_scan = 0.0
+
+    def events(self, timeout: float) -> List[Tuple[str, float]]:
+        now = time.monotonic()
+        if now < self.next_scan:
+            time.sleep(min(timeout, self.next_scan - now))
+            return []
+        self.next_scan = now + self.interval
+
+        present = set()
+        ready = []
+        for path, mtime in list_receipts(self.directory):
+            present.add(path)
+            if path in self.reported:
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            previous = self.candidates.get(path)
+            if previous is None or previous[:2] != (size, mtime):
+                self.candidates[path] = (size, mtime, now)
+            elif now - previous[2] >= SETTLE_SECONDS:
+                del self.candidates[path]
+                self.reported.add(path)
+                ready.append((path, mtime))
+        # Forget deleted files so the sets do not grow forever
+        self.reported &= present
+        for path in [path for path in self.candidates if path not in present]:
+            del self.candidates[path]
+        return ready
+
+class InotifyDetector:
+    """Reports receipt files when their writer closes them or they are moved into the directory"""
+
+    mode = 'inotify'
+
+    def __init__(self, directory: str):
+        from inotify_simple import INotify, flags
+        self.directory = directory
+        self.flags = flags
+        self.inotify = INotify()
+        self.inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO)
+        self.started = time.time()
+
+    def events(self, timeout: float) -> List[Tuple[str, float]]:
+        ready = []
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            if event.mask & self.flags.Q_OVERFLOW:
+                # Events were lost; pick up everything written since the watcher started
+                print("Upload watcher event queue overflowed, rescanning", file=sys.stderr)
+                ready.extend((path, mtime) for path, mtime in list_receipts(self.directory) if mtime >= self.started)
+                continue
+            if os.path.splitext(event.name)[1].lower() in SUPPORTED_EXTENSIONS:
+                ready.append((os.path.join(self.directory, event.name), time.time()))
+        return ready
+
+    def close(self):
+        self.inotify.close()
+
+class UploadWatcher:
+    """Pre-OCR service for an upload directory
+
+    New receipt files are queued as they appear and recognized on a pool of
+    ``jobs`` processes whose results go into the shared OCR result cache (and the
+    duplicate index), where the request path's own lookup by file hash finds them.
+    The queue is a priority heap: uploads before back-fill, newest first within
+    each. Only ``jobs`` receipts are ever handed to the pool, so the heap is
+    the whole backlog; it holds at most ``max_queue`` receipts and sheds the
+    lowest-ranked one beyond that, leaving it to the request path. Back-fill of
+    files present at start-up only uses workers that no upload is waiting for.
+    Queue depth and throughput are written to ``metrics_path`` as JSON.
+    """
+
+    def __init__(self, directory: str, jobs: Optional[int] = None, max_queue: int = DEFAULT_MAX_QUEUE,
+                 backfill: bool = False, metrics_path: Optional[str] = None,
+                 poll_interval: float = POLL_INTERVAL, languages: List[str] = None,
+                 processor_options: Optional[Dict[str, Any]] = None, cache_dir: Optional[str] = None,
+                 cache_max_mb: Optional[float] = None, trace_file: Optional[str] = None,
+                 index_path: Optional[str] = None, index_max_distance: Optional[int] = None):
+        self.directory = os.path.abspath(directory)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_queue = max(1, max_queue)
+        self.backfill = backfill
+        self.metrics_path = Path(metrics_path or DEFAULT_WATCH_METRICS_PATH)
+        self.poll_interval = poll_interval
+        self.worker_args = (languages or ['eng'], processor_options or {}, cache_dir, cache_max_mb, True,
+                            trace_file, None, index_path, index_max_distance)
+
+        self.queue: List[tuple] = []  # Heap of (priority, -mtime, sequence, path, queued_at)
+        self.backlog: deque = deque()  # Back-fill paths not queued yet, newest first
+        self.seen: Set[str] = set()  # Paths queued or running, so repeated events do not queue twice
+        self.running: Dict[Any, Tuple[str, int, float]] = {}
+        self.sequence = itertools.count()
+        self.counters = {"processed": 0, "failed": 0, "cache_hits": 0, "shed": 0}
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.detector = None
+        self.executor = None
+        self.stopping = False
+        self.started_at = time.time()
+
+    def enqueue(self, path: str, mtime: float, priority: int = UPLOAD):
+        if path in self.seen:
+            return
+        entry = (priority, -mtime, next(self.sequence), path, time.monotonic())
+        if len(self.queue) >= self.max_queue:
+            worst = max(self.queue)
+            if worst[:2] <= entry[:2]:
+                self._shed(entry)
+                return
+            self.queue.remove(worst)
+            heapq.heapify(self.queue)
+            self._shed(worst)
+        self.seen.add(path)
+        heapq.heappush(self.queue, entry)
+
+    def _shed(self, entry: tuple):
+        self.seen.discard(entry[3])
+        if entry[0] == BACKFILL:
+            self.backlog.appendleft(entry[3])  # Back-fill is not lost, only deferred
+        else:
+            self.counters["shed"] += 1
+
+    def _start_pool(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                            initargs=self.worker_args)
+
+    def dispatch(self):
+        """Hand the highest-priority receipts to free workers"""
+        while len(self.running) < self.jobs:
+            while not self.queue and self.backlog:
+                path = self.backlog.popleft()
+                if path not in self.seen and os.path.exists(path):
+                    self.enqueue(path, os.path.getmtime(path), BACKFILL)
+            if not self.queue:
+                return
+            priority, _, _, path, queued_at = heapq.heappop(self.queue)
+            if not os.path.exists(path):
+                self.seen.discard(path)
+                continue  # Deleted before its turn
+            future = self.executor.submit(_process_one, path)
+            self.running[future] = (path, priority, queued_at)
+
+    def collect(self, timeout: float = 0):
+        """Account for finished receipts"""
+        if not self.running:
+            return
+        done, _ = wait(list(self.running), timeout=timeout, return_when=FIRST_COMPLETED)
+        broken = False
+        for future in done:
+            path, priority, queued_at = self.running.pop(future)
+            self.seen.discard(path)
+            try:
+                record = future.result()
+            except BrokenProcessPool:
+                broken = True
+                record = {"success": False}
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+                record = {"success": False}
+            # Mock fallbacks carry a "note" and count as failures
+            if record.get("success") and "note" not in record:
+                self.counters["processed"] += 1
+            else:
+                self.counters["failed"] += 1
+            if (record.get("cache") or {}).get("hit"):
+                self.counters["cache_hits"] += 1
+            if priority == UPLOAD:
+                self.latencies.append(1000.0 * (time.monotonic() - queued_at))
+        if broken:
+            # A worker died (e.g. killed for memory) and took the pool with it
+            print("Upload watcher worker died, restarting the pool", file=sys.stderr)
+            for path, _, _ in self.running.values():
+                self.seen.discard(path)
+            self.counters["failed"] += len(self.running)
+            self.running.clear()
+            self.executor.shutdown(wait=False)
+            if not self.stopping:
+                self._start_pool()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and throughput, shaped like the Node queue status plus watcher counters"""
+        now = time.monotonic()
+        ordered = sorted(self.latencies)
+        queued_uploads = sum(1 for entry in self.queue if entry[0] == UPLOAD)
+        return {
+            "pid": os.getpid(),
+            "directory": self.directory,
+            "mode": self.detector.mode if self.detector else None,
+            "state": "stopped" if self.stopping else "running",
+            "queue_length": len(self.queue),
+            "queued_uploads": queued_uploads,
+            "backfill_pending": len(self.queue) - queued_uploads + len(self.backlog),
+            "running": len(self.running),
+            "max_concurrent": self.jobs,
+            "max_queue": self.max_queue,
+            "oldest_queued_seconds": round(max((now - entry[4] for entry in self.queue), default=0.0), 3),
+            **self.counters,
+            "latency_ms": {
+                "count": len(ordered),
+                "p50": round(ordered[len(ordered) // 2], 1) if ordered else 0.0,
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1) if ordered else 0.0
+            },
+            "started_at": int(self.started_at * 1000),
+            "updated_at": int(time.time() * 1000)
+        }
+
+    def write_metrics(self):
+        try:
+            self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.metrics_path, self.metrics())
+        except OSError as e:
+            print(f"Could not write upload watcher metrics: {e}", file=sys.stderr)
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self):
+        """Watch until SIGTERM or SIGINT, then finish the receipts already running"""
+        if INOTIFY_AVAILABLE:
+            try:
+                self.detector = InotifyDetector(self.directory)
+            except OSError as e:
+                print(f"inotify unavailable ({e}), polling {self.directory}", file=sys.stderr)
+        if self.detector is None:
+            self.detector = PollingDetector(self.directory, self.poll_interval)
+        if self.backfill:
+            existing = sorted(list_receipts(self.directory), key=lambda receipt: -receipt[1])
+            self.backlog.extend(path for path, _ in existing)
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Watching {self.directory} for receipts ({self.detector.mode}, {self.jobs} workers)", file=sys.stderr)
+
+        self._start_pool()
+        next_metrics = 0.0
+        try:
+            while not self.stopping:
+                for path, mtime in self.detector.events(TICK_SECONDS if not self.running else 0):
+                    self.enqueue(path, mtime, UPLOAD)
+                self.collect(TICK_SECONDS if self.running else 0)
+                self.dispatch()
+                if time.monotonic() >= next_metrics:
+                    self.write_metrics()
+                    next_metrics = time.monotonic() + METRICS_INTERVAL
+        finally:
+            self.stopping = True
+            self.queue.clear()
+            self.backlog.clear()
+            while self.running:
+                self.collect(None)
+            self.executor.shutdown(wait=True)
+            if hasattr(self.detector, 'close'):
+                self.detector.close()
+            self.write_metrics()
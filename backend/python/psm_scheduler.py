@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Adaptive PSM Scheduler for Expense Management System
+Learns which Tesseract config wins per image profile, tries it first and stops early
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from ocr_cache import CounterFile, DEFAULT_CACHE_DIR
+
+DEFAULT_STATS_PATH = os.environ.get('OCR_PSM_STATS') or os.path.join(DEFAULT_CACHE_DIR, 'psm_stats.json')
+DEFAULT_EARLY_EXIT_CONFIDENCE = 0.85  # Mean word confidence (0-1) that ends the search
+
+def image_profile(width: int, height: int, source: str = 'image') -> str:
+    """Coarse profile key: aspect-ratio bucket, size bucket and source type"""
+    ratio = height / float(width) if width else 1.0
+    if ratio < 0.8:
+        shape = 'wide'
+    elif ratio < 1.6:
+        shape = 'page'
+    elif ratio < 3.0:
+        shape = 'tall'
+    else:
+        shape = 'strip'
+
+    megapixels = width * height / 1e6
+    if megapixels < 1:
+        size = 's'
+    elif megapixels < 4:
+        size = 'm'
+    else:
+        size = 'l'
+
+    return f'{shape}:{size}:{source}'
+
+class PSMScheduler:
+    """Orders OCR configs by how often each one won for similar images
+
+    Outcomes are counted per profile in memory and merged into a JSON stats file
+    under a lock every few jobs (and at exit), so concurrent OCR processes share
+    what they learn. In ``audit`` mode every config still runs and the scheduler
+    records whether stopping early would have picked a different result.
+    """
+
+    def __init__(self, stats_path: str = None, early_exit_confidence: float = DEFAULT_EARLY_EXIT_CONFIDENCE,
+                 audit: bool = False):
+        self.stats_path = Path(stats_path or DEFAULT_STATS_PATH)
+        self.early_exit_confidence = early_exit_confidence
+        self.audit = audit
+        self.counters = CounterFile(self.stats_path, section='profiles', name='PSM scheduler stats')
+
+    def order(self, profile: str, configs: List[str]) -> List[str]:
+        """Configs sorted by past wins for ``profile``; unseen profiles keep the given order"""
+        wins = self.counters.get(profile, {}).get('wins', {})
+        return sorted(configs, key=lambda config: (-wins.get(config, 0), configs.index(config)))
+
+    def is_confident(self, result: Optional[Dict[str, Any]]) -> bool:
+        """Whether a pass is good enough to skip the remaining configs"""
+        return bool(result) and len(result['text']) > 10 and \
+            result['confidence'] >= self.early_exit_confidence * 100
+
+    def record(self, profile: str, winner: Optional[str], passes: int, early_exit: bool,
+               audit_changed: Optional[bool] = None):
+        """Count the outcome of one recognition"""
+        increments: Dict[str, Any] = {'runs': 1, 'passes': passes, 'early_exits': int(early_exit)}
+        if winner:
+            increments['wins'] = {winner: 1}
+        if audit_changed is not None:
+            increments['audit_runs'] = 1
+            increments['audit_changed'] = int(audit_changed)
+
+        self.counters.add({profile: increments})
+
+    def flush(self):
+        """Merge pending outcomes into the stats file"""
+        self.counters.flush()
+
+    def report(self) -> Dict[str, Any]:
+        """Per-profile pass counts, early-exit rate, preferred config and audit results"""
+        self.flush()
+        profiles = {}
+        totals = {'runs': 0, 'passes': 0, 'early_exits': 0, 'audit_runs': 0, 'audit_changed': 0}
+
+        for profile, stats in sorted(self.counters.read().items()):
+            for name in totals:
+                totals[name] += stats.get(name, 0)
+            runs = stats.get('runs', 0)
+            wins = stats.get('wins', {})
+            audit_runs = stats.get('audit_runs', 0)
+            profiles[profile] = {
+                'runs': runs,
+                'mean_passes': round(stats.get('passes', 0) / runs, 3) if runs else 0.0,
+                'early_exit_rate': round(stats.get('early_exits', 0) / runs, 3) if runs else 0.0,
+                'preferred_config': max(wins, key=wins.get) if wins else None,
+                'wins': wins,
+                'audit_runs': audit_runs,
+                'audit_changed_rate': round(stats.get('audit_changed', 0) / audit_runs, 3) if audit_runs else None
+            }
+
+        return {
+            'stats_path': str(self.stats_path),
+            'early_exit_confidence': self.early_exit_confidence,
+            'runs': totals['runs'],
+            'mean_passes': round(totals['passes'] / totals['runs'], 3) if totals['runs'] else 0.0,
+            'early_exit_rate': round(totals['early_exits'] / totals['runs'], 3) if totals['runs'] else 0.0,
+            'audit_runs': totals['audit_runs'],
+            'audit_changed_rate': round(totals['audit_changed'] / totals['audit_runs'], 3) if totals['audit_runs'] else None,
+            'profiles': profiles
+        }
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Receipt Layout Analysis for Expense Management System
+Columnar word tables built from Tesseract word boxes, grouped into rows and price columns to recover line items
+"""
+
+import re
+import importlib.util
+from typing import Dict, List, Any, Optional
+
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+TEXT_BLOCK_MIN_CONFIDENCE = 30  # Words at or below this confidence are left out of text_blocks
+ROW_TOLERANCE = 0.5  # Vertical centre gap, in median word heights, that starts a new row
+COLUMN_TOLERANCE = 1.5  # Right-edge gap, in median word heights, that starts a new price column
+MIN_COLUMN_PRICES = 2  # Prices a right-aligned column needs before it counts as one
+
+PRICE_PATTERN = re.compile(r'^[\$€£]?(-?\d{1,5}[.,]\d{2})(-?)$')
+# Totals, taxes and payment lines share the price column but are not items
+SUMMARY_PATTERN = re.compile(
+    r'\b(sub\s*-?\s*total|total|tax|vat|gst|hst|mwst|tva|balance|due|change|cash|visa|mastercard|'
+    r'amex|debit|credit|card|tip|summe|zwischensumme)\b', re.IGNORECASE)
+LEADING_QUANTITY_PATTERN = re.compile(r'^(\d{1,3})\s*[xX×@*]?\s+(?=\D)')
+TRAILING_QUANTITY_PATTERN = re.compile(r'\s+(?:(\d{1,3})\s*[xX×@*]|[xX×](\d{1,3}))$')
+LETTER_PATTERN = re.compile(r'[^\W\d_]')
+# Character grid for word boxes of text that was never an image (e-receipts)
+GRID_CHAR_WIDTH = 10
+GRID_LINE_HEIGHT = 20
+GRID_LINE_PITCH = 30
+
+def _price_value(token: str) -> Optional[float]:
+    """Numeric value of a price token such as '$3.50', '3,50' or '1.00-' (a refund)"""
+    match = PRICE_PATTERN.match(token)
+    if not match:
+        return None
+    value = float(match.group(1).replace(',', '.'))
+    return -value if match.group(2) else value
+
+def word_columns(data: Dict[str, List], min_confidence: int = TEXT_BLOCK_MIN_CONFIDENCE) -> Dict[str, Any]:
+    """Columnar table of the confident words in image_to_data output
+
+    Numeric columns become NumPy arrays in one conversion each, instead of an
+    ``int()`` call per cell; ``text`` stays a list of strings.
+    """
+    import numpy as np
+    conf = np.trunc(np.asarray(data['conf'], dtype=np.float64)).astype(np.int64)
+    keep = np.flatnonzero(conf > min_confidence)
+    columns = {
+        name: np.asarray(data[name], dtype=np.int64)[keep] for name in ('left', 'top', 'width', 'height')
+    }
+    columns['conf'] = conf[keep]
+    columns['page'] = np.ones(len(keep), dtype=np.int64)
+    columns['text'] = [str(data['text'][i]) for i in keep.tolist()]
+    return columns
+
+def columns_from_text_blocks(text_blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar table from stored ``text_blocks``, e.g. a cached result being parsed again"""
+    import numpy as np
+    bboxes = np.asarray([block['bbox'] for block in text_blocks], dtype=np.int64).reshape(-1, 4)
+    return {
+        'left': bboxes[:, 0],
+        'top': bboxes[:, 1],
+        'width': bboxes[:, 2],
+        'height': bboxes[:, 3],
+        'conf': np.asarray([block.get('confidence', 0) for block in text_blocks], dtype=np.int64),
+        'page': np.asarray([block.get('page', 1) for block in text_blocks], dtype=np.int64),
+        'text': [str(block['text']) for block in text_blocks]
+    }
+
+def text_blocks(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The ``text_blocks`` list of an OCR result: text, confidence and [left, top, width, height] per word"""
+    bboxes = zip(columns['left'].tolist(), columns['top'].tolist(),
+                 columns['width'].tolist(), columns['height'].tolist())
+    return [
+        {'text': text, 'confidence': confidence, 'bbox': list(bbox)}
+        for text, confidence, bbox in zip(columns['text'], columns['conf'].tolist(), bboxes)
+    ]
+
+def build_text_blocks(data: Dict[str, List]) -> List[Dict[str, Any]]:
+    """``text_blocks`` straight from image_to_data output, per word in Python when NumPy is missing"""
+    if NUMPY_AVAILABLE:
+        return text_blocks(word_columns(data))
+    # Engines report confidences as ints, floats or strings of either ('91.5')
+    confidences = [int(float(conf)) for conf in data['conf']]
+    return [
+        {
+            'text': data['text'][i],
+            'confidence': confidence,
+            'bbox': [data['left'][i], data['top'][i], data['width'][i], data['height'][i]]
+        }
+        for i, confidence in enumerate(confidences) if confidence > TEXT_BLOCK_MIN_CONFIDENCE
+    ]
+
+def text_blocks_from_lines(lines: List[str]) -> List[Dict[str, Any]]:
+    """``text_blocks`` for lines of digital text, each word boxed on a fixed character grid
+
+    Gives text without word boxes (e-receipts) the layout extract_line_items
+    reads: one row per line, and prices at the end of lines right-aligned when
+    the source padded them into a column.
+    """
+    blocks = []
+    for row, line in enumerate(lines):
+        top = row * GRID_LINE_PITCH
+        for match in re.finditer(r'\S+', line):
+            blocks.append({
+                'text': match.group(),
+                'confidence': 100,
+                'bbox': [match.start() * GRID_CHAR_WIDTH, top,
+                         (match.end() - match.start()) * GRID_CHAR_WIDTH, GRID_LINE_HEIGHT]
+            })
+    return blocks
+
+def group_rows(columns: Dict[str, Any], word_height: Optional[float] = None):
+    """Reading order of the words and a row id per word in that order
+
+    Words are sorted by page and vertical centre; a row starts wherever the
+    centre jumps by more than ROW_TOLERANCE median word heights. Within a row
+    words are ordered left to right.
+    """
+    import numpy as np
+    centre = columns['top'] + columns['height'] / 2.0
+    by_centre = np.lexsort((centre, columns['page']))
+    if word_height is None:
+        word_height = max(1.0, float(np.median(columns['height'])))
+    tolerance = ROW_TOLERANCE * word_height
+    breaks = (np.diff(centre[by_centre]) > tolerance) | (np.diff(columns['page'][by_centre]) != 0)
+    rows = np.concatenate(([0], np.cumsum(breaks)))
+    within_rows = np.lexsort((columns['left'][by_centre], rows))
+    return by_centre[within_rows], rows[within_rows]
+
+def price_columns(right_edges, word_height: float):
+    """Cluster the right edges of price words into right-aligned columns
+
+    Returns a column id per price (or -1 when its column has fewer than
+    MIN_COLUMN_PRICES members) and the mean right edge of every column.
+    """
+    import numpy as np
+    by_edge = np.argsort(right_edges, kind='stable')
+    breaks = np.diff(right_edges[by_edge]) > COLUMN_TOLERANCE * word_height
+    cluster = np.empty(len(right_edges), dtype=np.int64)
+    cluster[by_edge] = np.concatenate(([0], np.cumsum(breaks)))
+    sizes = np.bincount(cluster)
+    centres = np.bincount(cluster, weights=right_edges) / sizes
+    cluster[sizes[cluster] < MIN_COLUMN_PRICES] = -1
+    return cluster, centres
+
+def _split_quantity(description: str):
+    """Pull a quantity such as '2 x Latte', '2 Latte' or 'Latte 2 x' out of a description"""
+    match = LEADING_QUANTITY_PATTERN.match(description)
+    if match:
+        return int(match.group(1)), description[match.end():].strip()
+    match = TRAILING_QUANTITY_PATTERN.search(description)
+    if match:
+        return int(match.group(1) or match.group(2)), description[:match.start()].strip()
+    return None, description
+
+def extract_line_items(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Line items (description, quantity, unit price, amount) from a columnar word table
+
+    Item rows are those with a price in the right-most right-aligned column of
+    prices; the row's last price is the amount and a price before it the unit price. Rows
+    whose description looks like a total, tax or payment line are skipped.
+    """
+    import numpy as np
+    if not columns['text']:
+        return []
+
+    word_height = max(1.0, float(np.median(columns['height'])))
+    order, rows = group_rows(columns, word_height)
+    texts = [columns['text'][i] for i in order.tolist()]
+    values = [_price_value(text) for text in texts]
+    is_price = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+    if not is_price.any():
+        return []
+
+    right = (columns['left'] + columns['width'])[order]
+    price_positions = np.flatnonzero(is_price)
+    cluster, centres = price_columns(right[price_positions], word_height)
+    # The last price of each row, which is the amount when the row has one
+    price_rows = rows[price_positions]
+    row_last_prices = price_positions[np.concatenate((price_rows[1:] != price_rows[:-1], [True]))]
+    significant = np.unique(cluster[cluster >= 0])
+    if len(significant):
+        # Rows with a price in the right-most column are item rows
+        amount_column = significant[np.argmax(centres[significant])]
+        item_rows = np.zeros(rows[-1] + 1, dtype=bool)
+        item_rows[price_rows[cluster == amount_column]] = True
+        amount_positions = row_last_prices[item_rows[rows[row_last_prices]]]
+    else:
+        # No column structure: every row with a price
+        amount_positions = row_last_prices
+
+    row_starts = np.searchsorted(rows, rows[amount_positions], side='left')
+    items = []
+    for position, start in zip(amount_positions.tolist(), row_starts.tolist()):
+        words = range(start, position)
+        prices = [values[i] for i in words if values[i] is not None]
+        description = ' '.join(texts[i] for i in words if values[i] is None).strip()
+        if not LETTER_PATTERN.search(description) or SUMMARY_PATTERN.search(description):
+            continue
+
+        amount = values[position]
+        quantity, description = _split_quantity(description)
+        unit_price = prices[-1] if prices else None
+        if quantity is None and unit_price:
+            ratio = amount / unit_price
+            quantity = int(round(ratio)) if ratio >= 1 and abs(ratio - round(ratio)) < 0.01 else 1
+        quantity = quantity or 1
+        if unit_price is None:
+            unit_price = round(amount / quantity, 2)
+
+        items.append({
+            "description": description,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "amount": amount
+        })
+    return items
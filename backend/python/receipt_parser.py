@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Receipt Text Parser for Expense Management System
+Extracts structured fields from OCR text with patterns compiled once at import time
+"""
+
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+from receipt_layout import NUMPY_AVAILABLE, columns_from_text_blocks, extract_line_items
+
+def _compile(patterns: List[str], flags: int = 0) -> List[re.Pattern]:
+    return [re.compile(pattern, flags) for pattern in patterns]
+
+# Merchant heuristic
+NUMERIC_LINE_PATTERN = re.compile(r'^[\d\s\-\.\/\$,]+$')
+DATE_LINE_PATTERN = re.compile(r'^\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4}')
+MERCHANT_STOP_WORDS = ('receipt', 'invoice', 'total', 'subtotal', 'tax')
+MERCHANT_SEARCH_LINES = 8
+
+# Labelled amounts; their [:\s]* separators may span lines, so they run on the whole text
+TOTAL_PATTERNS = _compile([
+    r'total[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'amount[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'grand\s+total[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'\$\s*(\d+[,\.]?\d{2})\s*total',
+    r'balance[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'due[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+], re.MULTILINE)
+
+# Standalone amounts at the end of a line; these only ever match within one line
+LINE_END_AMOUNT_PATTERNS = _compile([
+    r'\$\s*(\d+\.\d{2})\s*$',
+    r'(\d+\.\d{2})\s*$',
+])
+
+DATE_PATTERNS = _compile([
+    r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
+    r'(\d{2,4}[\/\-]\d{1,2}[\/\-]\d{1,2})',
+    r'(\d{1,2}\s+\w{3,9}\s+\d{2,4})',
+    r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2}[,\s]+\d{2,4}',
+    r'\d{1,2}[,\s]+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*[,\s]+\d{2,4}',
+], re.IGNORECASE)
+
+SUBTOTAL_PATTERNS = _compile([
+    r'subtotal[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'sub\s+total[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'sub[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+])
+
+TAX_PATTERNS = _compile([
+    r'tax[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'gst[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'hst[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'vat[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+    r'sales\s+tax[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
+])
+
+PHONE_PATTERNS = _compile([
+    r'(\+?1?[-.\s]?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4})',
+    r'(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})',
+])
+
+RECEIPT_NUMBER_PATTERNS = _compile([
+    r'receipt[#:\s]*([a-zA-Z0-9]+)',
+    r'transaction[#:\s]*([a-zA-Z0-9]+)',
+    r'order[#:\s]*([a-zA-Z0-9]+)',
+    r'invoice[#:\s]*([a-zA-Z0-9]+)',
+    r'ref[#:\s]*([a-zA-Z0-9]+)',
+])
+
+PAYMENT_PATTERNS = _compile([
+    r'(visa|mastercard|amex|american express|discover)',
+    r'(cash|credit|debit)',
+    r'card\s+ending\s+in\s+(\d{4})',
+])
+
+# Literal words every labelled pattern group needs; one scan of the text decides which groups can match.
+# The lookahead finds overlapping words too ('receiptotal', 'amountax'), which a plain alternation skips
+KEYWORD_PATTERN = re.compile(r'(?=(total|amount|balance|due|sub|tax|gst|hst|vat|receipt|transaction|order|invoice|ref))')
+
+# Bump whenever parse output changes; stored results parsed by other versions are re-parsed by --reparse
+PARSER_VERSION = '3'
+
+MIN_AMOUNT = 0.01
+MAX_AMOUNT = 10000  # Reasonable range for expenses
+
+def _first_match(patterns: List[re.Pattern], text: str) -> str:
+    """Group 1 of the first match of the first pattern that matches, as re.findall(...)[0] would give"""
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return ""
+
+class ReceiptParser:
+    """Single-pass receipt field extractor
+
+    The text is lowercased once and its lines are walked once to pick the merchant
+    and collect line-end amounts. Labelled patterns whose separators can span lines
+    still run on the whole text, but only when a single keyword scan shows that
+    their label occurs at all. Output is identical to the original per-pattern
+    implementation. Line items need word boxes (``text_blocks``), from which
+    rows and right-aligned price columns are recovered.
+    """
+
+    def parse(self, text: str, text_blocks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Parse receipt text to extract structured data"""
+        parsed_data = {
+            "merchant_name": "",
+            "total_amount": "",
+            "date": "",
+            "items": [],
+            "subtotal": "",
+            "tax_amount": "",
+            "payment_method": "",
+            "receipt_number": "",
+            "address": "",
+            "phone": ""
+        }
+
+        text_lower = text.lower()
+        keywords = set(KEYWORD_PATTERN.findall(text_lower))
+        amounts: List[Tuple[float, str]] = []
+
+        for index, (line, line_lower) in enumerate(zip(text.split('\n'), text_lower.split('\n'))):
+            # Merchant: first substantial, non-numeric, non-keyword line near the top
+            if index < MERCHANT_SEARCH_LINES and not parsed_data["merchant_name"]:
+                stripped = line.strip()
+                if (len(stripped) > 4 and
+                    not NUMERIC_LINE_PATTERN.match(stripped) and
+                    not any(word in line_lower for word in MERCHANT_STOP_WORDS) and
+                    not DATE_LINE_PATTERN.match(stripped)):
+                    parsed_data["merchant_name"] = stripped
+
+            if '.' in line_lower:
+                for pattern in LINE_END_AMOUNT_PATTERNS:
+                    self._collect_amounts(pattern.findall(line_lower), amounts)
+
+        if keywords & {'total', 'amount', 'balance', 'due'}:
+            for pattern in TOTAL_PATTERNS:
+                self._collect_amounts(pattern.findall(text_lower), amounts)
+
+        # Pick the largest reasonable amount as total
+        if amounts:
+            parsed_data["total_amount"] = max(amounts)[1]
+
+        parsed_data["date"] = _first_match(DATE_PATTERNS, text)
+
+        if 'sub' in keywords:
+            parsed_data["subtotal"] = _first_match(SUBTOTAL_PATTERNS, text_lower).replace(',', '')
+
+        if keywords & {'tax', 'gst', 'hst', 'vat'}:
+            parsed_data["tax_amount"] = _first_match(TAX_PATTERNS, text_lower).replace(',', '')
+
+        parsed_data["phone"] = _first_match(PHONE_PATTERNS, text)
+
+        if keywords & {'receipt', 'transaction', 'order', 'invoice', 'ref'}:
+            parsed_data["receipt_number"] = _first_match(RECEIPT_NUMBER_PATTERNS, text_lower)
+
+        parsed_data["payment_method"] = _first_match(PAYMENT_PATTERNS, text_lower)
+
+        if text_blocks and NUMPY_AVAILABLE:
+            parsed_data["items"] = extract_line_items(columns_from_text_blocks(text_blocks))
+
+        return parsed_data
+
+    @staticmethod
+    def _collect_amounts(matches: List[str], amounts: List[Tuple[float, str]]):
+        for match in matches:
+            amount = match.replace(',', '')
+            try:
+                amt_float = float(amount)
+            except ValueError:
+                continue
+            if MIN_AMOUNT <= amt_float <= MAX_AMOUNT:
+                amounts.append((amt_float, amount))
+
+_default_parser = ReceiptParser()
+
+def parse_receipt_data(text: str, text_blocks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Parse receipt text with the shared module-level parser"""
+    return _default_parser.parse(text, text_blocks)
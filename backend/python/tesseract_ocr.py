@@ -4,52 +4,120 @@ Tesseract OCR Service for Expense Management System
 Processes receipt images and extracts structured data using Tesseract OCR
 """
 
+import io
 import sys
 import json
 import argparse
 import logging
 import re
 import os
+import shutil
+import subprocess
+import importlib
+import importlib.util
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union
+import time
 import traceback
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-# Try to import required libraries
-TESSERACT_AVAILABLE = False
-PIL_AVAILABLE = False
-CV2_AVAILABLE = False
-PDF_AVAILABLE = False
-
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-    print("✓ Pytesseract available", file=sys.stderr)
-except ImportError:
-    print("✗ Pytesseract not available", file=sys.stderr)
-
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-    print("✓ PIL/Pillow available", file=sys.stderr)
-except ImportError:
-    print("✗ PIL/Pillow not available", file=sys.stderr)
-
-try:
-    import cv2
-    import numpy as np
-    CV2_AVAILABLE = True
-    print("✓ OpenCV available", file=sys.stderr)
-except ImportError:
-    print("✗ OpenCV not available", file=sys.stderr)
-
-try:
-    from pdf2image import convert_from_path
-    import pdfplumber
-    PDF_AVAILABLE = True
-    print("✓ PDF processing available", file=sys.stderr)
-except ImportError:
-    print("✗ PDF processing not available", file=sys.stderr)
+from ocr_cache import ResultCache, hash_file, hash_bytes, atomic_write_json, DEFAULT_CACHE_DIR
+from ocr_input import ReceiptBytes, read_stdin, read_shared_memory
+from ereceipt import ereceipt_format, process_ereceipt
+from receipt_parser import parse_receipt_data
+from receipt_layout import build_text_blocks
+from ocr_reparse import PARSE_VERSION
+from expense_categorizer import categorize_expense
+from ocr_trace import Trace, NULL_TRACE, append_trace, summarize_trace_file, run_profiled
+from psm_scheduler import PSMScheduler, image_profile, DEFAULT_EARLY_EXIT_CONFIDENCE
+from ocr_engine import get_engine, available_engines, TESSEROCR_AVAILABLE, DEFAULT_ENGINE
+from receipt_index import ReceiptIndex, perceptual_hash, DEFAULT_INDEX_PATH, DEFAULT_MAX_DISTANCE
+from ocr_deadline import Deadline, NO_DEADLINE, COST_MODEL, DEADLINE_MIN_SCALE
+from ocr_memory import (MemoryBudget, NO_MEMORY_BUDGET, PREPROCESS_BYTES_PER_PIXEL, OCR_PASS_BYTES_PER_PIXEL,
+                        BAND_ROWS, BAND_OVERLAP, draft_reduction)
+from ocr_tiling import tile_count, plan_tiles, stitch_tile_data
+from ocr_language import (LanguageStats, languages_for_script, identify_language,
+                          MIN_SCRIPT_CONFIDENCE, MIN_RECOGNITION_CONFIDENCE, DETECTION_MAX_SIDE as SCRIPT_DETECTION_MAX_SIDE)
+
+# Single-shot deadlines count from here, so interpreter start-up and imports are included
+STARTED_AT = time.monotonic()
+
+# Heavy libraries are only imported when their code path runs: availability is
+# decided from the import system's metadata, and the modules load on first use
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access"""
+    
+    def __init__(self, name: str):
+        self._name = name
+    
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        # Copy the module namespace so later lookups skip __getattr__
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+TESSERACT_AVAILABLE = _module_available('pytesseract')
+PIL_AVAILABLE = _module_available('PIL')
+CV2_AVAILABLE = _module_available('cv2') and _module_available('numpy')
+PDF_AVAILABLE = _module_available('pdf2image') and _module_available('pdfplumber')
+
+pytesseract = LazyModule('pytesseract')
+Image = LazyModule('PIL.Image')
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+pdfplumber = LazyModule('pdfplumber')
+
+def convert_from_path(*args, **kwargs):
+    from pdf2image import convert_from_path as pdf2image_convert
+    return pdf2image_convert(*args, **kwargs)
+
+# A receipt file on disk or in memory
+ReceiptSource = Union[str, ReceiptBytes]
+
+def is_pdf(source: ReceiptSource) -> bool:
+    """Whether a receipt is a PDF: by extension for paths, by magic bytes in memory"""
+    if isinstance(source, ReceiptBytes):
+        return source.is_pdf
+    return source.lower().endswith('.pdf')
+
+def open_image(source: ReceiptSource):
+    """PIL image of a receipt path or in-memory receipt"""
+    return Image.open(source.stream() if isinstance(source, ReceiptBytes) else source)
+
+def read_image(source: ReceiptSource, flags: Optional[int] = None):
+    """``cv2.imread`` of a path, or the same decode of in-memory bytes; None when unreadable"""
+    flags = cv2.IMREAD_COLOR if flags is None else flags
+    if isinstance(source, ReceiptBytes):
+        return cv2.imdecode(np.frombuffer(source.data, dtype=np.uint8), flags)
+    return cv2.imread(source, flags)
+
+def rasterize_pdf_page(source: ReceiptSource, page_number: int, dpi: int, grayscale: bool = False) -> List:
+    """One PDF page as a list of PIL images, like pdf2image's ``convert_from_path``
+    
+    In-memory PDFs are piped to pdftoppm, which writes the page to stdout: pdf2image's
+    ``convert_from_bytes`` would save them to a temp file first. A ``grayscale``
+    page takes a third of the memory of a colour one.
+    """
+    if not isinstance(source, ReceiptBytes):
+        return convert_from_path(source, first_page=page_number, last_page=page_number, dpi=dpi,
+                                 grayscale=grayscale)
+    completed = subprocess.run(
+        ['pdftoppm', '-r', str(dpi), '-f', str(page_number), '-l', str(page_number)] +
+        (['-gray'] if grayscale else []) + ['-'],
+        input=source.data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    if not completed.stdout:
+        return []
+    image = Image.open(io.BytesIO(completed.stdout))
+    image.load()
+    return [image]
 
 # Configure logging
 logging.basicConfig(
@@ -58,6 +126,134 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Bump whenever preprocessing, OCR or parsing changes in a way that alters results;
+# cached results from other versions are ignored
+PIPELINE_VERSION = '6'
+
+# OCR configurations tried for every image, in priority order (ties keep the earlier config)
+OCR_CONFIGS = [
+    '--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/$:- ',
+    '--psm 4',  # Single column of text
+    '--psm 6',  # Single uniform block
+    '--psm 8',  # Single word
+]
+
+# Share of a deadline's remaining time spent waiting for a receipt another process is
+# already recognizing; the rest is left for recognizing it here if that result is late
+CLAIM_WAIT_SHARE = 0.5
+
+# PDF pages with at least this much text-layer content skip OCR
+PDF_TEXT_MIN_CHARS = 20
+
+# Scanned PDF pages are rasterized so that their long side is about this many pixels
+# (300 DPI for a US Letter page), clamped to a sane DPI range
+PDF_TARGET_LONG_SIDE_PX = 3300
+PDF_MIN_DPI = 150
+PDF_MAX_DPI = 400
+
+def pdf_page_bytes(dpi: int, width_pt: float, height_pt: float) -> float:
+    """Peak memory of rasterizing (in grayscale), preprocessing and recognizing one PDF page"""
+    pixels = (dpi * width_pt / 72.0) * (dpi * height_pt / 72.0)
+    return pixels * (1.0 + PREPROCESS_BYTES_PER_PIXEL + OCR_PASS_BYTES_PER_PIXEL)
+
+def pdf_page_dpi(width_pt: float, height_pt: float) -> int:
+    """Pick a rasterization DPI from a PDF page size given in points"""
+    long_side_inches = max(width_pt, height_pt) / 72.0
+    if long_side_inches <= 0:
+        return 300
+    return int(min(PDF_MAX_DPI, max(PDF_MIN_DPI, PDF_TARGET_LONG_SIDE_PX / long_side_inches)))
+
+# Receipt region detection and resolution normalization
+DETECTION_MAX_SIDE = 1000
+RECEIPT_MIN_AREA_RATIO = 0.1
+RECEIPT_MAX_AREA_RATIO = 0.9
+DESKEW_MIN_ANGLE = 0.5
+RECEIPT_TARGET_TEXT_HEIGHT = 30  # Median glyph height in pixels that Tesseract reads well
+RECEIPT_MIN_TEXT_HEIGHT = 15  # Only text smaller than this is upscaled; upscaling costs pixels
+RECEIPT_MIN_SCALE = 0.2
+RECEIPT_MAX_SCALE = 3.0
+
+def normalize_rect_angle(angle: float) -> float:
+    """Map a cv2.minAreaRect angle to the smallest rotation (-45, 45] that makes the box upright"""
+    angle = angle % 90.0
+    return angle - 90.0 if angle > 45.0 else angle
+
+def rotate_bound(gray, angle: float):
+    """Rotate an image about its centre, keeping its size and replicating the border"""
+    height, width = gray.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2.0, height / 2.0), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def estimate_text_height(gray) -> Optional[float]:
+    """Median height of glyph-sized connected components, measured on a downscaled copy"""
+    factor = min(1.0, DETECTION_MAX_SIDE / float(max(gray.shape[:2])))
+    small = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA) if factor < 1.0 else gray
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, component_stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    if count <= 1:
+        return None
+    
+    heights = component_stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = component_stats[1:, cv2.CC_STAT_WIDTH]
+    areas = component_stats[1:, cv2.CC_STAT_AREA]
+    glyphs = (heights >= 3) & (heights <= small.shape[0] * 0.2) & (widths <= small.shape[1] * 0.3) & (areas >= 6)
+    if glyphs.sum() < 10:
+        return None
+    return float(np.median(heights[glyphs])) / factor
+
+def text_from_ocr_data(data: Dict[str, List]) -> str:
+    """Rebuild the plain-text layout of image_to_string from image_to_data output"""
+    paragraphs = []
+    lines = []
+    words = []
+    current_line = None
+    current_par = None
+    
+    for i, word in enumerate(data['text']):
+        if not word or not str(word).strip():
+            continue
+        par_key = (data['page_num'][i], data['block_num'][i], data['par_num'][i])
+        line_key = par_key + (data['line_num'][i],)
+        
+        if line_key != current_line:
+            if words:
+                lines.append(' '.join(words))
+                words = []
+            if par_key != current_par and lines:
+                paragraphs.append('\n'.join(lines))
+                lines = []
+            current_line = line_key
+            current_par = par_key
+        words.append(str(word))
+    
+    if words:
+        lines.append(' '.join(words))
+    if lines:
+        paragraphs.append('\n'.join(lines))
+    
+    return '\n\n'.join(paragraphs)
+
+def image_dimensions(image) -> tuple:
+    """(width, height) of a PIL image or NumPy array"""
+    if hasattr(image, 'shape'):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+def filter_in_bands(src, dst, apply, rows: int = BAND_ROWS, overlap: int = BAND_OVERLAP):
+    """Run a neighbourhood filter over horizontal bands of ``src``, writing each band's rows into ``dst``
+    
+    Each band is filtered with ``overlap`` rows of context on either side, so as
+    long as the filter reaches no further than that the output equals filtering
+    the whole image, while its working buffers only ever cover one band.
+    """
+    height = src.shape[0]
+    for top in range(0, height, rows):
+        bottom = min(height, top + rows)
+        context_top = max(0, top - overlap)
+        filtered = apply(src[context_top:min(height, bottom + overlap)])
+        dst[top:bottom] = filtered[top - context_top:bottom - context_top]
+    return dst
+
 def provide_mock_ocr_data(image_path: str) -> Dict[str, Any]:
     """Provide mock OCR data as fallback when Tesseract OCR is not available"""
     return {
@@ -89,11 +285,60 @@ def provide_mock_ocr_data(image_path: str) -> Dict[str, Any]:
 class TesseractOCRProcessor:
     """Tesseract OCR processor for receipt text extraction and parsing"""
     
-    def __init__(self, languages: List[str] = None):
-        """Initialize Tesseract OCR processor"""
+    def __init__(self, languages: List[str] = None, ocr_workers: Optional[int] = None,
+                 page_workers: Optional[int] = None, detect_region: bool = True,
+                 early_exit_confidence: Optional[float] = None,
+                 psm_audit: bool = False, psm_stats_path: Optional[str] = None,
+                 engine: Optional[str] = None, tiling: bool = False, tile_workers: Optional[int] = None,
+                 auto_language: bool = False, language_stats_path: Optional[str] = None,
+                 max_rss_mb: Optional[float] = None):
+        """Initialize Tesseract OCR processor
+        
+        ``ocr_workers`` is the number of OCR configurations recognized concurrently;
+        it defaults to one per config, capped at the CPU count. ``page_workers`` is
+        the number of scanned PDF pages OCR'd concurrently. ``detect_region`` enables
+        receipt cropping, deskew and text-height normalization before denoising.
+        ``early_exit_confidence`` opts in to the adaptive PSM scheduler: the config that
+        usually wins for similar images runs first and the search stops once a pass
+        reaches that mean confidence (0-1, e.g. DEFAULT_EARLY_EXIT_CONFIDENCE). The
+        default ``None`` runs every config and keeps the best. ``psm_audit``
+        runs every config but records how often stopping early would have changed
+        the result; scheduler statistics persist in ``psm_stats_path``. ``engine``
+        picks the Tesseract backend ('tesserocr', 'pytesseract' or 'auto'). With
+        ``tiling``, long receipts are split into up to ``tile_workers`` strips
+        (default: CPU count) that are recognized in parallel and stitched back.
+        ``auto_language`` recognizes each receipt with only the requested languages
+        of its detected script, or with the language that company's receipts are
+        almost always in (counted in ``language_stats_path``).
+        ``max_rss_mb`` caps the peak RSS of each receipt job: images are decoded in
+        grayscale, at reduced scale when needed, filtered in bands, and OCR passes,
+        PDF pages and tiles run serially when running them together would not fit.
+        """
         self.languages = languages or ['eng']
+        self.max_rss_mb = max_rss_mb
+        self.language_stats = None
+        if auto_language and len(self.languages) > 1:
+            self.language_stats = LanguageStats(language_stats_path)
+        self.detect_region = detect_region
+        self.psm_scheduler = None
+        if early_exit_confidence is not None or psm_audit:
+            self.psm_scheduler = PSMScheduler(
+                stats_path=psm_stats_path,
+                early_exit_confidence=early_exit_confidence if early_exit_confidence is not None else DEFAULT_EARLY_EXIT_CONFIDENCE,
+                audit=psm_audit
+            )
+        self.ocr_workers = max(1, ocr_workers or min(len(OCR_CONFIGS), os.cpu_count() or 1))
+        # Rasterized PDF pages OCR'd concurrently; each page already uses ocr_workers threads
+        self.page_workers = max(1, page_workers or (os.cpu_count() or 1) // self.ocr_workers)
+        self.tiling = tiling
+        self.tile_workers = max(1, tile_workers or os.cpu_count() or 1)
+        
+        if self.ocr_workers > 1:
+            # Parallel passes already use the cores; stop each tesseract from spawning its own threads
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
         
-        if not TESSERACT_AVAILABLE or not PIL_AVAILABLE:
+        self.engine = get_engine(engine) if PIL_AVAILABLE else None
+        if self.engine is None:
             print("Warning: Tesseract or PIL not available - will use fallback", file=sys.stderr)
             self.ocr_available = False
         else:
@@ -101,40 +346,243 @@ class TesseractOCRProcessor:
             # Set Tesseract language
             self.lang_string = '+'.join(self.languages)
     
-    def preprocess_image(self, image_path: str) -> Optional[str]:
-        """Preprocess image for better OCR results"""
+    def preprocess_image(self, image, stats: Optional[Dict[str, Any]] = None, trace: Trace = NULL_TRACE,
+                         deadline: Deadline = NO_DEADLINE, memory: MemoryBudget = NO_MEMORY_BUDGET):
+        """Preprocess image for better OCR results
+        
+        Accepts a file path, a PIL image or a NumPy array and returns the
+        thresholded image as a grayscale NumPy array, without touching disk.
+        Falls back to the unprocessed image when OpenCV is unavailable or fails.
+        When ``stats`` is given, region detection results are recorded in it.
+        Each step is timed as a span on ``trace``. Under an active ``deadline`` the
+        image is downscaled and lightly denoised when the full pipeline would not fit.
+        Under an active ``memory`` budget files are decoded straight to grayscale, at
+        a reduced scale when the full image would not fit, and denoising and
+        thresholding run in bands, the threshold reusing the decoded buffer.
+        """
         if not CV2_AVAILABLE:
-            return image_path  # Return original if opencv not available
+            return open_image(image) if isinstance(image, (str, ReceiptBytes)) else image  # Return original if opencv not available
         
         try:
             # Read image
-            img = cv2.imread(image_path)
-            if img is None:
-                return image_path
+            with trace.span('load'):
+                if isinstance(image, (str, ReceiptBytes)) and memory.active:
+                    gray = self._read_within_budget(image, memory)
+                    if gray is None:
+                        return open_image(image)
+                elif isinstance(image, (str, ReceiptBytes)):
+                    img = read_image(image)
+                    if img is None:
+                        return open_image(image)
+                    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                elif isinstance(image, np.ndarray):
+                    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                else:
+                    gray = np.array(image if image.mode == 'L' else image.convert('L'))
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            # Crop, deskew and shrink before the expensive per-pixel steps; small text is
+            # only enlarged after thresholding, so denoising never pays for the extra pixels
+            upscale = None
+            if self.detect_region:
+                with trace.span('region_detect'):
+                    gray, region_info = self.normalize_receipt_region(gray, upscale=False)
+                upscale = region_info.get("upscale")
+                if stats is not None:
+                    stats["region_detection"] = region_info
             
-            # Apply denoising
-            denoised = cv2.fastNlMeansDenoising(gray)
+            light_denoise = False
+            if deadline.active:
+                gray, light_denoise = self._fit_to_deadline(gray, deadline)
             
-            # Apply adaptive threshold
-            thresh = cv2.adaptiveThreshold(
-                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+            # Apply denoising
+            megapixels = gray.shape[0] * gray.shape[1] / 1e6
+            denoise = (lambda src: cv2.medianBlur(src, 3)) if light_denoise else cv2.fastNlMeansDenoising
+            threshold = lambda src: cv2.adaptiveThreshold(
+                src, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
             )
+            with trace.span('denoise', light=light_denoise, banded=memory.active):
+                start = time.perf_counter()
+                if memory.active:
+                    denoised = filter_in_bands(gray, np.empty_like(gray), denoise)
+                else:
+                    denoised = denoise(gray)
+                COST_MODEL.observe('light_denoise' if light_denoise else 'denoise', megapixels,
+                                   time.perf_counter() - start)
             
-            # Save preprocessed image
-            preprocessed_path = image_path.replace('.', '_preprocessed.')
-            cv2.imwrite(preprocessed_path, thresh)
+            # Apply adaptive threshold
+            with trace.span('threshold'):
+                if not memory.active:
+                    binary = threshold(denoised)
+                else:
+                    # The grayscale image is not needed any more: threshold into it unless it is the caller's array
+                    owned = not isinstance(image, np.ndarray) and gray.flags.writeable
+                    binary = filter_in_bands(denoised, gray if owned else np.empty_like(gray), threshold)
             
-            return preprocessed_path
+            if upscale:
+                with trace.span('upscale', scale=upscale):
+                    # Interpolate the binary image and snap it back to black and white
+                    binary = cv2.resize(binary, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_LINEAR)
+                    cv2.threshold(binary, 127, 255, cv2.THRESH_BINARY, dst=binary)
+            return binary
             
         except Exception as e:
             logger.warning(f"Image preprocessing failed: {e}")
-            return image_path
+            return open_image(image) if isinstance(image, (str, ReceiptBytes)) else image
+    
+    def _read_within_budget(self, source: ReceiptSource, memory: MemoryBudget):
+        """Decode a receipt file straight to grayscale, at the largest scale that fits the memory budget
+        
+        The size comes from the file header, so nothing is decoded to choose the
+        scale. Reduced scales use libjpeg's DCT scaling (draft mode), which never
+        holds the full-size image; other formats are decoded and then shrunk by
+        OpenCV. Returns None when the file cannot be decoded.
+        """
+        try:
+            with open_image(source) as header:
+                width, height = header.size
+        except Exception:
+            width = height = 0
+        scale = memory.scale_for(width * height, PREPROCESS_BYTES_PER_PIXEL + OCR_PASS_BYTES_PER_PIXEL)
+        reduction = draft_reduction(scale)
+        flags = {
+            1: cv2.IMREAD_GRAYSCALE,
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+        }[reduction]
+        if reduction > 1:
+            memory.degrade("memory_downscale", scale=round(1.0 / reduction, 3), original_size=f"{width}x{height}")
+        return read_image(source, flags)
+    
+    def _fit_to_deadline(self, gray, deadline: Deadline):
+        """Shrink the preprocessing plan until denoising plus one OCR pass fits the deadline
+        
+        Steps, in order: downscale (never below DEADLINE_MIN_SCALE), then swap
+        non-local-means denoising for a median blur. Returns the image and whether
+        to use the light denoiser; every step taken is recorded on ``deadline``.
+        """
+        budget = deadline.budget()
+        megapixels = gray.shape[0] * gray.shape[1] / 1e6
+        cost = COST_MODEL.estimate('denoise', megapixels) + COST_MODEL.estimate('ocr_pass', megapixels)
+        if cost <= budget:
+            return gray, False
+        
+        # Both stages scale with the pixel count, so the side scale is the square root
+        scale = max(DEADLINE_MIN_SCALE, (budget / cost) ** 0.5)
+        if scale < 0.95:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            megapixels *= scale * scale
+            deadline.degrade("downscale", scale=round(scale, 3))
+        
+        if COST_MODEL.estimate('denoise', megapixels) + COST_MODEL.estimate('ocr_pass', megapixels) > budget:
+            deadline.degrade("light_denoise")
+            return gray, True
+        return gray, False
+    
+    def normalize_receipt_region(self, gray, rescale: bool = True, upscale: bool = True):
+        """Find the receipt in a grayscale frame, crop and deskew it and rescale it to the target text height
+        
+        Detection runs on a copy downscaled to at most DETECTION_MAX_SIDE pixels. Returns
+        the normalized image and a dict with the stage time and pixel-reduction ratio.
+        With ``rescale`` off, the text-height normalization is skipped. With ``upscale``
+        off, small text is not enlarged here; the factor it needs is returned as
+        ``"upscale"`` for the caller to apply once the image is thresholded.
+        """
+        start = datetime.now()
+        original_height, original_width = gray.shape[:2]
+        info = {
+            "cropped": False,
+            "deskew_angle": 0.0,
+            "scale": 1.0,
+            "original_size": f"{original_width}x{original_height}"
+        }
+        
+        factor = min(1.0, DETECTION_MAX_SIDE / float(max(original_width, original_height)))
+        small = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA) if factor < 1.0 else gray
+        
+        # The receipt is the largest bright region; closing fills the holes left by the text
+        blurred = cv2.GaussianBlur(small, (5, 5), 0)
+        _, mask = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (15, 15))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        rect = None
+        if contours:
+            largest = max(contours, key=cv2.contourArea)
+            area_ratio = cv2.contourArea(largest) / float(small.shape[0] * small.shape[1])
+            # Too small is noise; nearly the whole frame means a scan with nothing to crop
+            if RECEIPT_MIN_AREA_RATIO <= area_ratio <= RECEIPT_MAX_AREA_RATIO:
+                rect = cv2.minAreaRect(largest)
+        
+        if rect is None:
+            # No separable receipt: estimate skew from the dark (text) pixels instead
+            _, ink = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+            points = cv2.findNonZero(ink)
+            if points is not None and len(points) > 50:
+                _, _, text_angle = cv2.minAreaRect(points)
+                angle = normalize_rect_angle(text_angle)
+                if abs(angle) > DESKEW_MIN_ANGLE:
+                    gray = rotate_bound(gray, angle)
+                    info["deskew_angle"] = round(angle, 2)
+        else:
+            (cx, cy), (w, h), angle = rect
+            angle = normalize_rect_angle(angle)
+            if abs(angle - rect[2]) > 45:
+                w, h = h, w
+            cx, cy, w, h = cx / factor, cy / factor, w / factor, h / factor
+            
+            # Crop the axis-aligned bounds first so the rotation only touches receipt pixels
+            half_diag = 0.5 * (w * w + h * h) ** 0.5
+            x0 = int(max(0, cx - half_diag))
+            y0 = int(max(0, cy - half_diag))
+            x1 = int(min(original_width, cx + half_diag))
+            y1 = int(min(original_height, cy + half_diag))
+            region = gray[y0:y1, x0:x1]
+            
+            if abs(angle) > DESKEW_MIN_ANGLE:
+                matrix = cv2.getRotationMatrix2D((cx - x0, cy - y0), angle, 1.0)
+                region = cv2.warpAffine(region, matrix, (region.shape[1], region.shape[0]),
+                                        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+                info["deskew_angle"] = round(angle, 2)
+            
+            # After rotation the receipt is an upright w x h box centred where it was
+            rx0 = int(max(0, (cx - x0) - w / 2))
+            ry0 = int(max(0, (cy - y0) - h / 2))
+            gray = region[ry0:ry0 + int(h), rx0:rx0 + int(w)]
+            info["cropped"] = True
+        
+        # Rescale so that the median glyph is about RECEIPT_TARGET_TEXT_HEIGHT pixels tall
+        text_height = estimate_text_height(gray) if rescale else None
+        if text_height:
+            scale = min(RECEIPT_MAX_SCALE, max(RECEIPT_MIN_SCALE, RECEIPT_TARGET_TEXT_HEIGHT / text_height))
+            if scale > 1.25 and text_height < RECEIPT_MIN_TEXT_HEIGHT and not upscale:
+                info["upscale"] = round(scale, 3)
+            elif scale < 0.9 or (scale > 1.25 and text_height < RECEIPT_MIN_TEXT_HEIGHT):
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+                info["scale"] = round(scale, 3)
+            info["text_height"] = round(text_height, 1)
+        
+        height, width = gray.shape[:2]
+        info.update({
+            "normalized_size": f"{width}x{height}",
+            "pixel_reduction": round((original_width * original_height) / float(max(1, width * height)), 2),
+            "time": (datetime.now() - start).total_seconds()
+        })
+        return np.ascontiguousarray(gray), info
     
-    def extract_text(self, image_path: str) -> Dict[str, Any]:
-        """Extract text from image using Tesseract OCR"""
+    def extract_text(self, image_path: ReceiptSource, trace: Trace = NULL_TRACE,
+                     deadline: Deadline = NO_DEADLINE, company: Optional[str] = None,
+                     memory: MemoryBudget = NO_MEMORY_BUDGET) -> Dict[str, Any]:
+        """Extract text from image using Tesseract OCR, recording stage spans on ``trace``
+        
+        ``image_path`` may also be a ``ReceiptBytes``, which is decoded from memory.
+        Under an active ``deadline`` each stage degrades as needed to finish in time;
+        the steps taken are recorded on the deadline. ``company`` keys the language
+        statistics of the auto-language mode. Under an active ``memory`` budget every
+        stage is sized to stay within it; its steps are recorded on the budget.
+        """
         if not self.ocr_available:
             return {
                 "success": False,
@@ -145,100 +593,29 @@ class TesseractOCRProcessor:
             start_time = datetime.now()
             
             # Handle PDF files
-            if image_path.lower().endswith('.pdf'):
-                if PDF_AVAILABLE:
-                    try:
-                        # First try pdfplumber for better text extraction
-                        with pdfplumber.open(image_path) as pdf:
-                            if len(pdf.pages) > 0:
-                                text = pdf.pages[0].extract_text()
-                                if text and len(text.strip()) > 20:
-                                    # If we got good text from pdfplumber, use it
-                                    processing_time = (datetime.now() - start_time).total_seconds()
-                                    return {
-                                        "success": True,
-                                        "extracted_text": text.strip(),
-                                        "confidence": 0.95,  # High confidence for PDF text extraction
-                                        "processing_time": processing_time,
-                                        "language": self.lang_string,
-                                        "image_size": "PDF",
-                                        "text_blocks": []
-                                    }
-                    except Exception as e:
-                        print(f"pdfplumber failed, falling back to image conversion: {e}", file=sys.stderr)
-                    
-                    # Fallback to image conversion if pdfplumber doesn't work well
-                    try:
-                        images = convert_from_path(image_path, first_page=1, last_page=1, dpi=300)
-                        if images:
-                            # Save first page as image with higher DPI
-                            temp_image_path = image_path.replace('.pdf', '_temp_hires.jpg')
-                            images[0].save(temp_image_path, 'JPEG', quality=95)
-                            image_path = temp_image_path
-                    except Exception as e:
-                        print(f"PDF to image conversion failed: {e}", file=sys.stderr)
-                        return {
-                            "success": False,
-                            "error": f"PDF processing failed: {e}"
-                        }
-                else:
+            if is_pdf(image_path):
+                if not PDF_AVAILABLE:
                     return {
                         "success": False,
                         "error": "PDF processing not available"
                     }
+                return self._extract_pdf(image_path, start_time, trace, deadline, company, memory)
             
             # Preprocess image for better OCR
-            processed_path = self.preprocess_image(image_path)
-            
-            # Open image
-            image = Image.open(processed_path)
+            preprocess_stats = {}
+            with trace.span('preprocess'):
+                image = self.preprocess_image(image_path, stats=preprocess_stats, trace=trace, deadline=deadline,
+                                              memory=memory)
             
             # Get image info
-            width, height = image.size
-            
-            # Use multiple OCR configurations for better results
-            configs = [
-                '--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/$:- ',
-                '--psm 4',  # Single column of text
-                '--psm 6',  # Single uniform block
-                '--psm 8',  # Single word
-            ]
+            width, height = image_dimensions(image)
             
-            best_result = None
-            best_confidence = 0
-            
-            for config in configs:
-                try:
-                    # Extract text with confidence data
-                    data = pytesseract.image_to_data(
-                        image, 
-                        lang=self.lang_string,
-                        output_type=pytesseract.Output.DICT,
-                        config=config
-                    )
-                    
-                    # Extract plain text
-                    text = pytesseract.image_to_string(
-                        image,
-                        lang=self.lang_string,
-                        config=config
-                    )
-                    
-                    # Calculate average confidence
-                    confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-                    
-                    if avg_confidence > best_confidence and len(text.strip()) > 10:
-                        best_confidence = avg_confidence
-                        best_result = {
-                            'text': text.strip(),
-                            'data': data,
-                            'confidence': avg_confidence
-                        }
-                
-                except Exception as e:
-                    print(f"OCR config {config} failed: {e}", file=sys.stderr)
-                    continue
+            if self.tiling and hasattr(image, 'shape') and tile_count(width, height, self.tile_workers) > 1:
+                recognize = lambda lang: self._recognize_tiled(image, trace, deadline, lang=lang, memory=memory)
+            else:
+                recognize = lambda lang: self._recognize(image, trace, source='image', deadline=deadline, lang=lang,
+                                                         memory=memory)
+            best_result, language_info = self._recognize_languages(image, recognize, company, trace, deadline)
             
             if not best_result:
                 return {
@@ -249,40 +626,17 @@ class TesseractOCRProcessor:
             # Calculate processing time
             processing_time = (datetime.now() - start_time).total_seconds()
             
-            # Create text blocks from best result
-            text_blocks = []
-            data = best_result['data']
-            for i in range(len(data['text'])):
-                if int(data['conf'][i]) > 30:  # Only include confident text
-                    text_blocks.append({
-                        'text': data['text'][i],
-                        'confidence': int(data['conf'][i]),
-                        'bbox': [data['left'][i], data['top'][i], 
-                                data['width'][i], data['height'][i]]
-                    })
-            
-            # Clean up temporary files
-            if processed_path != image_path:
-                try:
-                    os.remove(processed_path)
-                except:
-                    pass
-            
-            # Clean up PDF temp files
-            if '_temp_hires.jpg' in image_path:
-                try:
-                    os.remove(image_path)
-                except:
-                    pass
-            
             return {
                 "success": True,
                 "extracted_text": best_result['text'],
                 "confidence": best_result['confidence'] / 100.0,  # Convert to 0-1 scale
                 "processing_time": processing_time,
-                "language": self.lang_string,
+                "language": best_result['lang'],
                 "image_size": f"{width}x{height}",
-                "text_blocks": text_blocks
+                "text_blocks": self._build_text_blocks(best_result['data']),
+                "psm_schedule": best_result['schedule'],
+                **({"language_detection": language_info} if language_info else {}),
+                **preprocess_stats
             }
             
         except Exception as e:
@@ -292,227 +646,1000 @@ class TesseractOCRProcessor:
                 "error": str(e)
             }
     
-    def parse_receipt_data(self, text: str) -> Dict[str, Any]:
-        """Parse receipt text to extract structured data"""
-        parsed_data = {
-            "merchant_name": "",
-            "total_amount": "",
-            "date": "",
-            "items": [],
-            "subtotal": "",
-            "tax_amount": "",
-            "payment_method": "",
-            "receipt_number": "",
-            "address": "",
-            "phone": ""
-        }
+    def _extract_pdf(self, pdf_path: ReceiptSource, start_time: datetime, trace: Trace = NULL_TRACE,
+                     deadline: Deadline = NO_DEADLINE, company: Optional[str] = None,
+                     memory: MemoryBudget = NO_MEMORY_BUDGET) -> Dict[str, Any]:
+        """Extract text from every page of a PDF, streaming pages one at a time
+        
+        Pages with a usable text layer are read with pdfplumber. Only pages without
+        one are rasterized (at a DPI chosen from the page size) and OCR'd, on up to
+        ``page_workers`` threads, so at most that many rasterized pages are held in
+        memory at once. Per-page results are merged in page order. Under an active
+        ``deadline`` further pages are only started while a full page still fits.
+        Under an active ``memory`` budget pages are rasterized in grayscale, at a
+        lower DPI when a page would not fit, and fewer of them run at once.
+        """
+        pages = {}
+        skipped_pages = []
         
-        lines = text.split('\n')
-        text_lower = text.lower()
-        
-        # Extract merchant name (usually in first few lines, look for non-numeric lines)
-        for i, line in enumerate(lines[:8]):
-            line = line.strip()
-            # Skip very short lines, lines with mostly numbers, or common receipt words
-            if (len(line) > 4 and 
-                not re.match(r'^[\d\s\-\.\/\$,]+$', line) and
-                'receipt' not in line.lower() and
-                'invoice' not in line.lower() and
-                'total' not in line.lower() and
-                'subtotal' not in line.lower() and
-                'tax' not in line.lower() and
-                not re.match(r'^\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4}', line)):
-                parsed_data["merchant_name"] = line
-                break
-        
-        # Extract total amount with more comprehensive patterns
-        total_patterns = [
-            r'total[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'amount[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'grand\s+total[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'\$\s*(\d+[,\.]?\d{2})\s*total',
-            r'balance[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'due[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            # Look for standalone dollar amounts at end of lines
-            r'\$\s*(\d+\.\d{2})\s*$',
-            r'(\d+\.\d{2})\s*$',
-        ]
-        
-        found_amounts = []
-        for pattern in total_patterns:
-            matches = re.findall(pattern, text_lower, re.MULTILINE)
-            for match in matches:
-                amount = match.replace(',', '')
+        def ocr_page(page_number: int, dpi: int) -> Dict[str, Any]:
+            with trace.span('rasterize', page=page_number, dpi=dpi):
+                images = rasterize_pdf_page(pdf_path, page_number, dpi, grayscale=memory.active)
+            if not images:
+                return None
+            preprocess_stats = {}
+            with trace.span('preprocess', page=page_number):
+                image = self.preprocess_image(images[0], stats=preprocess_stats, trace=trace, deadline=deadline,
+                                              memory=memory)
+            del images
+            result, language_info = self._recognize_languages(
+                image, lambda lang: self._recognize(image, trace, source='pdf', deadline=deadline, lang=lang,
+                                                    memory=memory),
+                company, trace, deadline
+            )
+            if not result:
+                return None
+            return {
+                "page": page_number,
+                "source": "ocr",
+                "dpi": dpi,
+                "text": result['text'],
+                "confidence": result['confidence'] / 100.0,
+                "language": result['lang'],
+                "psm_schedule": result['schedule'],
+                **({"language_detection": language_info} if language_info else {}),
+                **preprocess_stats,
+                "text_blocks": [
+                    dict(block, page=page_number) for block in self._build_text_blocks(result['data'])
+                ]
+            }
+        
+        def collect(futures):
+            for future in futures:
                 try:
-                    amt_float = float(amount)
-                    if 0.01 <= amt_float <= 10000:  # Reasonable range for expenses
-                        found_amounts.append((amt_float, amount))
-                except ValueError:
+                    page_result = future.result()
+                except Exception as e:
+                    print(f"PDF page OCR failed: {e}", file=sys.stderr)
                     continue
+                if page_result:
+                    pages[page_result["page"]] = page_result
+        
+        with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+            pending = set()
+            try:
+                with pdfplumber.open(pdf_path.stream() if isinstance(pdf_path, ReceiptBytes) else pdf_path) as pdf:
+                    for page_number, page in enumerate(pdf.pages, start=1):
+                        if (pages or pending) and deadline.expired():
+                            skipped_pages.append(page_number)
+                            continue
+                        with trace.span('pdf_text', page=page_number):
+                            text = page.extract_text()
+                        dpi = pdf_page_dpi(float(page.width), float(page.height))
+                        page.flush_cache()  # Release the parsed page objects before moving on
+                        
+                        if text and len(text.strip()) > PDF_TEXT_MIN_CHARS:
+                            pages[page_number] = {
+                                "page": page_number,
+                                "source": "text",
+                                "text": text.strip(),
+                                "confidence": 0.95,  # High confidence for PDF text extraction
+                                "text_blocks": []
+                            }
+                            continue
+                        
+                        if memory.active:
+                            # Let pages in flight free their memory first, then fit this one into what is left
+                            while pending and not memory.fits(pdf_page_bytes(dpi, float(page.width), float(page.height))):
+                                memory.adapt("fewer_page_workers", page_workers=self.page_workers)
+                                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                                collect(done)
+                            dpi = self._page_dpi_within_budget(dpi, float(page.width), float(page.height), memory)
+                        
+                        if deadline.active and (pages or pending):
+                            # The first page always runs; later ones only while a full page fits
+                            megapixels = dpi * float(page.width) / 72 * dpi * float(page.height) / 72 / 1e6
+                            cost = COST_MODEL.estimate('denoise', megapixels) + COST_MODEL.estimate('ocr_pass', megapixels)
+                            if cost > deadline.budget():
+                                skipped_pages.append(page_number)
+                                continue
+                        
+                        # Bound the number of rasterized pages in flight
+                        if len(pending) >= self.page_workers:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            collect(done)
+                        pending.add(executor.submit(ocr_page, page_number, dpi))
+            except Exception as e:
+                print(f"pdfplumber failed, falling back to image conversion: {e}", file=sys.stderr)
+                if not pages and not pending:
+                    pending.add(executor.submit(ocr_page, 1, 300))
+            
+            collect(pending)
+        
+        if skipped_pages:
+            deadline.degrade("first_pdf_page_only", pages_skipped=len(skipped_pages))
+        
+        if not pages:
+            return {
+                "success": False,
+                "error": "PDF processing failed: no text found on any page"
+            }
+        
+        ordered = [pages[number] for number in sorted(pages)]
+        total_chars = sum(len(page["text"]) for page in ordered)
+        confidence = sum(page["confidence"] * len(page["text"]) for page in ordered) / total_chars
+        
+        return {
+            "success": True,
+            "extracted_text": '\n\n'.join(page["text"] for page in ordered),
+            "confidence": confidence,
+            "processing_time": (datetime.now() - start_time).total_seconds(),
+            "language": self.lang_string,
+            "image_size": "PDF",
+            "text_blocks": [block for page in ordered for block in page["text_blocks"]],
+            "pages": [
+                {key: value for key, value in page.items() if key not in ("text", "text_blocks")}
+                for page in ordered
+            ]
+        }
+    
+    def _page_dpi_within_budget(self, dpi: int, width_pt: float, height_pt: float, memory: MemoryBudget) -> int:
+        """Highest DPI up to ``dpi`` (and no lower than PDF_MIN_DPI) at which a page fits the memory budget"""
+        scale = memory.scale_for(pdf_page_bytes(dpi, width_pt, height_pt), 1.0)
+        fitted = max(PDF_MIN_DPI, int(dpi * scale))
+        if fitted < dpi:
+            memory.degrade("memory_pdf_dpi", dpi=fitted)
+            return fitted
+        return dpi
+    
+    def _recognize(self, image, trace: Trace = NULL_TRACE, source: str = 'image',
+                   deadline: Deadline = NO_DEADLINE, lang: Optional[str] = None,
+                   memory: MemoryBudget = NO_MEMORY_BUDGET) -> Optional[Dict[str, Any]]:
+        """Run the OCR configs on a PIL image or NumPy array and return the best result, or None
+        
+        Without a scheduler every config runs. With one, configs run in the learned
+        order and the search stops at the first pass the scheduler deems confident;
+        with ``ocr_workers`` > 1 the remaining configs run together after the first.
+        Under an active ``deadline`` only the configs that fit the remaining time
+        run, though the first always does. Under an active ``memory`` budget only as
+        many passes run together as fit it. ``lang`` overrides the processor's
+        language string. The returned result carries a ``schedule`` summary and
+        the ``lang`` it was recognized with.
+        """
+        lang = lang or self.lang_string
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        skipped: List[str] = []
+        width, height = image_dimensions(image)
+        workers = memory.concurrency(self.ocr_workers, width * height * OCR_PASS_BYTES_PER_PIXEL)
+        if workers < self.ocr_workers:
+            memory.adapt("fewer_ocr_workers", ocr_workers=workers)
+        parallel = workers > 1
+        if parallel and hasattr(image, 'load'):
+            image.load()  # Decode once up front instead of racing lazy loads across threads
+        pass_cost = COST_MODEL.estimate('ocr_pass', width * height / 1e6)
+        
+        def affordable(configs: List[str]) -> List[str]:
+            # Configs that fit the deadline, counting parallel passes as one round
+            if not deadline.active:
+                return configs
+            rounds = int(deadline.budget() / pass_cost)
+            count = rounds * (workers if parallel else 1)
+            if not results:
+                count = max(1, count)
+            skipped.extend(configs[count:])
+            return configs[:count]
+        
+        def run(configs: List[str]) -> bool:
+            # Recognize the image once per configuration, in parallel across cores;
+            # returns False when the deadline cut the list short
+            pending = [config for config in configs if config not in results]
+            configs = affordable(pending)
+            # The first pass is never cut off, so there is always a result to return
+            timeout = deadline.remaining() if deadline.active and results else None
+            if parallel and len(configs) > 1:
+                with ThreadPoolExecutor(max_workers=min(workers, len(configs))) as executor:
+                    outputs = list(executor.map(lambda config: self._run_ocr_config(image, config, trace, timeout, lang), configs))
+            else:
+                outputs = [self._run_ocr_config(image, config, trace, timeout, lang) for config in configs]
+            results.update(zip(configs, outputs))
+            return len(configs) == len(pending)
+        
+        def best_of(configs: List[str]) -> Optional[str]:
+            # Keep the highest-confidence result, scanning in config order
+            best_config = None
+            best_confidence = 0
+            for config in OCR_CONFIGS:
+                result = results.get(config) if config in configs else None
+                if result and result['confidence'] > best_confidence and len(result['text']) > 10:
+                    best_confidence = result['confidence']
+                    best_config = config
+            return best_config
+        
+        scheduler = self.psm_scheduler
+        if scheduler is None:
+            run(OCR_CONFIGS)
+            chosen = best_of(OCR_CONFIGS)
+            schedule = {"mode": "exhaustive", "passes": len(results)}
+        else:
+            profile = image_profile(*image_dimensions(image), source)
+            order = scheduler.order(profile, OCR_CONFIGS)
+            
+            def early_exit_choice():
+                # Walk the learned order, running configs as needed, until a confident pass
+                run(order[:1])
+                if order[0] in results and scheduler.is_confident(results[order[0]]):
+                    return order[0], True
+                if parallel:
+                    run(order[1:])
+                    return best_of(order), False
+                for config in order[1:]:
+                    if not run([config]):
+                        break
+                    if scheduler.is_confident(results[config]):
+                        return config, True
+                return best_of(order), False
+            
+            if scheduler.audit:
+                # In learned order, so a deadline that allows one pass still runs the config early exit compares
+                run(order)
+                early_config, early_exit = early_exit_choice()
+                chosen = best_of(OCR_CONFIGS)
+                audit_changed = early_config != chosen
+                scheduler.record(profile, chosen, len(results), False, audit_changed=audit_changed)
+                schedule = {"mode": "audit", "profile": profile, "passes": len(results),
+                            "early_exit_config": early_config, "early_exit_changed": audit_changed}
+            else:
+                chosen, early_exit = early_exit_choice()
+                scheduler.record(profile, chosen, len(results), early_exit)
+                schedule = {"mode": "adaptive", "profile": profile, "passes": len(results),
+                            "early_exit": early_exit}
+        
+        if skipped:
+            deadline.degrade("fewer_psm_configs", skipped=len(set(skipped)))
+            schedule["skipped"] = len(set(skipped))
+        
+        if chosen is None:
+            return None
+        schedule["config"] = chosen
+        return dict(results[chosen], schedule=schedule, lang=lang)
+    
+    def _recognize_tiled(self, image, trace: Trace = NULL_TRACE, deadline: Deadline = NO_DEADLINE,
+                         lang: Optional[str] = None, memory: MemoryBudget = NO_MEMORY_BUDGET) -> Optional[Dict[str, Any]]:
+        """Recognize a long receipt as overlapping strips in parallel and stitch the results
+        
+        Each strip goes through ``_recognize`` on its own thread (so the scheduler
+        learns a separate 'tile' profile), and the word data is stitched back into
+        page coordinates with the overlap de-duplicated. Under an active ``memory``
+        budget fewer strips are recognized at once. Returns the same shape as
+        ``_recognize``, or None when no strip produced usable text.
+        """
+        width, height = image_dimensions(image)
+        tiles = plan_tiles(image, tile_count(width, height, self.tile_workers))
+        
+        def recognize_tile(numbered):
+            index, tile = numbered
+            with trace.span('tile', tile=index, rows=[tile["top"], tile["bottom"]]):
+                return self._recognize(image[tile["top"]:tile["bottom"]], trace, source='tile', deadline=deadline,
+                                       lang=lang, memory=memory)
+        
+        tile_rows = max(tile["bottom"] - tile["top"] for tile in tiles)
+        tile_workers = memory.concurrency(len(tiles), width * tile_rows * OCR_PASS_BYTES_PER_PIXEL)
+        if tile_workers < len(tiles):
+            memory.adapt("fewer_tile_workers", tile_workers=tile_workers)
+        with ThreadPoolExecutor(max_workers=tile_workers) as executor:
+            results = list(executor.map(recognize_tile, enumerate(tiles)))
+        
+        data = stitch_tile_data(tiles, [result['data'] if result else None for result in results])
+        text = text_from_ocr_data(data).strip()
+        if len(text) <= 10:
+            return None
+        confidences = [float(conf) for conf in data['conf'] if float(conf) > 0]
+        
+        return {
+            'text': text,
+            'data': data,
+            'lang': lang or self.lang_string,
+            'confidence': sum(confidences) / len(confidences) if confidences else 0,
+            'schedule': {
+                "mode": "tiled",
+                "tiles": len(tiles),
+                "cuts": [tile["own_top"] for tile in tiles[1:]],
+                "passes": sum(result['schedule']['passes'] for result in results if result),
+                "configs": [result['schedule']['config'] if result else None for result in results]
+            }
+        }
+    
+    def _select_languages(self, image, company: Optional[str], trace: Trace = NULL_TRACE):
+        """Languages to recognize ``image`` with, and how they were chosen
+        
+        A company whose receipts are almost always in one language gets that
+        language without detection. Otherwise Tesseract's script detection runs
+        on a downscaled copy and the requested languages of that script are used;
+        an uncertain detection keeps the full list.
+        """
+        dominant = self.language_stats.dominant_language(company, self.languages)
+        if dominant:
+            return [dominant], {"method": "company_stats"}
+        
+        try:
+            with trace.span('script_detect') as span:
+                width, height = image_dimensions(image)
+                factor = min(1.0, SCRIPT_DETECTION_MAX_SIDE / float(max(width, height)))
+                if factor < 1.0 and hasattr(image, 'shape') and CV2_AVAILABLE:
+                    image = cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+                elif factor < 1.0:
+                    image = image.resize((max(1, int(width * factor)), max(1, int(height * factor))))
+                detected = self.engine.detect_script(image)
+                span["script"] = detected[0] if detected else None
+        except Exception as e:
+            print(f"Script detection failed: {e}", file=sys.stderr)
+            detected = None
+        
+        if not detected or detected[1] < MIN_SCRIPT_CONFIDENCE:
+            return self.languages, {"method": "full", "script": detected[0] if detected else None}
+        candidates = languages_for_script(self.languages, detected[0])
+        if not candidates:
+            return self.languages, {"method": "full", "script": detected[0]}
+        return candidates, {"method": "script", "script": detected[0], "script_confidence": detected[1]}
+    
+    def _recognize_languages(self, image, recognize, company: Optional[str], trace: Trace = NULL_TRACE,
+                             deadline: Deadline = NO_DEADLINE):
+        """Call ``recognize(lang)`` with the smallest suitable language set
         
-        # Pick the largest reasonable amount as total
-        if found_amounts:
-            found_amounts.sort(reverse=True)
-            parsed_data["total_amount"] = found_amounts[0][1]
-        
-        # Extract date with improved patterns
-        date_patterns = [
-            r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
-            r'(\d{2,4}[\/\-]\d{1,2}[\/\-]\d{1,2})',
-            r'(\d{1,2}\s+\w{3,9}\s+\d{2,4})',
-            r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2}[,\s]+\d{2,4}',
-            r'\d{1,2}[,\s]+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*[,\s]+\d{2,4}',
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                parsed_data["date"] = matches[0] if isinstance(matches[0], str) else matches[0][0]
-                break
-        
-        # Extract subtotal
-        subtotal_patterns = [
-            r'subtotal[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'sub\s+total[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'sub[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-        ]
-        
-        for pattern in subtotal_patterns:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                parsed_data["subtotal"] = matches[0].replace(',', '')
-                break
-        
-        # Extract tax with more patterns
-        tax_patterns = [
-            r'tax[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'gst[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'hst[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'vat[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-            r'sales\s+tax[:\s]*\$?\s*(\d+[,\.]?\d{0,2})',
-        ]
-        
-        for pattern in tax_patterns:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                parsed_data["tax_amount"] = matches[0].replace(',', '')
-                break
-        
-        # Extract phone number
-        phone_patterns = [
-            r'(\+?1?[-.\s]?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4})',
-            r'(\d{3}[-.\s]?\d{3}[-.\s]?\d{4})',
-        ]
-        
-        for pattern in phone_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                parsed_data["phone"] = matches[0]
-                break
-        
-        # Extract receipt/transaction number
-        receipt_patterns = [
-            r'receipt[#:\s]*([a-zA-Z0-9]+)',
-            r'transaction[#:\s]*([a-zA-Z0-9]+)',
-            r'order[#:\s]*([a-zA-Z0-9]+)',
-            r'invoice[#:\s]*([a-zA-Z0-9]+)',
-            r'ref[#:\s]*([a-zA-Z0-9]+)',
-        ]
-        
-        for pattern in receipt_patterns:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                parsed_data["receipt_number"] = matches[0]
-                break
-        
-        # Extract payment method
-        payment_patterns = [
-            r'(visa|mastercard|amex|american express|discover)',
-            r'(cash|credit|debit)',
-            r'card\s+ending\s+in\s+(\d{4})',
-        ]
-        
-        for pattern in payment_patterns:
-            matches = re.findall(pattern, text_lower)
-            if matches:
-                parsed_data["payment_method"] = matches[0]
-                break
-        
-        return parsed_data
-
-def categorize_expense(merchant_name: str, items: List[str]) -> str:
-    """Categorize expense based on merchant name and items"""
-    merchant_lower = merchant_name.lower()
-    items_text = ' '.join(items).lower()
-    
-    # Food & Dining categories
-    food_keywords = ['restaurant', 'cafe', 'coffee', 'pizza', 'burger', 'food', 'dining', 'bar', 'pub', 'grill', 'kitchen', 'bistro', 'deli', 'bakery', 'mcdonalds', 'subway', 'starbucks', 'tim hortons']
-    if any(keyword in merchant_lower for keyword in food_keywords):
-        return 'meals'
-    
-    # Transportation categories
-    transport_keywords = ['gas', 'fuel', 'petrol', 'shell', 'exxon', 'bp', 'chevron', 'taxi', 'uber', 'lyft', 'parking', 'metro', 'bus', 'train']
-    if any(keyword in merchant_lower for keyword in transport_keywords):
-        return 'transportation'
-    
-    # Office supplies
-    office_keywords = ['office', 'staples', 'supplies', 'depot', 'paper', 'pen', 'computer', 'electronics']
-    if any(keyword in merchant_lower for keyword in office_keywords):
-        return 'office_supplies'
-    
-    # Travel
-    travel_keywords = ['hotel', 'motel', 'airline', 'airport', 'flight', 'booking', 'travel', 'hilton', 'marriott', 'rental', 'car']
-    if any(keyword in merchant_lower for keyword in travel_keywords):
-        return 'travel'
-    
-    return 'general'
+        Without the auto-language mode this is ``recognize(self.lang_string)``.
+        With it, a narrowed pass whose confidence is low is redone with every
+        language (unless the deadline leaves no time for it), and the language
+        identified in the text is counted for the company. Returns the result
+        and the selection details (None when off).
+        """
+        if self.language_stats is None:
+            return recognize(self.lang_string), None
+        
+        languages, info = self._select_languages(image, company, trace)
+        result = recognize('+'.join(languages))
+        width, height = image_dimensions(image)
+        if len(languages) < len(self.languages) and \
+                (not result or result['confidence'] < MIN_RECOGNITION_CONFIDENCE * 100) and \
+                COST_MODEL.estimate('ocr_pass', width * height / 1e6) < deadline.budget():
+            info["fallback"] = True
+            full = recognize(self.lang_string)
+            if full and (not result or full['confidence'] >= result['confidence']):
+                result = full
+        
+        if result:
+            identified = identify_language(result['text'], self.languages)
+            if identified:
+                self.language_stats.record(company, identified)
+                info["identified"] = identified
+        return result, info
+    
+    def receipt_hash(self, image_path: ReceiptSource) -> Optional[int]:
+        """Perceptual hash of the receipt region for duplicate lookups
+        
+        The image is decoded at half resolution and cropped and deskewed like the OCR
+        input, so re-photographed copies hash alike. Returns None for PDFs, unreadable
+        files or when OpenCV is unavailable.
+        """
+        if not CV2_AVAILABLE or is_pdf(image_path):
+            return None
+        gray = read_image(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+        if gray is None:
+            return None
+        if self.detect_region:
+            gray, _ = self.normalize_receipt_region(gray, rescale=False)
+        return perceptual_hash(gray)
+    
+    def _build_text_blocks(self, data: Dict[str, List]) -> List[Dict[str, Any]]:
+        """Create text blocks from image_to_data output, keeping only confident words"""
+        return build_text_blocks(data)
+    
+    def _run_ocr_config(self, image, config: str, trace: Trace = NULL_TRACE,
+                        timeout: Optional[float] = None, lang: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Run a single Tesseract pass and derive the plain text from its word-level data
+        
+        ``timeout`` (seconds) aborts a pass that would overrun a deadline.
+        """
+        try:
+            with trace.span('psm', config=config) as span:
+                # Extract text with confidence data
+                start = time.perf_counter()
+                data = self.engine.image_to_data(image, lang or self.lang_string, config, timeout=timeout)
+                width, height = image_dimensions(image)
+                COST_MODEL.observe('ocr_pass', width * height / 1e6, time.perf_counter() - start)
+                
+                # Calculate average confidence
+                confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
+                avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+                span["confidence"] = round(avg_confidence / 100.0, 4)
+            
+            return {
+                'text': text_from_ocr_data(data).strip(),
+                'data': data,
+                'confidence': avg_confidence
+            }
+        
+        except Exception as e:
+            print(f"OCR config {config} failed: {e}", file=sys.stderr)
+            return None
+    
+    def parse_receipt_data(self, text: str, text_blocks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Parse receipt text to extract structured data; word boxes add line items"""
+        return parse_receipt_data(text, text_blocks)
 
-def main():
-    """Main function"""
-    parser = argparse.ArgumentParser(description='Tesseract OCR Receipt Processor')
-    parser.add_argument('image_path', help='Path to the receipt image')
-    parser.add_argument('--languages', nargs='+', default=['eng'], help='Languages to detect (e.g., eng, fra, deu)')
+CAPABILITIES_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, 'capabilities.json')
+CAPABILITY_MODULES = ['pytesseract', 'tesserocr', 'PIL', 'cv2', 'numpy', 'pdf2image', 'pdfplumber']
+
+def _tesseract_cmd() -> Optional[str]:
+    return shutil.which(os.environ.get('TESSERACT_CMD') or 'tesseract')
+
+def _path_stamp(path: Optional[str]) -> Optional[List]:
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+        return [path, stat.st_mtime_ns]
+    except OSError:
+        return [path, None]
+
+def capabilities_fingerprint(tessdata_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Cheap description of the environment (stat calls only); any change invalidates the probe"""
+    modules = {}
+    for name in CAPABILITY_MODULES:
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            spec = None
+        modules[name] = _path_stamp(spec.origin) if spec and spec.origin else None
     
-    args = parser.parse_args()
+    return {
+        "python": [sys.executable, sys.version],
+        "modules": modules,
+        "tesseract": _path_stamp(_tesseract_cmd()),
+        "tessdata_prefix": os.environ.get('TESSDATA_PREFIX'),
+        "tessdata": _path_stamp(tessdata_dir)
+    }
+
+def probe_capabilities() -> Dict[str, Any]:
+    """Report available backends, the Tesseract version and installed languages"""
+    backends = {
+        "pytesseract": TESSERACT_AVAILABLE,
+        "tesserocr": TESSEROCR_AVAILABLE,
+        "pil": PIL_AVAILABLE,
+        "opencv": CV2_AVAILABLE,
+        "pdf": PDF_AVAILABLE
+    }
+    
+    tesseract = {"available": False, "path": _tesseract_cmd(), "version": None, "languages": [], "tessdata_dir": None}
+    if tesseract["path"]:
+        try:
+            version_output = subprocess.run(
+                [tesseract["path"], '--version'], capture_output=True, text=True, timeout=10
+            )
+            first_line = (version_output.stdout or version_output.stderr).strip().splitlines()
+            tesseract["version"] = first_line[0].split()[-1] if first_line else None
+            
+            langs_output = subprocess.run(
+                [tesseract["path"], '--list-langs'], capture_output=True, text=True, timeout=10
+            )
+            lines = (langs_output.stdout or langs_output.stderr).strip().splitlines()
+            if lines:
+                # Header looks like: List of available languages in "/usr/share/tessdata/" (3):
+                header = re.search(r'"([^"]+)"', lines[0])
+                tesseract["tessdata_dir"] = header.group(1) if header else None
+                tesseract["languages"] = sorted(line.strip() for line in lines[1:] if line.strip())
+            tesseract["available"] = version_output.returncode == 0
+        except (OSError, subprocess.SubprocessError) as e:
+            tesseract["error"] = str(e)
     
+    return {
+        "ocr_available": PIL_AVAILABLE and (TESSEROCR_AVAILABLE or (TESSERACT_AVAILABLE and tesseract["available"])),
+        "backends": backends,
+        "engines": available_engines(),
+        "tesseract": tesseract,
+        "python": sys.version.split()[0],
+        "probed_at": datetime.now().isoformat()
+    }
+
+def get_capabilities(refresh: bool = False, cache_path: str = CAPABILITIES_CACHE_PATH) -> Dict[str, Any]:
+    """Capability probe, served from disk while the environment fingerprint is unchanged"""
+    if not refresh:
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            tessdata_dir = cached["capabilities"]["tesseract"].get("tessdata_dir")
+            if cached.get("fingerprint") == capabilities_fingerprint(tessdata_dir):
+                cached["capabilities"]["cached"] = True
+                return cached["capabilities"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    
+    capabilities = probe_capabilities()
     try:
-        # Check if file exists
-        if not os.path.exists(args.image_path):
-            print(json.dumps({
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        atomic_write_json(Path(cache_path), {
+            "fingerprint": capabilities_fingerprint(capabilities["tesseract"]["tessdata_dir"]),
+            "capabilities": capabilities
+        })
+    except OSError as e:
+        logger.warning(f"Could not cache capabilities: {e}")
+    capabilities["cached"] = False
+    return capabilities
+
+def process_receipt(processor: TesseractOCRProcessor, image_path: ReceiptSource,
+                    cache: Optional[ResultCache] = None, company: Optional[str] = None,
+                    index: Optional[ReceiptIndex] = None, deadline: Optional[Deadline] = None,
+                    memory: Optional[MemoryBudget] = None) -> Dict[str, Any]:
+    """Run OCR, parsing and categorization for one receipt and build the result document
+    
+    When a ``cache`` is given, results are looked up by the file's content hash,
+    the processor languages and the pipeline version before any OCR runs; a miss
+    claims the key, and a receipt another process has claimed (e.g. the upload
+    watcher) is waited for rather than recognized twice.
+    When an ``index`` is given and no exact result is cached, a near-duplicate of an
+    already processed receipt (within the index's ``max_distance``, by default well
+    below how close different receipts on one template come) returns that receipt's
+    parsed data with a ``possible_duplicate`` reference instead of running OCR; new
+    receipts are added.
+    ``company`` selects that company's category dictionary. The timing spans of
+    every stage are returned under ``"trace"``; they are never cached.
+    With a ``deadline`` the pipeline degrades instead of overrunning it and the
+    steps it skipped are listed under ``"degraded"``; degraded results are neither
+    cached nor indexed. A ``memory`` budget (by default one from the processor's
+    ``max_rss_mb``) bounds the OCR stages; results it had to downscale are flagged
+    under ``"degraded"`` the same way.
+    E-receipts (emails, HTML and text files) skip OCR, the cache and the index:
+    their text is parsed directly.
+    """
+    trace = Trace()
+    deadline = deadline or NO_DEADLINE
+    memory = memory or MemoryBudget(processor.max_rss_mb)
+    in_memory = isinstance(image_path, ReceiptBytes)
+    source_name = str(image_path)
+    
+    # Check if file exists
+    if in_memory:
+        if image_path.format is None:
+            return {
                 "success": False,
-                "error": f"File not found: {args.image_path}"
-            }))
-            return
+                "error": f"Unrecognized receipt data from {source_name}: not a PDF or supported image"
+            }
+    elif not os.path.exists(image_path):
+        return {
+            "success": False,
+            "error": f"File not found: {image_path}"
+        }
+    
+    # Emails, HTML and text files already hold the receipt text
+    if ereceipt_format(image_path) is not None:
+        result = process_ereceipt(image_path, company, processor.languages, trace)
+        if result["success"]:
+            result["trace"] = trace.to_dict()
+        return result
+    
+    # Check if OCR dependencies are available
+    if not processor.ocr_available:
+        print("OCR dependencies not available, providing mock data", file=sys.stderr)
+        return provide_mock_ocr_data(image_path)
+    
+    file_hash = None
+    if cache is not None or index is not None:
+        try:
+            file_hash = hash_bytes(image_path.data) if in_memory else hash_file(image_path)
+        except OSError as e:
+            logger.warning(f"Could not hash {image_path}: {e}")
+            cache = index = None
+    
+    cache_key = claimed_key = None
+    if cache is not None:
+        try:
+            with trace.span('cache_lookup'):
+                cache_key = cache.make_key(file_hash, processor.languages, cache_version(processor))
+                cached = cache.get(cache_key)
+                if cached is None and cache.claim(cache_key):
+                    claimed_key = cache_key
+            if cached is None and claimed_key is None:
+                # Another process, e.g. the upload watcher, is recognizing this file right now
+                with trace.span('cache_wait'):
+                    cached = cache.wait(cache_key, deadline.remaining() * CLAIM_WAIT_SHARE if deadline.active else None)
+            if cached is not None:
+                # Dictionaries change independently of OCR, so categorize again
+                with trace.span('categorize'):
+                    cached["suggested_category"] = categorize_expense(
+                        cached["parsed_data"].get("merchant_name", ""),
+                        cached["parsed_data"].get("items", []),
+                        company=company
+                    )
+                cached["cache"] = {"hit": True, "key": cache_key}
+                if index is not None:
+                    # An exact copy of an indexed receipt is still worth flagging
+                    duplicate = index.find_duplicate(None, file_hash, source_name)
+                    if duplicate is not None:
+                        cached["possible_duplicate"] = index.duplicate_reference(duplicate)
+                cached["trace"] = trace.to_dict()
+                return cached
+        except (OSError, ValueError) as e:
+            logger.warning(f"OCR cache lookup failed: {e}")
+            cache_key = None
+    
+    try:
+        receipt_hash = None
+        if index is not None:
+            try:
+                with trace.span('duplicate_lookup'):
+                    receipt_hash = processor.receipt_hash(image_path)
+                    match = index.find_duplicate(receipt_hash, file_hash, source_name)
+                if match is not None:
+                    duplicate = index.duplicate_result(match)
+                    with trace.span('categorize'):
+                        duplicate["suggested_category"] = categorize_expense(
+                            duplicate["parsed_data"].get("merchant_name", ""),
+                            duplicate["parsed_data"].get("items", []),
+                            company=company
+                        )
+                    duplicate["trace"] = trace.to_dict()
+                    return duplicate
+            except (OSError, ValueError) as e:
+                logger.warning(f"Duplicate lookup failed: {e}")
+                receipt_hash = None
         
-        # Check if OCR dependencies are available
-        if not TESSERACT_AVAILABLE or not PIL_AVAILABLE:
-            print("OCR dependencies not available, providing mock data", file=sys.stderr)
-            mock_result = provide_mock_ocr_data(args.image_path)
-            print(json.dumps(mock_result, indent=2))
-            return
-
-        processor = TesseractOCRProcessor(languages=args.languages)
-        ocr_result = processor.extract_text(args.image_path)
+        with trace.span('ocr'):
+            ocr_result = processor.extract_text(image_path, trace, deadline, company=company, memory=memory)
         
         if not ocr_result["success"]:
             print("OCR processing failed, providing mock data", file=sys.stderr)
-            mock_result = provide_mock_ocr_data(args.image_path)
-            print(json.dumps(mock_result, indent=2))
-            return
+            result = provide_mock_ocr_data(image_path)
+            if deadline.active:
+                result["degraded"] = deadline.degraded
+            return result
         
-        parsed_data = processor.parse_receipt_data(ocr_result["extracted_text"])
+        with trace.span('parse'):
+            parsed_data = processor.parse_receipt_data(ocr_result["extracted_text"], ocr_result.get("text_blocks"))
         
-        final_result = {
+        with trace.span('categorize'):
+            suggested_category = categorize_expense(
+                parsed_data.get("merchant_name", ""), 
+                parsed_data.get("items", []),
+                company=company
+            )
+        
+        result = {
             "success": True,
             "ocr_data": ocr_result,
             "parsed_data": parsed_data,
-            "suggested_category": categorize_expense(
-                parsed_data.get("merchant_name", ""), 
-                parsed_data.get("items", [])
-            )
+            "suggested_category": suggested_category,
+            "parser_version": PARSE_VERSION
         }
         
-        print(json.dumps(final_result, indent=2))
+        if deadline.degraded or memory.degraded:
+            # A rushed or downscaled result must not stand in for a full one later
+            result["degraded"] = deadline.degraded + memory.degraded
+            cache_key = receipt_hash = None
+        
+        if cache_key:
+            try:
+                with trace.span('cache_write'):
+                    cache.put(cache_key, result)
+            except OSError as e:
+                logger.warning(f"OCR cache write failed: {e}")
+            result["cache"] = {"hit": False, "key": cache_key}
+        
+        if receipt_hash is not None:
+            try:
+                with trace.span('index_add'):
+                    index.add(receipt_hash, file_hash, source_name, result)
+            except OSError as e:
+                logger.warning(f"Duplicate index write failed: {e}")
+        
+        result["trace"] = trace.to_dict()
+        return result
+    finally:
+        if claimed_key:
+            cache.release(claimed_key)
+
+def run_receipt_job(processor: TesseractOCRProcessor, image_path: ReceiptSource, cache: Optional[ResultCache] = None,
+                    company: Optional[str] = None, trace_file: Optional[str] = None,
+                    profile_dir: Optional[str] = None, index: Optional[ReceiptIndex] = None,
+                    deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """``process_receipt`` plus the opt-in diagnostics: a trace-file line and a cProfile dump per job
+    
+    Every result reports the job's peak RSS under ``"memory"``, with the steps
+    taken to stay within the processor's ``max_rss_mb`` when it has one.
+    """
+    memory = MemoryBudget(processor.max_rss_mb).start()
+    if profile_dir:
+        result = run_profiled(profile_dir, str(image_path), process_receipt, processor, image_path,
+                              cache=cache, company=company, index=index, deadline=deadline, memory=memory)
+    else:
+        result = process_receipt(processor, image_path, cache=cache, company=company, index=index,
+                                 deadline=deadline, memory=memory)
+    result["memory"] = memory.report()
+    
+    if trace_file:
+        try:
+            append_trace(trace_file, str(image_path), result)
+        except OSError as e:
+            logger.warning(f"Could not append to trace file: {e}")
+    return result
+
+def cache_version(processor: TesseractOCRProcessor) -> str:
+    """Pipeline version, OCR configs and result-affecting processor options, for cache keys"""
+    scheduler = processor.psm_scheduler
+    if scheduler is None or scheduler.audit:
+        psm_mode = "exhaustive"
+    else:
+        psm_mode = f"early_exit@{scheduler.early_exit_confidence}"
+    parts = [
+        PIPELINE_VERSION,
+        '|'.join(OCR_CONFIGS),
+        f"region={int(processor.detect_region)}",
+        f"psm={psm_mode}"
+    ]
+    if processor.language_stats is not None:
+        parts.append("lang=auto")
+    if processor.tiling:
+        # The strip count depends on the worker count, and the cuts on the strip count
+        parts.append(f"tiles={processor.tile_workers}")
+    return ':'.join(parts)
+
+def serve(input_stream=None, output_stream=None, default_languages: List[str] = None,
+          processor_options: Optional[Dict[str, Any]] = None, cache: Optional[ResultCache] = None,
+          trace_file: Optional[str] = None, profile_dir: Optional[str] = None,
+          index: Optional[ReceiptIndex] = None, deadline_ms: Optional[float] = None):
+    """Persistent worker loop: read JSON-lines jobs from stdin and write JSON-lines results to stdout.
+    
+    Each job is an object such as ``{"id": "42", "path": "/uploads/r.jpg", "languages": ["eng"]}``,
+    optionally with ``"company": "<id>"``, ``"options": {"no_cache": true, "no_duplicate_check": true}``
+    and a deadline, either ``"deadline_at"`` (epoch milliseconds) or ``"deadline_ms"`` from receipt of the job;
+    ``deadline_ms`` is the default for jobs without one.
+    Instead of a file, a job may name a shared-memory segment holding the receipt,
+    ``{"id": "43", "shm": "receipt-43", "size": 81234}``; ``path`` then only labels it.
+    Each response is ``{"id": "42", "result": {...}}`` where ``result`` has the same shape as the
+    single-shot CLI output. One processor is kept warm per language set, and a failing job only
+    produces an error response - the worker keeps running until stdin is closed.
+    """
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+    default_languages = default_languages or ['eng']
+    processor_options = processor_options or {}
+    processors: Dict[tuple, TesseractOCRProcessor] = {}
+    
+    def respond(job_id, result):
+        output_stream.write(json.dumps({"id": job_id, "result": result}) + "\n")
+        output_stream.flush()
+    
+    print("OCR worker ready", file=sys.stderr)
+    
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+        
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            image_path = job.get("path")
+            if job.get("shm"):
+                image_path = read_shared_memory(job["shm"], job.get("size"), name=image_path)
+            elif not image_path:
+                respond(job_id, {"success": False, "error": "Job is missing 'path'"})
+                continue
+            
+            languages = tuple(job.get("languages") or default_languages)
+            processor = processors.get(languages)
+            if processor is None:
+                processor = TesseractOCRProcessor(languages=list(languages), **processor_options)
+                processors[languages] = processor
+            
+            options = job.get("options") or {}
+            job_cache = None if options.get("no_cache") else cache
+            job_index = None if options.get("no_duplicate_check") else index
+            deadline = None
+            if job.get("deadline_at") is not None:
+                deadline = Deadline.from_epoch_ms(float(job["deadline_at"]))
+            elif job.get("deadline_ms", deadline_ms) is not None:
+                deadline = Deadline(budget_ms=float(job.get("deadline_ms", deadline_ms)))
+            respond(job_id, run_receipt_job(
+                processor, image_path, cache=job_cache, company=job.get("company"),
+                trace_file=trace_file, profile_dir=profile_dir, index=job_index, deadline=deadline
+            ))
+            
+        except Exception as e:
+            print(f"OCR job {job_id} failed: {e}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            respond(job_id, {"success": False, "error": str(e)})
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Tesseract OCR Receipt Processor')
+    parser.add_argument('image_path', nargs='?', help='Path to the receipt image, PDF, or e-receipt (.eml, .html, .txt; parsed without OCR); with --stdin or --shm: a label for it')
+    parser.add_argument('--stdin', action='store_true',
+                        help='Read the receipt file from stdin instead of a path; its type is detected from its bytes')
+    parser.add_argument('--shm', metavar='NAME', help='Read the receipt file from this named shared-memory segment')
+    parser.add_argument('--shm-size', type=int, default=None, help='With --shm: length of the receipt file in the segment')
+    parser.add_argument('--languages', nargs='+', default=['eng'], help='Languages to detect (e.g., eng, fra, deu)')
+    parser.add_argument('--auto-lang', action='store_true',
+                        help='Recognize each receipt with only the --languages of its detected script or its company\'s usual language')
+    parser.add_argument('--language-stats', default=None,
+                        help='Per-company language statistics file (default: $OCR_LANGUAGE_STATS or in the cache directory)')
+    parser.add_argument('--ocr-workers', type=int, default=None,
+                        help='OCR configurations to recognize in parallel (default: one per config, capped at CPU count)')
+    parser.add_argument('--no-region-detect', action='store_true',
+                        help='Skip receipt cropping, deskew and text-height normalization')
+    parser.add_argument('--engine', choices=['auto', 'tesserocr', 'pytesseract'], default=DEFAULT_ENGINE,
+                        help='Tesseract backend: in-process tesserocr API, pytesseract subprocess, or auto')
+    parser.add_argument('--tile', action='store_true',
+                        help='Split long receipts into overlapping strips and OCR them in parallel')
+    parser.add_argument('--early-exit-confidence', type=float, default=None,
+                        help='Opt in to the adaptive PSM scheduler: stop trying OCR configs once a pass reaches this '
+                             f'mean confidence (0-1, e.g. {DEFAULT_EARLY_EXIT_CONFIDENCE}); by default every config runs')
+    parser.add_argument('--exhaustive-psm', action='store_true',
+                        help='Run every OCR config even when --early-exit-confidence is given')
+    parser.add_argument('--psm-audit', action='store_true',
+                        help='Run every OCR config and record how often stopping early would change the result')
+    parser.add_argument('--psm-stats', default=None, help='PSM scheduler statistics file (default: $OCR_PSM_STATS or in the cache directory)')
+    parser.add_argument('--psm-report', action='store_true', help='Print PSM scheduler statistics and audit results and exit')
+    parser.add_argument('--deadline-ms', type=float, default=None,
+                        help='Time budget per receipt; stages degrade to return a flagged best-so-far result in time')
+    parser.add_argument('--max-rss-mb', type=float, default=None,
+                        help='Peak memory budget per receipt; images are decoded smaller, filtered in bands and '
+                             'recognized serially to stay within it')
+    parser.add_argument('--company', help='Company id whose category dictionary should be used')
+    parser.add_argument('--capabilities', action='store_true',
+                        help='Print available OCR backends, Tesseract version and languages as JSON and exit')
+    parser.add_argument('--refresh', action='store_true', help='With --capabilities: ignore the cached probe')
+    parser.add_argument('--serve', action='store_true', help='Run as a persistent worker reading JSON-lines jobs from stdin')
+    parser.add_argument('--batch', nargs='+', metavar='INPUT', help='Process directories or glob patterns of receipts on a process pool')
+    parser.add_argument('--manifest', help='Batch mode: file listing one receipt path per line')
+    parser.add_argument('--output', help='Batch mode: JSON-lines output file; receipts it already has results for are skipped '
+                                         'and failed ones retried. '
+                                         'Re-parse mode: file for the updated records')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Batch, re-parse and watch mode: worker processes (default: CPU count)')
+    parser.add_argument('--watch', metavar='DIR',
+                        help='Recognize receipts as they are uploaded into DIR, storing results in the OCR cache')
+    parser.add_argument('--watch-queue', type=int, default=None,
+                        help='Watch mode: receipts waiting for a worker before the lowest-priority one is left to the request path')
+    parser.add_argument('--watch-backfill', action='store_true',
+                        help='Watch mode: also recognize the receipts already in DIR when workers are idle')
+    parser.add_argument('--watch-metrics', default=None,
+                        help='Watch mode: queue metrics file (default: $OCR_WATCH_METRICS or in the cache directory)')
+    parser.add_argument('--reparse', nargs='*', metavar='RESULTS',
+                        help='Re-run parsing and categorization on stored JSON-lines results (files, or stdin) without OCR')
+    parser.add_argument('--force-reparse', action='store_true', help='With --reparse: also re-parse records at the current parser version')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the OCR result cache')
+    parser.add_argument('--cache-dir', default=None, help='OCR result cache directory (default: $OCR_CACHE_DIR or system temp)')
+    parser.add_argument('--cache-max-mb', type=float, default=None, help='OCR result cache size limit in MB')
+    parser.add_argument('--cache-stats', action='store_true', help='Print OCR result cache counters and exit')
+    parser.add_argument('--no-duplicate-check', action='store_true',
+                        help='Always run OCR instead of answering near-duplicates from the receipt index')
+    parser.add_argument('--duplicate-index', default=None,
+                        help='Duplicate receipt index file (default: $OCR_DUPLICATE_INDEX or in the cache directory)')
+    parser.add_argument('--duplicate-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help='Perceptual-hash Hamming distance treated as a duplicate')
+    parser.add_argument('--trace-file', help='Append a JSON-lines timing summary per receipt to this file')
+    parser.add_argument('--trace-summary', metavar='TRACE_FILE', help='Print aggregate counters and stage latencies from a trace file and exit')
+    parser.add_argument('--profile', metavar='DIR', help='Write a cProfile .pstats dump per receipt into this directory')
+    
+    args = parser.parse_args()
+    
+    if args.capabilities:
+        print(json.dumps(get_capabilities(refresh=args.refresh), indent=2))
+        return
+    
+    if args.psm_report:
+        report = PSMScheduler(stats_path=args.psm_stats,
+                              early_exit_confidence=args.early_exit_confidence or DEFAULT_EARLY_EXIT_CONFIDENCE).report()
+        print(json.dumps(report, indent=2))
+        return
+    
+    if args.trace_summary:
+        print(json.dumps(summarize_trace_file(args.trace_summary), indent=2))
+        return
+    
+    if args.reparse is not None:
+        from ocr_reparse import run_reparse
+        summary = run_reparse(args.reparse, output_path=args.output, jobs=args.jobs,
+                              company=args.company, force=args.force_reparse)
+        print(json.dumps(summary), file=sys.stderr)
+        return
+    
+    processor_options = {
+        "ocr_workers": args.ocr_workers,
+        "detect_region": not args.no_region_detect,
+        "early_exit_confidence": None if args.exhaustive_psm else args.early_exit_confidence,
+        "psm_audit": args.psm_audit,
+        "psm_stats_path": args.psm_stats,
+        "engine": args.engine,
+        "tiling": args.tile,
+        "auto_language": args.auto_lang,
+        "language_stats_path": args.language_stats,
+        "max_rss_mb": args.max_rss_mb
+    }
+    
+    cache = None
+    if not args.no_cache or args.cache_stats:
+        try:
+            cache = ResultCache(cache_dir=args.cache_dir, max_mb=args.cache_max_mb)
+        except OSError as e:
+            logger.warning(f"OCR cache unavailable: {e}")
+    
+    if args.cache_stats:
+        print(json.dumps(cache.stats() if cache else {"error": "OCR cache unavailable"}, indent=2))
+        return
+    
+    index = None
+    if not args.no_duplicate_check and not (args.batch or args.manifest or args.watch):
+        try:
+            index = ReceiptIndex(args.duplicate_index, max_distance=args.duplicate_distance)
+        except OSError as e:
+            logger.warning(f"Duplicate receipt index unavailable: {e}")
+    
+    if args.serve:
+        serve(default_languages=args.languages, processor_options=processor_options, cache=cache,
+              trace_file=args.trace_file, profile_dir=args.profile, index=index, deadline_ms=args.deadline_ms)
+        return
+    
+    if args.watch:
+        if cache is None:
+            parser.error('--watch stores its results in the OCR cache and cannot be combined with --no-cache')
+        from ocr_watcher import UploadWatcher, DEFAULT_MAX_QUEUE
+        UploadWatcher(
+            args.watch,
+            jobs=args.jobs,
+            max_queue=args.watch_queue or DEFAULT_MAX_QUEUE,
+            backfill=args.watch_backfill,
+            metrics_path=args.watch_metrics,
+            languages=args.languages,
+            processor_options=processor_options,
+            cache_dir=args.cache_dir,
+            cache_max_mb=args.cache_max_mb,
+            trace_file=args.trace_file,
+            index_path=None if args.no_duplicate_check else (args.duplicate_index or DEFAULT_INDEX_PATH),
+            index_max_distance=args.duplicate_distance
+        ).run()
+        return
+    
+    if args.batch or args.manifest:
+        from ocr_batch import iter_inputs, run_batch
+        summary = run_batch(
+            iter_inputs(args.batch or [], manifest=args.manifest),
+            output_path=args.output,
+            jobs=args.jobs,
+            languages=args.languages,
+            processor_options=processor_options,
+            cache_dir=args.cache_dir,
+            cache_max_mb=args.cache_max_mb,
+            use_cache=not args.no_cache,
+            trace_file=args.trace_file,
+            profile_dir=args.profile,
+            index_path=None if args.no_duplicate_check else (args.duplicate_index or DEFAULT_INDEX_PATH),
+            index_max_distance=args.duplicate_distance
+        )
+        print(json.dumps(summary), file=sys.stderr)
+        return
+    
+    source = args.image_path
+    try:
+        if args.stdin:
+            source = read_stdin(name=args.image_path or 'stdin')
+        elif args.shm:
+            source = read_shared_memory(args.shm, args.shm_size, name=args.image_path)
+    except (OSError, ValueError) as e:
+        print(json.dumps({"success": False, "error": f"Could not read receipt input: {e}"}, indent=2))
+        return
+    
+    if source is None:
+        parser.error('image_path is required unless --stdin, --shm, --serve, --watch, --batch or --manifest is given')
+    
+    try:
+        deadline = None
+        if args.deadline_ms is not None:
+            deadline = Deadline(budget_ms=args.deadline_ms, expires_at=STARTED_AT + args.deadline_ms / 1000.0)
+        processor = TesseractOCRProcessor(languages=args.languages, **processor_options)
+        result = run_receipt_job(processor, source, cache=cache, company=args.company,
+                                 trace_file=args.trace_file, profile_dir=args.profile, index=index,
+                                 deadline=deadline)
+        print(json.dumps(result, indent=2))
         
     except Exception as e:
         print(f"OCR processing failed with exception, providing mock data: {str(e)}", file=sys.stderr)
@@ -520,4 +1647,4 @@ def main():
         print(json.dumps(mock_result, indent=2))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
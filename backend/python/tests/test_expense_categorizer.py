@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from expense_categorizer import DEFAULT_DICTIONARY_DIR, ExpenseCategorizer
+
+
+@pytest.fixture(scope='module')
+def categorizer():
+    return ExpenseCategorizer([os.path.join(DEFAULT_DICTIONARY_DIR, 'default.json')], check_interval=3600)
+
+
+def test_short_keywords_do_not_match_inside_item_words(categorizer):
+    items = [{'description': 'Carrots'}, {'description': 'Open box'}]
+    assert categorizer.categorize('Corner Market', items) == 'general'
+
+
+@pytest.mark.parametrize('items, category', [
+    (['Car wash'], 'travel'),
+    ([{'description': 'Blue pen 3 pack'}], 'office_supplies'),
+    (['BP-95 unleaded'], 'transportation'),
+    (['2x Tim Hortons gift card'], 'meals'),
+])
+def test_keywords_match_whole_item_words(categorizer, items, category):
+    assert categorizer.categorize('Corner Market', items) == category
+
+
+def test_merchant_keywords_match_inside_words(categorizer):
+    assert categorizer.categorize('Burgerville', ['Carrots']) == 'meals'
+
+
+@pytest.fixture
+def nested_categorizer(tmp_path):
+    path = tmp_path / 'nested.json'
+    path.write_text(json.dumps({'categories': [
+        {'name': 'pens', 'keywords': ['pen']},
+        {'name': 'boxes', 'keywords': ['open box']},
+        {'name': 'tags', 'keywords': ['#tag']}
+    ]}))
+    return ExpenseCategorizer([str(path)], check_interval=3600)
+
+
+@pytest.mark.parametrize('items, category', [
+    (['Open  box'], 'boxes'),
+    (['Reopen box'], 'general'),
+    (['Reopen box', 'pen'], 'pens'),
+    (['Gel pen'], 'pens'),
+    (['x#tag'], 'tags'),
+])
+def test_whole_word_check_applies_to_each_nested_keyword(nested_categorizer, items, category):
+    assert nested_categorizer.categorize('Corner Market', items) == category
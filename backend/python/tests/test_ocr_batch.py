@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+import ocr_batch
+
+
+def _init_noop(*args):
+    pass
+
+
+def _process_or_die(path):
+    if os.path.basename(path).startswith('crash'):
+        os._exit(1)
+    return {"path": path, "success": True}
+
+
+@pytest.fixture
+def fake_workers(monkeypatch):
+    monkeypatch.setattr(ocr_batch, '_init_worker', _init_noop)
+    monkeypatch.setattr(ocr_batch, '_process_one', _process_or_die)
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_dead_worker_fails_its_receipts_and_the_batch_goes_on(tmp_path, fake_workers):
+    paths = [str(tmp_path / name) for name in ['a.jpg', 'crash.jpg', 'b.jpg', 'c.jpg', 'd.jpg', 'e.jpg']]
+    output = str(tmp_path / 'out.jsonl')
+
+    summary = ocr_batch.run_batch(paths, output_path=output, jobs=1)
+
+    records = read_records(output)
+    assert sorted(record["path"] for record in records) == sorted(paths)
+    assert not any(record["success"] for record in records if record["path"].endswith('crash.jpg'))
+    assert records[-1]["success"]
+    assert summary["processed"] + summary["failed"] == len(paths)
+    assert summary["processed"] >= 1
+
+
+def test_resume_retries_only_failed_receipts(tmp_path, fake_workers):
+    output = tmp_path / 'out.jsonl'
+    done, failed = str(tmp_path / 'done.jpg'), str(tmp_path / 'failed.jpg')
+    output.write_text(json.dumps({"path": done, "success": True}) + '\n' +
+                      json.dumps({"path": failed, "success": False}) + '\n')
+
+    summary = ocr_batch.run_batch([done, failed], output_path=str(output), jobs=1)
+
+    assert summary["skipped"] == 1
+    assert read_records(output)[-1] == {"path": failed, "success": True}
@@ -0,0 +1,27 @@
+import pytest
+
+import receipt_layout
+from receipt_layout import build_text_blocks
+
+DATA = {
+    'text': ['ACME', 'noise', 'Total', '10.00'],
+    'conf': ['91.5', '-1', 40, 88.0],
+    'left': [10, 60, 10, 200],
+    'top': [5, 5, 40, 40],
+    'width': [40, 30, 50, 45],
+    'height': [12, 12, 12, 12]
+}
+
+
+def test_fallback_parses_float_confidences(monkeypatch):
+    monkeypatch.setattr(receipt_layout, 'NUMPY_AVAILABLE', False)
+    blocks = build_text_blocks(DATA)
+    assert [(block['text'], block['confidence']) for block in blocks] == [('ACME', 91), ('Total', 40), ('10.00', 88)]
+
+
+def test_fallback_matches_numpy_path(monkeypatch):
+    if not receipt_layout.NUMPY_AVAILABLE:
+        pytest.skip('NumPy not installed')
+    expected = build_text_blocks(DATA)
+    monkeypatch.setattr(receipt_layout, 'NUMPY_AVAILABLE', False)
+    assert build_text_blocks(DATA) == expected
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+import receipt_parser
+from receipt_parser import ReceiptParser, parse_receipt_data
+
+
+class UngatedParser(ReceiptParser):
+    """The parser with every labelled pattern group run, as before the keyword scan was added"""
+
+    def parse(self, text, text_blocks=None):
+        original = receipt_parser.KEYWORD_PATTERN
+        receipt_parser.KEYWORD_PATTERN = _AllKeywords()
+        try:
+            return super().parse(text, text_blocks)
+        finally:
+            receipt_parser.KEYWORD_PATTERN = original
+
+
+class _AllKeywords:
+    KEYWORDS = ['total', 'amount', 'balance', 'due', 'sub', 'tax', 'gst', 'hst', 'vat',
+                'receipt', 'transaction', 'order', 'invoice', 'ref']
+
+    def findall(self, text):
+        return self.KEYWORDS
+
+
+@pytest.mark.parametrize('text', [
+    'RECEIPTOTAL 5.00',
+    'amountax 1,234.00',
+    'SUBTOTAL 4.00\nORDERECEIPT #A123',
+    'BALANCEDUE 7.50',
+    'HSTAX 0.65\nINVOICEREF 991',
+    'totalamountaxdue 12.00',
+])
+def test_overlapping_keywords_match_ungated_parser(text):
+    assert parse_receipt_data(text) == UngatedParser().parse(text)
+
+
+def test_fuzzed_texts_match_ungated_parser():
+    rng = random.Random(8)
+    fragments = ['total', 'amount', 'balance', 'due', 'sub', 'tax', 'gst', 'hst', 'vat', 'receipt',
+                 'transaction', 'order', 'invoice', 'ref', 'al', 'ax', ':', ' ', '\n', '$', '#',
+                 '12.50', '1,234.00', '7', 'visa', 'cash']
+    ungated = UngatedParser()
+    for _ in range(2000):
+        text = ''.join(rng.choice(fragments) for _ in range(rng.randint(1, 12)))
+        if rng.random() < 0.5:
+            text = text.upper()
+        assert parse_receipt_data(text) == ungated.parse(text), text
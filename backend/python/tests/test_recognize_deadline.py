@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from ocr_deadline import Deadline
+from psm_scheduler import DEFAULT_EARLY_EXIT_CONFIDENCE, image_profile
+from tesseract_ocr import OCR_CONFIGS, TesseractOCRProcessor
+
+
+class FakeEngineProcessor(TesseractOCRProcessor):
+    """Processor whose OCR passes return a canned result instead of running Tesseract"""
+
+    def __init__(self, confidence, **kwargs):
+        super().__init__(**kwargs)
+        self.confidence = confidence
+        self.calls = []
+
+    def _run_ocr_config(self, image, config, trace=None, timeout=None, lang=None):
+        self.calls.append(config)
+        return {'text': 'ACME COFFEE SHOP Total 10.00', 'data': {}, 'confidence': self.confidence[config]}
+
+
+@pytest.fixture
+def image():
+    return np.zeros((100, 200), dtype=np.uint8)
+
+
+def learned_processor(tmp_path, image, winner, confidence, **kwargs):
+    processor = FakeEngineProcessor(confidence, ocr_workers=1, psm_stats_path=str(tmp_path / 'psm.json'), **kwargs)
+    profile = image_profile(image.shape[1], image.shape[0], 'image')
+    for _ in range(3):
+        processor.psm_scheduler.record(profile, winner, 1, True)
+    return processor
+
+
+@pytest.mark.parametrize('winner_confidence', [95, 40])
+def test_audit_under_exhausted_deadline_runs_learned_config(tmp_path, image, winner_confidence):
+    winner = OCR_CONFIGS[1]
+    confidence = {config: 60 for config in OCR_CONFIGS}
+    confidence[winner] = winner_confidence
+    processor = learned_processor(tmp_path, image, winner, confidence, psm_audit=True)
+
+    result = processor._recognize(image, deadline=Deadline(budget_ms=0))
+
+    assert processor.calls == [winner]
+    assert result['schedule']['mode'] == 'audit'
+    assert result['schedule']['config'] == winner
+    assert result['schedule']['early_exit_config'] == winner
+    assert result['schedule']['skipped'] == len(OCR_CONFIGS) - 1
+
+
+def test_adaptive_under_exhausted_deadline_returns_first_pass(tmp_path, image):
+    winner = OCR_CONFIGS[1]
+    confidence = {config: 40 for config in OCR_CONFIGS}
+    processor = learned_processor(tmp_path, image, winner, confidence,
+                                  early_exit_confidence=DEFAULT_EARLY_EXIT_CONFIDENCE)
+
+    result = processor._recognize(image, deadline=Deadline(budget_ms=0))
+
+    assert processor.calls == [winner]
+    assert result['schedule'] == dict(result['schedule'], mode='adaptive', config=winner, early_exit=False)
+
+
+def test_every_config_runs_by_default(image):
+    confidence = {config: 95 for config in OCR_CONFIGS}
+    confidence[OCR_CONFIGS[2]] = 97
+    processor = FakeEngineProcessor(confidence, ocr_workers=1)
+
+    result = processor._recognize(image)
+
+    assert processor.psm_scheduler is None
+    assert sorted(processor.calls) == sorted(OCR_CONFIGS)
+    assert result['schedule'] == dict(result['schedule'], mode='exhaustive', config=OCR_CONFIGS[2])
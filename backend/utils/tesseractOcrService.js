@@ -40,15 +40,144 @@ class OCRQueue {
 
 const ocrQueue = new OCRQueue(tesseractConfig.maxConcurrent);
 
+// Long-lived `tesseract_ocr.py --serve` process that handles JSON-lines jobs
+class OCRWorker {
+  constructor() {
+    this.process = null;
+    this.buffer = '';
+    this.pending = new Map();
+    this.nextId = 1;
+  }
+
+  start() {
+    const args = [tesseractConfig.scriptPath, '--serve', '--languages', ...tesseractConfig.settings.languages];
+    if (tesseractConfig.autoLanguage) {
+      args.push('--auto-lang');
+    }
+    if (tesseractConfig.maxRssMb) {
+      args.push('--max-rss-mb', String(tesseractConfig.maxRssMb));
+    }
+    console.log(`Starting Tesseract OCR worker: ${tesseractConfig.pythonPath} ${args.join(' ')}`);
+
+    const child = spawn(tesseractConfig.pythonPath, args, {
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+    this.process = child;
+
+    child.stdout.on('data', (data) => {
+      this.buffer += data.toString();
+      let newline;
+      while ((newline = this.buffer.indexOf('\n')) >= 0) {
+        const line = this.buffer.slice(0, newline).trim();
+        this.buffer = this.buffer.slice(newline + 1);
+        if (line) {
+          this.handleLine(line);
+        }
+      }
+    });
+
+    child.stderr.on('data', (data) => {
+      console.error(`[ocr-worker] ${data.toString().trim()}`);
+    });
+
+    const onExit = (reason) => {
+      // 'error' and 'close' can both fire, the second after a replacement worker has started
+      if (this.process !== child) {
+        return;
+      }
+      this.process = null;
+      this.buffer = '';
+      for (const { reject, timer } of this.pending.values()) {
+        clearTimeout(timer);
+        reject(new Error(`Tesseract OCR process failed: worker ${reason}`));
+      }
+      this.pending.clear();
+    };
+
+    child.on('close', (code) => onExit(`exited with code ${code}`));
+    child.on('error', (error) => {
+      if (error.code === 'ENOENT') {
+        error.message = `Python executable not found: ${tesseractConfig.pythonPath}. Please ensure Python is installed and accessible.`;
+      }
+      onExit(error.message);
+    });
+    // Writing to a worker that has just died fails with EPIPE
+    child.stdin.on('error', (error) => {
+      onExit(`stopped reading jobs: ${error.message}`);
+      child.kill('SIGKILL');
+    });
+  }
+
+  handleLine(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (parseError) {
+      console.error(`Failed to parse OCR worker output: ${line}`);
+      return;
+    }
+
+    const job = this.pending.get(message.id);
+    if (!job) {
+      return;
+    }
+    clearTimeout(job.timer);
+    this.pending.delete(message.id);
+    job.resolve(message.result);
+  }
+
+  submit(imagePath, languages, company) {
+    if (!this.process) {
+      this.start();
+    }
+
+    return new Promise((resolve, reject) => {
+      const id = String(this.nextId++);
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Tesseract OCR process timed out after ${tesseractConfig.timeout}ms`));
+        // A stuck job blocks every job behind it, so recycle the worker
+        if (this.process) {
+          this.process.kill('SIGKILL');
+        }
+      }, tesseractConfig.timeout);
+
+      this.pending.set(id, { resolve, reject, timer });
+      // Queued jobs share the worker, so the deadline is absolute rather than a budget
+      const deadlineAt = Date.now() + tesseractConfig.timeout - tesseractConfig.deadlineMargin;
+      this.process.stdin.write(JSON.stringify({ id, path: imagePath, languages, company, deadline_at: deadlineAt }) + '\n');
+    });
+  }
+}
+
+// One worker per concurrent queue slot; jobs go to the least busy worker
+const ocrWorkers = Array.from({ length: tesseractConfig.maxConcurrent }, () => new OCRWorker());
+
+const processWithWorker = (imagePath, options = {}) => {
+  const { languages = tesseractConfig.settings.languages, company } = options;
+
+  if (!fs.existsSync(imagePath)) {
+    return Promise.reject(new Error(`Image file not found: ${imagePath}`));
+  }
+
+  const worker = ocrWorkers.reduce((idle, candidate) =>
+    candidate.pending.size < idle.pending.size ? candidate : idle
+  );
+  return worker.submit(imagePath, languages, company);
+};
+
 // Process receipt using Tesseract OCR
 const processTesseractOCR = async (imagePath, options = {}) => {
   return new Promise((resolve, reject) => {
     const {
       languages = tesseractConfig.settings.languages,
-      parseOnly = false
+      parseOnly = false,
+      company,
+      buffer
     } = options;
 
-    if (!fs.existsSync(imagePath)) {
+    // A buffer (e.g. from memory storage) is piped to `--stdin`; imagePath then only labels it
+    if (!buffer && !fs.existsSync(imagePath)) {
       return reject(new Error(`Image file not found: ${imagePath}`));
     }
 
@@ -58,10 +187,29 @@ const processTesseractOCR = async (imagePath, options = {}) => {
       '--languages', ...languages
     ];
 
+    if (buffer) {
+      args.push('--stdin');
+    }
+
     if (parseOnly) {
       args.push('--parse-only');
     }
 
+    if (tesseractConfig.autoLanguage) {
+      args.push('--auto-lang');
+    }
+
+    if (tesseractConfig.maxRssMb) {
+      args.push('--max-rss-mb', String(tesseractConfig.maxRssMb));
+    }
+
+    if (company) {
+      args.push('--company', company);
+    }
+
+    // Return a flagged best-so-far result instead of being killed at the timeout
+    args.push('--deadline-ms', String(Math.max(0, tesseractConfig.timeout - tesseractConfig.deadlineMargin)));
+
     console.log(`Executing Tesseract OCR: ${tesseractConfig.pythonPath} ${args.join(' ')}`);
 
     const pythonProcess = spawn(tesseractConfig.pythonPath, args, {
@@ -72,6 +220,12 @@ const processTesseractOCR = async (imagePath, options = {}) => {
     let stdout = '';
     let stderr = '';
 
+    if (buffer) {
+      // The process may exit before reading everything; its exit code reports why
+      pythonProcess.stdin.on('error', (error) => console.error(`Could not pipe receipt to OCR: ${error.message}`));
+      pythonProcess.stdin.end(buffer);
+    }
+
     pythonProcess.stdout.on('data', (data) => {
       stdout += data.toString();
     });
@@ -114,6 +268,9 @@ exports.processReceiptOCR = async (imagePath, options = {}) => {
     console.log(`Processing receipt OCR for: ${imagePath}`);
 
     const result = await ocrQueue.add(async () => {
+      if (tesseractConfig.persistentWorker && !options.parseOnly && !options.buffer) {
+        return await processWithWorker(imagePath, options);
+      }
       return await processTesseractOCR(imagePath, options);
     });
 
@@ -135,7 +292,14 @@ exports.processReceiptOCR = async (imagePath, options = {}) => {
         extractedAmount: parsed_data.total_amount,
         extractedDate: parsed_data.date ? new Date(parsed_data.date) : null,
         suggestedCategory: suggested_category,
-        items: parsed_data.items || [],
+        items: (parsed_data.items || []).map(item => ({
+          name: item.description,
+          price: item.amount,
+          quantity: item.quantity,
+          unitPrice: item.unit_price
+        })),
+        possibleDuplicate: result.possible_duplicate || null,
+        degraded: result.degraded || [],
         additionalData: {
           subtotal: parsed_data.subtotal,
           taxAmount: parsed_data.tax_amount,
@@ -266,20 +430,48 @@ exports.validateOCRData = (ocrData, userInput) => {
   return validation;
 };
 
+// Queue metrics written by the Python upload watcher, or null when it is not running
+const readWatcherStatus = () => {
+  let metrics;
+  try {
+    metrics = JSON.parse(fs.readFileSync(tesseractConfig.watcherMetricsPath, 'utf8'));
+  } catch (error) {
+    return null;
+  }
+  if (metrics.state !== 'running' || Date.now() - metrics.updated_at > tesseractConfig.watcherMetricsMaxAge) {
+    return null;
+  }
+  return {
+    queueLength: metrics.queue_length,
+    queuedUploads: metrics.queued_uploads,
+    backfillPending: metrics.backfill_pending,
+    running: metrics.running,
+    maxConcurrent: metrics.max_concurrent,
+    maxQueue: metrics.max_queue,
+    oldestQueuedSeconds: metrics.oldest_queued_seconds,
+    processed: metrics.processed,
+    failed: metrics.failed,
+    shed: metrics.shed,
+    latencyMs: metrics.latency_ms,
+    mode: metrics.mode
+  };
+};
+
 // Get OCR processing status
 exports.getOCRQueueStatus = () => {
   return {
     queueLength: ocrQueue.queue.length,
     running: ocrQueue.running,
-    maxConcurrent: ocrQueue.maxConcurrent
+    maxConcurrent: ocrQueue.maxConcurrent,
+    watcher: readWatcherStatus()
   };
 };
 
-// Test Tesseract OCR installation
+// Test Tesseract OCR installation using the cached `--capabilities` probe
 exports.testTesseractInstallation = async () => {
   try {
-    const testResult = await new Promise((resolve, reject) => {
-      const pythonProcess = spawn(tesseractConfig.pythonPath, ['-c', 'import pytesseract; print("Tesseract OCR is available")'], {
+    const capabilities = await new Promise((resolve, reject) => {
+      const pythonProcess = spawn(tesseractConfig.pythonPath, [tesseractConfig.scriptPath, '--capabilities'], {
         stdio: ['pipe', 'pipe', 'pipe'],
         timeout: 10000
       });
@@ -296,10 +488,13 @@ exports.testTesseractInstallation = async () => {
       });
 
       pythonProcess.on('close', (code) => {
-        if (code === 0) {
-          resolve({ success: true, message: stdout.trim() });
-        } else {
-          reject(new Error(`Test failed with code ${code}: ${stderr}`));
+        if (code !== 0) {
+          return reject(new Error(`Test failed with code ${code}: ${stderr}`));
+        }
+        try {
+          resolve(JSON.parse(stdout));
+        } catch (parseError) {
+          reject(new Error(`Failed to parse capabilities: ${parseError.message}`));
         }
       });
 
@@ -308,7 +503,20 @@ exports.testTesseractInstallation = async () => {
       });
     });
 
-    return testResult;
+    if (!capabilities.ocr_available) {
+      return {
+        success: false,
+        error: 'Tesseract OCR is not available',
+        capabilities,
+        suggestion: 'Run: cd python && python setup.py to install Tesseract OCR dependencies'
+      };
+    }
+
+    return {
+      success: true,
+      message: `Tesseract OCR ${capabilities.tesseract.version} is available (languages: ${capabilities.tesseract.languages.join(', ')})`,
+      capabilities
+    };
 
   } catch (error) {
     return {
@@ -35,7 +35,8 @@ export const CURRENCIES = [
 export const FILE_TYPES = {
   IMAGES: ['image/jpeg', 'image/jpg', 'image/png', 'image/gif'],
   DOCUMENTS: ['application/pdf', 'application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'],
-  ALL_RECEIPTS: ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'application/pdf']
+  E_RECEIPTS: ['message/rfc822', 'text/html', 'text/plain'],
+  ALL_RECEIPTS: ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'application/pdf', 'message/rfc822', 'text/html', 'text/plain']
 };
 
 export const MAX_FILE_SIZE = 5 * 1024 * 1024; // 5MB